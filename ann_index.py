@@ -0,0 +1,104 @@
+import os
+import numpy as np
+
+from ranking_engine import normalize_rows, top_k_indices
+
+# Lists probed per query by default; raise for recall, lower for speed
+DEFAULT_NPROBE = 16
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 50000
+
+
+def index_path(store_dir, collection):
+    return os.path.join(store_dir, f"{collection}.ivf.npz")
+
+
+class IVFIndex:
+    """Inverted-file index over unit vectors (spherical k-means coarse quantizer)
+
+    Rows are grouped by their nearest centroid. A query scores the centroids,
+    probes the nprobe best lists and scores only the rows in them against the
+    collection matrix, so nprobe trades recall for latency.
+    """
+
+    def __init__(self, centroids, order, offsets):
+        self.centroids = centroids  # (n_lists, dim) unit vectors
+        self.order = order          # row ids grouped by list
+        self.offsets = offsets      # list i is order[offsets[i]:offsets[i + 1]]
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors, n_lists=None, seed=0):
+        unit = normalize_rows(vectors)
+        n = len(unit)
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+
+        rng = np.random.default_rng(seed)
+        sample = unit if n <= KMEANS_SAMPLE else unit[rng.choice(n, KMEANS_SAMPLE, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty lists with random sample rows
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        assignment = np.argmax(unit @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable").astype(np.int64)
+        counts = np.bincount(assignment, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, order, offsets)
+
+    def search(self, unit_matrix, query_vector, k, nprobe=DEFAULT_NPROBE):
+        """Row ids of the approximate top-k rows for a query, best first"""
+        query = normalize_rows(query_vector)[0]
+        nprobe = max(1, min(nprobe, self.n_lists))
+        lists = top_k_indices(self.centroids @ query, nprobe)
+        rows = np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+        if len(rows) == 0:
+            return rows
+        rows.sort()
+        scores = unit_matrix[rows] @ query
+        return rows[top_k_indices(scores, k)]
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["centroids"], data["order"], data["offsets"])
+
+
+def build_index(store_dir, collection, vectors, n_lists=None):
+    """Build and save the IVF index that goes with a collection store"""
+    if len(vectors) == 0:
+        return None
+    index = IVFIndex.build(vectors, n_lists)
+    path = index_path(store_dir, collection)
+    index.save(path)
+    print(f"🗂️ Built IVF index with {index.n_lists} lists: {path}")
+    return index
+
+
+def load_index(store_dir, collection):
+    """The collection's IVF index, or None when it has not been built"""
+    path = index_path(store_dir, collection)
+    return IVFIndex.load(path) if os.path.exists(path) else None
+
+
+def remove_index(store_dir, collection):
+    """Drop a collection's index so a rebuilt store never pairs with stale row ids"""
+    path = index_path(store_dir, collection)
+    if os.path.exists(path):
+        os.remove(path)
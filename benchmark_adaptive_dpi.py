@@ -0,0 +1,91 @@
+import re
+import json
+import fitz  # PyMuPDF
+
+from step1_paddle import FastPDFProcessor, resolve_dpi
+from benchmark_layout_batching import find_pdfs
+
+# === CONFIG ===
+OUTPUT_PATH = "adaptive_dpi_results.json"
+WORKERS = 4
+BATCH_SIZE = 1
+# name -> dpi argument of process_documents (int, "adaptive" or adaptive_dpi kwargs)
+POLICIES = {
+    "fixed-50": 50,
+    "fixed-72": 72,
+    "fixed-100": 100,
+    "fixed-150": 150,
+    "adaptive": "adaptive",
+    "adaptive-1Mpx": {"max_pixels": 1_000_000},
+    "adaptive-max200": {"max_dpi": 200, "max_pixels": 4_000_000},
+}
+# Titles detected with this policy are the reference for agreement
+REFERENCE = "fixed-150"
+
+
+def normalize(text):
+    return " ".join(re.sub(r"[^\w]+", " ", text.lower()).split())
+
+
+def rendered_pixels(pdfs, dpi):
+    """(total pixels, mean DPI) the policy renders over all pages"""
+    pixels, dpis = 0, []
+    for pdf_path in pdfs:
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                page_dpi = resolve_dpi(page, dpi)
+                dpis.append(page_dpi)
+                pixels += page.rect.width * page.rect.height * (page_dpi / 72.0) ** 2
+    return int(pixels), sum(dpis) / max(1, len(dpis))
+
+
+def detected_titles(completed):
+    return {
+        (pdf_path, normalize(elem["text"]))
+        for pdf_path, pages in completed.items()
+        for page in pages
+        for elem in page.get("elements", [])
+        if elem.get("type") in ("doc_title", "paragraph_title") and elem.get("text", "").strip()
+    }
+
+
+if __name__ == "__main__":
+    pdfs = find_pdfs()
+    print(f"📚 Sweeping {len(POLICIES)} DPI policies over {len(pdfs)} PDFs")
+    runs = {}
+
+    with FastPDFProcessor(max_workers=WORKERS, batch_size=BATCH_SIZE) as processor:
+        for name, dpi in POLICIES.items():
+            pixels, mean_dpi = rendered_pixels(pdfs, dpi)
+            completed = processor.process_documents([(pdf_path, None) for pdf_path in pdfs], dpi=dpi)
+            runs[name] = {
+                "policy": name,
+                "mean_dpi": round(mean_dpi, 1),
+                "megapixels": round(pixels / 1e6, 1),
+                "seconds": processor.last_run_stats["seconds"],
+                "pages_per_sec": processor.last_run_stats["pages_per_sec"],
+                "titles": detected_titles(completed),
+            }
+
+    reference = runs[REFERENCE]["titles"]
+    rows = []
+    for run in runs.values():
+        titles = run.pop("titles")
+        shared = len(titles & reference)
+        precision = shared / max(1, len(titles))
+        recall = shared / max(1, len(reference))
+        run["titles"] = len(titles)
+        run["title_precision"] = round(precision, 4)
+        run["title_recall"] = round(recall, 4)
+        run["title_f1"] = round(2 * precision * recall / max(1e-9, precision + recall), 4)
+        rows.append(run)
+
+    print(f"\n📊 Layout time vs title agreement (reference: {REFERENCE})")
+    print(f"{'policy':<16} {'mean dpi':>9} {'Mpx':>8} {'seconds':>9} {'pages/s':>8} {'titles':>7} {'F1':>6}")
+    for row in rows:
+        print(f"{row['policy']:<16} {row['mean_dpi']:>9.1f} {row['megapixels']:>8.1f} {row['seconds']:>9.2f} "
+              f"{row['pages_per_sec']:>8.2f} {row['titles']:>7} {row['title_f1']:>6.3f}")
+
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        json.dump({"reference": REFERENCE, "runs": rows}, f, indent=2)
+    print(f"💾 Saved to: {OUTPUT_PATH}")
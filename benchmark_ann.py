@@ -0,0 +1,63 @@
+import time
+import numpy as np
+
+from ann_index import IVFIndex
+from embedding_store import load_store, list_collections
+from ranking_engine import normalize_rows, score, top_k_indices
+
+# === CONFIG ===
+STORE_DIRS = ["section_embeddings", "text_embeddings"]
+SYNTHETIC_SIZES = [10000, 100000]
+SYNTHETIC_TOPICS = 500
+DIM = 384
+N_QUERIES = 100
+K = 10
+NPROBES = [1, 4, 8, 16, 32]
+
+
+def synthetic_corpus(n, rng):
+    """Clustered unit vectors, closer to real section embeddings than uniform noise"""
+    topics = rng.normal(size=(SYNTHETIC_TOPICS, DIM)).astype(np.float32)
+    vectors = topics[rng.integers(0, SYNTHETIC_TOPICS, n)] + 0.6 * rng.normal(size=(n, DIM)).astype(np.float32)
+    return normalize_rows(vectors)
+
+
+def make_queries(unit, rng):
+    rows = unit[rng.integers(0, len(unit), N_QUERIES)]
+    return normalize_rows(rows + 0.3 * rng.normal(size=rows.shape).astype(np.float32))
+
+
+def benchmark(name, unit, rng):
+    queries = make_queries(unit, rng)
+    k = min(K, len(unit))
+
+    start = time.perf_counter()
+    exact = [set(top_k_indices(score(q, unit), k).tolist()) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(unit)
+    build_s = time.perf_counter() - start
+
+    print(f"\n📚 {name}: {len(unit)} vectors, {index.n_lists} lists (built in {build_s:.2f}s)")
+    print(f"   {'nprobe':>8} {'recall@10':>10} {'ms/query':>10} {'speedup':>8}")
+    print(f"   {'exact':>8} {1.0:>10.3f} {exact_ms:>10.3f} {1.0:>8.1f}")
+    for nprobe in NPROBES:
+        start = time.perf_counter()
+        found = [index.search(unit, q, k, nprobe) for q in queries]
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(exact_set & set(rows.tolist())) / k for exact_set, rows in zip(exact, found)])
+        print(f"   {nprobe:>8} {recall:>10.3f} {ann_ms:>10.3f} {exact_ms / ann_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+
+    for store_dir in STORE_DIRS:
+        for collection in list_collections(store_dir):
+            vectors, _ = load_store(store_dir, collection)
+            if len(vectors):
+                benchmark(f"{store_dir}/{collection}", normalize_rows(vectors), rng)
+
+    for n in SYNTHETIC_SIZES:
+        benchmark(f"synthetic-{n}", synthetic_corpus(n, rng), rng)
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+from encoder_backends import BACKENDS, encoder_id, load_encoder
+from step3_embeddings_text import collect_doc_texts, INPUT_DIR
+from ranking_engine import normalize_rows, parse_query, query_text, score, top_k_indices
+
+# === CONFIG ===
+MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+REFERENCE = "torch"
+OUTPUT_PATH = "encoder_backend_results.json"
+BATCH_SIZE = 64
+K = 10
+
+
+def collection_texts():
+    """{collection: [text, ...]} from the bundled extracted_texts/"""
+    texts = {}
+    for collection in sorted(os.listdir(INPUT_DIR)):
+        collection_path = os.path.join(INPUT_DIR, collection)
+        if not os.path.isdir(collection_path):
+            continue
+        entries = []
+        for doc in sorted(os.listdir(collection_path)):
+            doc_path = os.path.join(collection_path, doc)
+            if os.path.isdir(doc_path):
+                entries.extend(collect_doc_texts(doc_path))
+        texts[collection] = [e["text"] for e in entries]
+    return texts
+
+
+def collection_query(collection):
+    with open(os.path.join(collection, "challenge1b_input.json"), "r", encoding="utf-8") as f:
+        return query_text(*parse_query(json.load(f)))
+
+
+def encode_all(model, texts, queries):
+    """Text / query vectors per collection plus texts/sec over every text"""
+    model.encode(["warm up"])
+    start = time.perf_counter()
+    vectors = {name: normalize_rows(np.asarray(model.encode(batch, batch_size=BATCH_SIZE), dtype=np.float32))
+               for name, batch in texts.items()}
+    elapsed = time.perf_counter() - start
+    query_vectors = {name: np.asarray(model.encode([q])[0], dtype=np.float32) for name, q in queries.items()}
+    total = sum(len(batch) for batch in texts.values())
+    return vectors, query_vectors, total / elapsed if elapsed > 0 else 0.0
+
+
+def parity(reference, candidate):
+    """Vector cosine and ranking agreement of a backend against the fp32 reference"""
+    cosines, score_diffs, overlaps = [], [], []
+    ref_vectors, ref_queries = reference
+    vectors, queries = candidate
+    for name, unit in vectors.items():
+        cosines.append(np.sum(unit * ref_vectors[name], axis=1))
+        ref_scores = score(ref_queries[name], ref_vectors[name])
+        scores = score(queries[name], unit)
+        score_diffs.append(float(np.max(np.abs(scores - ref_scores))))
+        k = min(K, len(unit))
+        shared = set(top_k_indices(scores, k).tolist()) & set(top_k_indices(ref_scores, k).tolist())
+        overlaps.append(len(shared) / max(1, k))
+    cosines = np.concatenate(cosines)
+    return {
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "min_cosine": round(float(cosines.min()), 5),
+        "max_score_diff": round(max(score_diffs), 5),
+        f"top{K}_overlap": round(float(np.mean(overlaps)), 4),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity and CPU throughput of the encoder backends")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backends", nargs="*", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    texts = collection_texts()
+    queries = {name: collection_query(name) for name in texts if os.path.isdir(name)}
+    texts = {name: batch for name, batch in texts.items() if name in queries}
+    print(f"📚 {sum(len(b) for b in texts.values())} texts over {len(texts)} collections")
+
+    backends = [REFERENCE] + [b for b in args.backends if b != REFERENCE]
+    encoded, rows = {}, []
+    for backend in backends:
+        print(f"⏱️ {encoder_id(args.model, backend)}...")
+        model = load_encoder(args.model, backend)
+        vectors, query_vectors, texts_per_sec = encode_all(model, texts, queries)
+        encoded[backend] = (vectors, query_vectors)
+        rows.append({"backend": backend, "texts_per_sec": round(texts_per_sec, 2),
+                     **parity(encoded[REFERENCE], encoded[backend])})
+        del model
+
+    print(f"\n📊 Encoder backends (reference: {REFERENCE})")
+    print(f"{'backend':<12} {'texts/s':>9} {'speedup':>8} {'mean cos':>9} {'min cos':>8} {'max dscore':>11} {f'top{K}':>6}")
+    base = rows[0]["texts_per_sec"] or 1.0
+    for row in rows:
+        print(f"{row['backend']:<12} {row['texts_per_sec']:>9.1f} {row['texts_per_sec'] / base:>7.2f}x "
+              f"{row['mean_cosine']:>9.4f} {row['min_cosine']:>8.4f} {row['max_score_diff']:>11.4f} "
+              f"{row[f'top{K}_overlap']:>6.2f}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"model": args.model, "reference": REFERENCE, "runs": rows}, f, indent=2)
+    print(f"💾 Saved to: {args.output}")
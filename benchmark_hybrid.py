@@ -0,0 +1,123 @@
+import os
+import re
+import json
+import time
+import argparse
+import numpy as np
+
+import step4_ranking
+from step3_embeddings import collect_doc_sections, INPUT_DIR, MODEL_NAME
+from embedding_engine import EmbeddingEngine
+from lexical_index import BM25Index, record_text
+from ranking_engine import parse_query, query_text
+
+# === CONFIG ===
+OUTPUT_PATH = "hybrid_results.json"
+COLLECTIONS_DIR = "."
+WEIGHTS = [0.0, 0.1, 0.2, 0.3, 0.5, 1.0]  # 0.0 = dense only, 1.0 = BM25 only
+K = 10
+REPEATS = 50  # latency: rank calls per collection and method
+
+
+def normalize_title(text):
+    return " ".join(re.sub(r"[^\w]+", " ", text.lower()).split())
+
+
+def load_collection(collection):
+    """(query, expected [(doc, title)], section records) of a bundled collection"""
+    with open(os.path.join(COLLECTIONS_DIR, collection, "challenge1b_input.json"), "r", encoding="utf-8") as f:
+        query = query_text(*parse_query(json.load(f)))
+    with open(os.path.join(COLLECTIONS_DIR, collection, "challenge1b_output.json"), "r", encoding="utf-8") as f:
+        expected = [(os.path.splitext(s["document"])[0], normalize_title(s["section_title"]))
+                    for s in sorted(json.load(f)["extracted_sections"], key=lambda s: s["importance_rank"])]
+
+    records = []
+    collection_path = os.path.join(INPUT_DIR, collection)
+    for doc in sorted(os.listdir(collection_path)):
+        doc_path = os.path.join(collection_path, doc)
+        if os.path.isdir(doc_path):
+            records.extend(collect_doc_sections(doc_path))
+    return query, expected, records
+
+
+def matches(section, target):
+    """Layout titles may be cut or merged, so containment counts as a match"""
+    doc, title = target
+    found = normalize_title(section.get("section_title", ""))
+    return section.get("doc") == doc and bool(found) and (found == title or found in title or title in found)
+
+
+def quality(ranked, expected):
+    found = [next((i for i, s in enumerate(ranked) if matches(s, t)), None) for t in expected]
+    first = min((i for i in found if i is not None), default=None)
+    return {
+        "recall@5": sum(1 for i in found if i is not None and i < 5) / len(expected),
+        f"recall@{K}": sum(1 for i in found if i is not None) / len(expected),
+        "mrr": 0.0 if first is None else 1.0 / (first + 1),
+    }
+
+
+def timed_rank(query_emb, vectors, records, lexical_index, query, weight):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        ranked = step4_ranking.rank_sections(query_emb, vectors, records, k=K, lexical_index=lexical_index,
+                                             query=query, lexical_weight=weight)
+    return ranked, (time.perf_counter() - start) * 1000 / REPEATS
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dense vs BM25 vs hybrid section ranking on the bundled collections")
+    parser.add_argument("--weights", type=float, nargs="*", default=WEIGHTS)
+    parser.add_argument("--candidates", type=int, default=step4_ranking.LEXICAL_CANDIDATES or 0,
+                        help="BM25 rows dense-scored on large collections (0 = score every row)")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    step4_ranking.LEXICAL_CANDIDATES = args.candidates if args.candidates > 0 else None
+    engine = EmbeddingEngine(MODEL_NAME)
+
+    collections = sorted(c for c in os.listdir(INPUT_DIR)
+                         if os.path.exists(os.path.join(COLLECTIONS_DIR, c, "challenge1b_output.json")))
+    rows = []
+    for collection in collections:
+        query, expected, records = load_collection(collection)
+        vectors = engine.encode([r["content"] for r in records])
+        query_emb = engine.encode([query])[0]
+
+        start = time.perf_counter()
+        lexical_index = BM25Index.build([record_text(r) for r in records])
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            lexical_index.scores(query)
+        bm25_ms = (time.perf_counter() - start) * 1000 / REPEATS
+
+        # Expected sections whose title exists at all in the layout output: the recall ceiling
+        reachable = sum(1 for t in expected if any(matches(s, t) for s in records))
+        print(f"\n📚 {collection}: {len(records)} sections, {reachable}/{len(expected)} expected titles reachable, "
+              f"{len(lexical_index.terms)} terms, index built in {build_ms:.1f} ms, BM25 scoring {bm25_ms:.3f} ms/query")
+        for weight in args.weights:
+            if weight == 0.0:
+                ranked, ms = timed_rank(query_emb, vectors, records, None, None, weight)
+                method = "dense"
+            else:
+                ranked, ms = timed_rank(query_emb, vectors, records, lexical_index, query, weight)
+                method = "bm25" if weight == 1.0 else f"hybrid-{weight:g}"
+            row = {"collection": collection, "method": method, "weight": weight, "sections": len(records),
+                   "reachable": reachable / len(expected),
+                   "ms_per_query": round(ms, 3), **{k: round(v, 4) for k, v in quality(ranked, expected).items()}}
+            rows.append(row)
+            print(f"   {method:<12} recall@5={row['recall@5']:.2f} recall@{K}={row[f'recall@{K}']:.2f} "
+                  f"mrr={row['mrr']:.2f} {ms:.3f} ms/query")
+
+    print(f"\n📊 Mean over {len(collections)} collections")
+    print(f"{'method':<12} {'recall@5':>9} {f'recall@{K}':>10} {'mrr':>6} {'ms/query':>9}")
+    for method in dict.fromkeys(r["method"] for r in rows):
+        subset = [r for r in rows if r["method"] == method]
+        mean = {k: np.mean([r[k] for r in subset]) for k in ("recall@5", f"recall@{K}", "mrr", "ms_per_query")}
+        print(f"{method:<12} {mean['recall@5']:>9.3f} {mean[f'recall@{K}']:>10.3f} {mean['mrr']:>6.3f} "
+              f"{mean['ms_per_query']:>9.3f}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"model": MODEL_NAME, "k": K, "lexical_candidates": args.candidates, "runs": rows}, f, indent=2)
+    print(f"💾 Saved to: {args.output}")
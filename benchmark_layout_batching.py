@@ -0,0 +1,51 @@
+import os
+import json
+import tempfile
+
+from step1_paddle import FastPDFProcessor
+
+# === CONFIG ===
+COLLECTIONS_ROOT = "."
+OUTPUT_PATH = "layout_batching_results.json"
+DPI = 72
+# (workers, batch size) pairs to sweep
+CONFIGS = [(4, 1), (4, 2), (4, 4), (2, 4), (2, 8), (1, 8), (1, 16)]
+
+
+def find_pdfs():
+    pdfs = []
+    for collection_name in sorted(os.listdir(COLLECTIONS_ROOT)):
+        pdf_dir = os.path.join(COLLECTIONS_ROOT, collection_name, "PDFs")
+        if not os.path.isdir(pdf_dir):
+            continue
+        for filename in sorted(os.listdir(pdf_dir)):
+            if filename.endswith(".pdf"):
+                pdfs.append(os.path.join(pdf_dir, filename))
+    return pdfs
+
+
+if __name__ == "__main__":
+    pdfs = find_pdfs()
+    print(f"📚 Benchmarking layout batching on {len(pdfs)} PDFs")
+    rows = []
+
+    for workers, batch_size in CONFIGS:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            jobs = [(pdf_path, os.path.join(tmp_dir, str(i))) for i, pdf_path in enumerate(pdfs)]
+            with FastPDFProcessor(max_workers=workers, batch_size=batch_size) as processor:
+                processor.process_documents(jobs, dpi=DPI)
+            rows.append(processor.last_run_stats)
+
+    print("\n📊 Layout throughput")
+    print(f"{'workers':>8} {'batch':>6} {'threads':>8} {'pages':>6} {'seconds':>9} {'pages/s':>9}")
+    for row in rows:
+        print(f"{row['workers']:>8} {row['batch_size']:>6} {row['cpu_threads']:>8} "
+              f"{row['pages']:>6} {row['seconds']:>9.2f} {row['pages_per_sec']:>9.2f}")
+
+    best = max(rows, key=lambda r: r["pages_per_sec"])
+    print(f"\n🏆 Best: {best['workers']} workers x batch size {best['batch_size']} "
+          f"({best['pages_per_sec']:.2f} pages/s)")
+
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    print(f"💾 Saved to: {OUTPUT_PATH}")
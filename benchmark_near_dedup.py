@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+
+from step3_embeddings_text import INPUT_DIR, MODEL_NAME, collect_collection_texts
+from embedding_engine import EmbeddingEngine
+from near_dedup import dedup_records, shingles, JACCARD_THRESHOLD
+
+# === CONFIG ===
+OUTPUT_PATH = "near_dedup_results.json"
+MAX_BRUTE_FORCE = 3000  # all-pairs Jaccard reference only up to this many sections
+SEED = 0
+
+
+def edited_copies(records, copies, rng):
+    """Versioned-manual stand-ins: each copy changes one word in fifty (short sections stay verbatim)"""
+    out = []
+    for version in range(1, copies + 1):
+        for record in records:
+            words = record["text"].split()
+            for i in rng.choice(len(words), size=len(words) // 50, replace=False):
+                words[i] = f"v{version}w{i}"
+            out.append({**record, "doc": f"{record['doc']} (copy {version})", "text": " ".join(words)})
+    return out
+
+
+def dedup_units(records, across_docs):
+    """Records split as step3 deduplicates them: one unit per document, or the whole collection"""
+    if across_docs:
+        return [records]
+    units = {}
+    for record in records:
+        units.setdefault(record["doc"], []).append(record)
+    return list(units.values())
+
+
+def dedup_collection(records, across_docs):
+    """dedup_records over each unit: (representatives, dropped, summed stats)"""
+    representatives, dropped, stats = [], [], {"records": 0, "representatives": 0, "duplicates": 0, "ms": 0.0}
+    for unit in dedup_units(records, across_docs):
+        unit_representatives, unit_dropped, unit_stats = dedup_records(unit)
+        representatives += unit_representatives
+        dropped += unit_dropped
+        for key in stats:
+            stats[key] += unit_stats[key]
+    stats["ratio"] = round(stats["duplicates"] / stats["records"], 4) if stats["records"] else 0.0
+    stats["ms"] = round(stats["ms"], 3)
+    return representatives, dropped, stats
+
+
+def brute_force(records, threshold=JACCARD_THRESHOLD):
+    """(records with an earlier copy at >= threshold Jaccard, seconds) from all pairs"""
+    sets = [set(shingles(r["text"]).tolist()) for r in records]
+    start = time.perf_counter()
+    matched = {j for i, j in itertools.combinations(range(len(sets)), 2)
+               if len(sets[i] & sets[j]) >= threshold * len(sets[i] | sets[j])}
+    return matched, time.perf_counter() - start
+
+
+def timed_encode(engine, texts):
+    start = time.perf_counter()
+    engine.encode(texts)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MinHash/LSH near-duplicate ratio and embedding time saved per collection")
+    parser.add_argument("--copies", type=int, default=0, help="Also add this many lightly edited copies of every section")
+    parser.add_argument("--across-docs", action="store_true",
+                        help="Fold copies across the documents of a collection (NEAR_DEDUP_ACROSS_DOCS) "
+                             "instead of within each document (the default)")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(SEED)
+    engine = EmbeddingEngine(MODEL_NAME, cache_dir=None)  # uncached: every text is really encoded
+    engine.encode(["warm-up"])
+
+    print(f"🧬 Folding near-duplicates {'across documents' if args.across_docs else 'within each document'}")
+    rows = []
+    for collection in sorted(os.listdir(INPUT_DIR)):
+        collection_path = os.path.join(INPUT_DIR, collection)
+        if not os.path.isdir(collection_path):
+            continue
+        records = collect_collection_texts(collection_path)
+        records += edited_copies(records, args.copies, rng)
+
+        representatives, dropped, stats = dedup_collection(records, args.across_docs)
+        row = {"collection": collection, **stats}
+        if len(records) <= MAX_BRUTE_FORCE:
+            # The all-pairs reference only compares sections the dedup mode may fold together
+            matched, seconds = set(), 0.0
+            for unit in dedup_units(records, args.across_docs):
+                unit_matched, unit_seconds = brute_force(unit)
+                matched |= {id(unit[i]) for i in unit_matched}
+                seconds += unit_seconds
+            found = {id(r) for r in dropped}
+            row["brute_force_ms"] = round(seconds * 1000, 1)
+            row["recall"] = round(len(found & matched) / len(matched), 4) if matched else 1.0
+            row["false_merges"] = len(found - matched)
+
+        all_seconds = timed_encode(engine, [r["text"] for r in records])
+        rep_seconds = timed_encode(engine, [r["text"] for r in representatives])
+        row["embed_all_s"] = round(all_seconds, 3)
+        row["embed_representatives_s"] = round(rep_seconds, 3)
+        row["embed_saved_s"] = round(all_seconds - rep_seconds - stats["ms"] / 1000, 3)
+        rows.append(row)
+
+        print(f"🧬 {collection}: {stats['records']} sections -> {stats['representatives']} "
+              f"({stats['ratio']:.1%} near-duplicates) in {stats['ms']:.0f} ms"
+              + (f", all-pairs {row['brute_force_ms']:.0f} ms, recall {row['recall']:.2f}, "
+                 f"{row['false_merges']} merges under the threshold" if "recall" in row else ""))
+        print(f"   ⏱️ embedding {row['embed_all_s']:.2f} s -> {row['embed_representatives_s']:.2f} s, "
+              f"{row['embed_saved_s']:.2f} s saved net of dedup")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"model": MODEL_NAME, "copies": args.copies, "across_docs": args.across_docs,
+                   "threshold": JACCARD_THRESHOLD, "runs": rows},
+                  f, indent=2)
+    print(f"💾 Saved to: {args.output}")
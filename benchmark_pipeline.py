@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# === CONFIG ===
+BASELINE_PATH = "benchmark_baseline.json"
+LAYOUT_DIR = "outputs"
+MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+LAYOUT_SCALES = [1000]          # synthetic page counts on top of the bundled PDFs
+EMBEDDING_SCALES = [1000, 10000]
+RANKING_SCALES = [1000, 10000, 100000]
+REGRESSION_THRESHOLD = 0.10     # relative change that counts as a regression
+
+# Metric -> True when higher is better
+DIRECTIONS = {
+    "pages_per_sec": True,
+    "sections_per_sec": True,
+    "queries_per_sec": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+    "worker_peak_rss_mb": False,
+}
+
+
+def find_pdfs():
+    from benchmark_layout_batching import find_pdfs as bundled
+    return bundled()
+
+
+def make_scaled_pdf(pdf_paths, pages, path):
+    """Concatenate the bundled PDFs cyclically into one PDF of exactly `pages` pages"""
+    import fitz
+    out = fitz.open()
+    while out.page_count < pages:
+        for pdf_path in pdf_paths:
+            with fitz.open(pdf_path) as src:
+                out.insert_pdf(src, to_page=min(src.page_count, pages - out.page_count) - 1)
+            if out.page_count >= pages:
+                break
+    out.save(path)
+    out.close()
+    return path
+
+
+def bundled_sections():
+    """Section texts built from the layout results in outputs/"""
+    from step3_embeddings import sections_from_layout
+    texts = []
+    for root, _, files in os.walk(LAYOUT_DIR):
+        for file in sorted(files):
+            if file.endswith(".json"):
+                with open(os.path.join(root, file), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                texts.extend(s["content"] for s in sections_from_layout(os.path.basename(root), [data]))
+    return texts
+
+
+def peaks():
+    from instrumentation import peak_rss_mb, peak_children_rss_mb
+    return {"peak_rss_mb": round(peak_rss_mb(), 1), "worker_peak_rss_mb": round(peak_children_rss_mb(), 1)}
+
+
+def latency_stats(latencies, elapsed):
+    values = np.array(latencies) * 1000
+    return {
+        "queries": len(latencies),
+        "queries_per_sec": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4),
+    }
+
+
+def bench_layout(pdf_paths, stub, workers, batch_size, text_layer):
+    """Layout pages/sec over pdf_paths (in-memory results, nothing written)"""
+    from step1_paddle import FastPDFProcessor, STUB_LAYOUT_MODEL, LAYOUT_MODEL_NAME
+    model_name = STUB_LAYOUT_MODEL if stub else LAYOUT_MODEL_NAME
+    with FastPDFProcessor(max_workers=workers, batch_size=batch_size, text_layer=text_layer,
+                          model_name=model_name) as processor:
+        completed = processor.process_documents([(p, None) for p in pdf_paths])
+    stats = processor.last_run_stats
+    return {"documents": len(completed), "pages": stats.get("pages", 0), "seconds": stats.get("seconds", 0.0),
+            "pages_per_sec": stats.get("pages_per_sec", 0.0), **peaks()}
+
+
+def bench_embedding(texts, model_name, backend):
+    """Uncached encode throughput; model load is excluded"""
+    from embedding_engine import EmbeddingEngine
+    engine = EmbeddingEngine(model_name, cache_dir=None, backend=backend)
+    engine.model.encode(["warm up"])
+    start = time.perf_counter()
+    vectors = engine.encode(texts)
+    elapsed = time.perf_counter() - start
+    return {"sections": len(texts), "dim": int(vectors.shape[1]) if len(vectors) else 0, "seconds": round(elapsed, 3),
+            "sections_per_sec": round(len(texts) / elapsed, 2) if elapsed > 0 else 0.0, **peaks()}
+
+
+def bench_ranking(n, source, seed=0):
+    """step4 ranking latency on n synthetic clustered unit vectors"""
+    import step4_ranking
+    import step4_ranking_text
+    from benchmark_ann import synthetic_corpus, make_queries
+
+    rng = np.random.default_rng(seed)
+    unit = synthetic_corpus(n, rng)
+    if source == "sections":
+        records = [{"doc": f"doc{i % 50}", "section_title": f"Section {i}", "content": f"text {i}"} for i in range(n)]
+    else:
+        records = [{"doc": f"doc{i % 50}", "title": f"Section {i}", "page": 1, "text": f"text block {i}"} for i in range(n)]
+    queries = make_queries(unit, rng)
+
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        t = time.perf_counter()
+        if source == "sections":
+            step4_ranking.rank_sections(query, unit, records)
+        else:
+            step4_ranking_text.rank_texts(query, unit, records)
+        latencies.append(time.perf_counter() - t)
+    return {"corpus": n, **latency_stats(latencies, time.perf_counter() - start), **peaks()}
+
+
+def run_isolated(func, *args):
+    """Run one benchmark in a fresh process so its peak RSS is its own"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(func, *args).result()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    results = {}
+    from encoder_backends import encoder_id
+
+    if not args.skip_layout:
+        pdfs = find_pdfs()
+        runs = [("layout/bundled", pdfs)]
+        tmp_dir = tempfile.mkdtemp(prefix="bench_pdfs_")
+        for pages in args.layout_scales:
+            runs.append((f"layout/{pages}p", [make_scaled_pdf(pdfs, pages, os.path.join(tmp_dir, f"scaled_{pages}.pdf"))]))
+        for name, pdf_paths in runs:
+            print(f"⏱️ {name}...")
+            results[name] = run_isolated(bench_layout, pdf_paths, args.stub_layout, args.workers,
+                                         args.batch_size, args.text_layer)
+
+    if not args.skip_embedding:
+        texts = bundled_sections()
+        runs = [("embedding/bundled", texts)]
+        for n in args.embedding_scales:
+            # Numbered copies so nothing is deduplicated away
+            runs.append((f"embedding/{n}", [f"{texts[i % len(texts)]} ({i})" for i in range(n)]))
+        for name, batch in runs:
+            print(f"⏱️ {name}...")
+            results[name] = run_isolated(bench_embedding, batch, args.model, args.backend)
+
+    if not args.skip_ranking:
+        for source in ("sections", "texts"):
+            for n in args.ranking_scales:
+                name = f"ranking_{source}/{n}"
+                print(f"⏱️ {name}...")
+                results[name] = run_isolated(bench_ranking, n, source)
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "model": encoder_id(args.model, args.backend),
+            "stub_layout": args.stub_layout,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Rows of (benchmark, metric, baseline, current, change, regressed)"""
+    rows = []
+    for name, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in DIRECTIONS.items():
+            if metric not in metrics or not base.get(metric):
+                continue
+            change = (metrics[metric] - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            rows.append((name, metric, base[metric], metrics[metric], change, worse > threshold))
+    return rows
+
+
+def print_results(report):
+    print(f"\n📊 Benchmark results ({report['meta']['commit'] or 'no commit'})")
+    for name, metrics in report["results"].items():
+        shown = ", ".join(f"{k}={v}" for k, v in metrics.items())
+        print(f"   {name:<26} {shown}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end layout / embedding / ranking benchmarks")
+    parser.add_argument("--output", default=BASELINE_PATH, help="Where to write this run's results")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag regressions against a previous results file")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument("--stub-layout", action="store_true", help="Use StubLayoutModel instead of PaddleOCR")
+    parser.add_argument("--text-layer", action="store_true", help="Layout with the text-layer fast path")
+    parser.add_argument("--offline", action="store_true", help="Never reach the model hub (local models/ or cache only)")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--backend", default="torch", help="Encoder backend: torch, torch-int8, onnx, onnx-int8")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--layout-scales", type=int, nargs="*", default=LAYOUT_SCALES)
+    parser.add_argument("--embedding-scales", type=int, nargs="*", default=EMBEDDING_SCALES)
+    parser.add_argument("--ranking-scales", type=int, nargs="*", default=RANKING_SCALES)
+    parser.add_argument("--skip-layout", action="store_true")
+    parser.add_argument("--skip-embedding", action="store_true")
+    parser.add_argument("--skip-ranking", action="store_true")
+    args = parser.parse_args()
+
+    # Per-query / per-page chatter would be part of the measurement
+    os.environ.setdefault("PIPELINE_LOG_LEVEL", "WARNING")
+    if args.offline:
+        # Inherited by the spawned benchmark processes
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+    # Read first: --output may point at the baseline itself
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = run_suite(args)
+    print_results(report)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Saved to: {args.output}")
+
+    if baseline is not None:
+        rows = compare(report, baseline, args.threshold)
+        print(f"\n🔍 Compared with {args.compare} (threshold {args.threshold:.0%})")
+        print(f"   {'benchmark':<26} {'metric':<20} {'baseline':>12} {'current':>12} {'change':>8}")
+        for name, metric, base, value, change, regressed in rows:
+            flag = "❌" if regressed else "  "
+            print(f"{flag} {name:<26} {metric:<20} {base:>12} {value:>12} {change:>+8.1%}")
+        regressions = [row for row in rows if row[5]]
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print("\n✅ No regressions")
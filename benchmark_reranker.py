@@ -0,0 +1,79 @@
+import os
+import json
+import argparse
+import numpy as np
+
+import step4_ranking
+from step3_embeddings import INPUT_DIR, MODEL_NAME
+from embedding_engine import EmbeddingEngine
+from lexical_index import BM25Index, record_text
+from reranker import Reranker, RERANKER_MODEL, LLM_RERANKER_MODEL, RERANK_TOP_N, LATENCY_BUDGET_MS
+from benchmark_hybrid import COLLECTIONS_DIR, load_collection, matches
+
+# === CONFIG ===
+OUTPUT_PATH = "reranker_results.json"
+K = 5
+
+
+def precision_at_k(ranked, expected, k=K):
+    return sum(1 for s in ranked[:k] if any(matches(s, t) for t in expected)) / k
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top-5 precision and latency of second-stage reranking")
+    parser.add_argument("--models", nargs="*", default=[RERANKER_MODEL, LLM_RERANKER_MODEL])
+    parser.add_argument("--top-n", type=int, default=RERANK_TOP_N)
+    parser.add_argument("--budgets", type=float, nargs="*", default=[LATENCY_BUDGET_MS, float("inf")],
+                        help="Per-query latency budgets in ms")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    engine = EmbeddingEngine(MODEL_NAME)
+    collections = sorted(c for c in os.listdir(INPUT_DIR)
+                         if os.path.exists(os.path.join(COLLECTIONS_DIR, c, "challenge1b_output.json")))
+
+    # First stage once per collection: the default hybrid ranking, top-N deep
+    first_stage = {}
+    for collection in collections:
+        query, expected, records = load_collection(collection)
+        vectors = engine.encode([r["content"] for r in records])
+        lexical_index = BM25Index.build([record_text(r) for r in records])
+        candidates = step4_ranking.rank_sections(engine.encode([query])[0], vectors, records, k=args.top_n,
+                                                 lexical_index=lexical_index, query=query)
+        first_stage[collection] = (query, expected, candidates)
+
+    rows = [{"method": "first-stage", "collection": c, f"precision@{K}": precision_at_k(cands, exp)}
+            for c, (_, exp, cands) in first_stage.items()]
+    for model_name in args.models:
+        for budget in args.budgets:
+            # No disk cache: cold is a model call per pair, warm is served from the in-memory cache
+            try:
+                reranker = Reranker(model_name, top_n=args.top_n, budget_ms=budget, cache_dir=None)
+            except FileNotFoundError as e:
+                print(f"⚠️ Skipping {model_name}: {e}")
+                break
+            reranker.scorer  # load outside the timings
+            for collection, (query, expected, candidates) in first_stage.items():
+                ranked, _, stats = reranker.rerank(query, [dict(c) for c in candidates], record_text)
+                _, _, warm = reranker.rerank(query, [dict(c) for c in candidates], record_text)
+                rows.append({
+                    "method": f"{model_name} (budget {budget:g} ms)",
+                    "collection": collection,
+                    f"precision@{K}": precision_at_k(ranked, expected),
+                    "reranked": stats["reranked"],
+                    "budget_exhausted": stats["budget_exhausted"],
+                    "cold_ms": stats["ms"],
+                    "warm_ms": warm["ms"],
+                })
+
+    print(f"\n📊 Reranking over {len(collections)} collections (first stage top {args.top_n})")
+    print(f"{'method':<52} {f'P@{K}':>6} {'reranked':>9} {'cold ms':>9} {'warm ms':>9}")
+    for method in dict.fromkeys(r["method"] for r in rows):
+        subset = [r for r in rows if r["method"] == method]
+        mean = lambda key: np.mean([r.get(key, 0) for r in subset])
+        print(f"{method:<52} {mean(f'precision@{K}'):>6.3f} {mean('reranked'):>9.1f} "
+              f"{mean('cold_ms'):>9.1f} {mean('warm_ms'):>9.2f}")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"top_n": args.top_n, "k": K, "runs": rows}, f, indent=2)
+    print(f"💾 Saved to: {args.output}")
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import fitz  # PyMuPDF
+
+from step1_paddle import PageGeometry, extract_text_from_coordinates
+
+# === CONFIG ===
+COLLECTIONS_ROOT = "."
+LAYOUT_ROOT = "outputs"
+DPI = 72
+TEXT_TYPES = ['doc_title', 'paragraph_title', 'text']
+
+
+def legacy_extract_text_from_coordinates(pdf_doc, page_num, bbox, dpi=72):
+    """Previous step1 path: reload + re-render the page for every box"""
+    page = pdf_doc.load_page(page_num)
+    page_rect = page.rect
+    pix = page.get_pixmap(dpi=dpi)
+    scale_x = page_rect.width / pix.width
+    scale_y = page_rect.height / pix.height
+    x1, y1, x2, y2 = bbox
+    pdf_rect = fitz.Rect(x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y)
+    text = page.get_text("text", clip=pdf_rect)
+    return text.strip() if text else ""
+
+
+def load_boxes(layout_path):
+    """Page number (0-based) -> list of text box coordinates from a step1 output"""
+    with open(layout_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    boxes = {}
+    for page in data.get("pages", []):
+        coords = [e["coordinates"] for e in page.get("elements", []) if e.get("type") in TEXT_TYPES]
+        if coords:
+            boxes[page["page_number"] - 1] = coords
+    return boxes
+
+
+def run_legacy(pdf_path, boxes):
+    doc = fitz.open(pdf_path)
+    words = 0
+    for page_num, coords in boxes.items():
+        for bbox in coords:
+            words += len(legacy_extract_text_from_coordinates(doc, page_num, bbox, DPI).split())
+    doc.close()
+    return words
+
+
+def run_geometry(pdf_path, boxes):
+    doc = fitz.open(pdf_path)
+    words = 0
+    for page_num, coords in boxes.items():
+        geometry = PageGeometry(doc, page_num, DPI)
+        for bbox in coords:
+            words += len(extract_text_from_coordinates(geometry, bbox).split())
+    doc.close()
+    return words
+
+
+def find_documents():
+    for collection_name in sorted(os.listdir(COLLECTIONS_ROOT)):
+        pdf_dir = os.path.join(COLLECTIONS_ROOT, collection_name, "PDFs")
+        if not os.path.isdir(pdf_dir):
+            continue
+        for filename in sorted(os.listdir(pdf_dir)):
+            if not filename.endswith(".pdf"):
+                continue
+            pdf_name = os.path.splitext(filename)[0]
+            layout_path = os.path.join(LAYOUT_ROOT, collection_name, pdf_name, "parallel_layout_results1.json")
+            if os.path.exists(layout_path):
+                yield os.path.join(pdf_dir, filename), layout_path
+
+
+if __name__ == "__main__":
+    totals = {"legacy": [0, 0.0], "geometry": [0, 0.0]}
+    total_boxes = 0
+
+    for pdf_path, layout_path in find_documents():
+        boxes = load_boxes(layout_path)
+        total_boxes += sum(len(c) for c in boxes.values())
+        for name, runner in (("legacy", run_legacy), ("geometry", run_geometry)):
+            start = time.perf_counter()
+            words = runner(pdf_path, boxes)
+            totals[name][0] += words
+            totals[name][1] += time.perf_counter() - start
+        print(f"📄 {os.path.basename(pdf_path)}: {sum(len(c) for c in boxes.values())} boxes")
+
+    print("\n📊 Text extraction benchmark")
+    print(f"   - Boxes: {total_boxes}")
+    for name, (words, elapsed) in totals.items():
+        rate = words / elapsed if elapsed else 0.0
+        print(f"   - {name:<8}: {words} words in {elapsed:.2f}s ({rate:,.0f} words/s)")
+    if totals["geometry"][1]:
+        print(f"   - Speedup: {totals['legacy'][1] / totals['geometry'][1]:.1f}x")
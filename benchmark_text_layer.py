@@ -0,0 +1,134 @@
+import os
+import re
+import json
+import time
+from collections import Counter
+import fitz  # PyMuPDF
+
+from text_layer_layout import classify_page, MIN_CONFIDENCE
+
+# === CONFIG ===
+BASE_DIR = "."
+LAYOUT_DIR = "outputs"
+LAYOUT_FILE = "parallel_layout_results1.json"
+OUTPUT_FILE = "text_layer_agreement.json"
+LABELS = ["doc_title", "paragraph_title", "text"]
+MIN_OVERLAP = 0.5  # share of a PaddleOCR box that must be covered to count as a match
+
+
+def normalize(text):
+    """Heading text without bullets, punctuation or layout whitespace"""
+    return " ".join(re.sub(r"[^\w]+", " ", text.lower()).split())
+
+
+def overlap(a, b):
+    """Intersection area over the area of a"""
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    area = (a[2] - a[0]) * (a[3] - a[1])
+    return w * h / area if w > 0 and h > 0 and area > 0 else 0.0
+
+
+def heading_set(pages):
+    return {normalize(e["text"]) for page in pages for e in page["elements"]
+            if e["type"] in ("doc_title", "paragraph_title") and e["text"].strip()}
+
+
+def compare_page(paddle_page, text_page, confusion):
+    """Match every PaddleOCR text/title box to the text-layer element covering it most"""
+    for elem in paddle_page["elements"]:
+        if elem["type"] not in LABELS:
+            continue
+        best, best_overlap = None, 0.0
+        for candidate in text_page["elements"]:
+            o = overlap(elem["coordinates"], candidate["coordinates"])
+            if o > best_overlap:
+                best, best_overlap = candidate, o
+        predicted = best["type"] if best is not None and best_overlap >= MIN_OVERLAP else "missing"
+        confusion[(elem["type"], predicted)] += 1
+
+
+if __name__ == "__main__":
+    confusion = Counter()
+    heading_tp = heading_fp = heading_fn = 0
+    pages_total = low_confidence = 0
+    text_layer_seconds = paddle_seconds = 0.0
+    per_document = []
+
+    for collection_name in sorted(os.listdir(LAYOUT_DIR)):
+        collection_dir = os.path.join(LAYOUT_DIR, collection_name)
+        if not os.path.isdir(collection_dir):
+            continue
+        for doc in sorted(os.listdir(collection_dir)):
+            layout_path = os.path.join(collection_dir, doc, LAYOUT_FILE)
+            pdf_path = os.path.join(BASE_DIR, collection_name, "PDFs", f"{doc}.pdf")
+            if not (os.path.exists(layout_path) and os.path.exists(pdf_path)):
+                continue
+            with open(layout_path, "r", encoding="utf-8") as f:
+                paddle = json.load(f)
+
+            text_pages, confidences = [], []
+            start = time.perf_counter()
+            with fitz.open(pdf_path) as pdf:
+                for page_num in range(pdf.page_count):
+                    page_result, confidence = classify_page(pdf.load_page(page_num), page_num)
+                    text_pages.append(page_result)
+                    confidences.append(confidence)
+            text_layer_seconds += time.perf_counter() - start
+            paddle_seconds += float(str(paddle.get("layout_time_total", "0")).rstrip("s") or 0)
+
+            for paddle_page in paddle["pages"]:
+                index = paddle_page["page_number"] - 1
+                if 0 <= index < len(text_pages):
+                    compare_page(paddle_page, text_pages[index], confusion)
+
+            paddle_headings, text_headings = heading_set(paddle["pages"]), heading_set(text_pages)
+            tp = len(paddle_headings & text_headings)
+            heading_tp += tp
+            heading_fp += len(text_headings - paddle_headings)
+            heading_fn += len(paddle_headings - text_headings)
+            pages_total += len(text_pages)
+            low_confidence += sum(c < MIN_CONFIDENCE for c in confidences)
+            per_document.append({
+                "collection": collection_name,
+                "document": doc,
+                "pages": len(text_pages),
+                "low_confidence_pages": sum(c < MIN_CONFIDENCE for c in confidences),
+                "paddle_headings": len(paddle_headings),
+                "text_layer_headings": len(text_headings),
+                "shared_headings": tp,
+            })
+
+    matched = sum(n for (truth, predicted), n in confusion.items())
+    agree = sum(n for (truth, predicted), n in confusion.items() if truth == predicted)
+    precision = heading_tp / max(1, heading_tp + heading_fp)
+    recall = heading_tp / max(1, heading_tp + heading_fn)
+    f1 = 2 * precision * recall / max(1e-9, precision + recall)
+
+    print(f"📚 {len(per_document)} documents, {pages_total} pages")
+    print(f"🏷️ Element label agreement: {agree}/{matched} ({agree / max(1, matched):.1%})")
+    print(f"   {'paddle / text layer':<20}" + "".join(f"{p:>17}" for p in LABELS + ["missing"]))
+    for truth in LABELS:
+        print(f"   {truth:<20}" + "".join(f"{confusion[(truth, p)]:>17}" for p in LABELS + ["missing"]))
+    print(f"📑 Heading text: precision {precision:.3f}, recall {recall:.3f}, F1 {f1:.3f}")
+    print(f"🤔 Pages below confidence {MIN_CONFIDENCE}: {low_confidence}/{pages_total}")
+    print(f"⏱️ Text layer: {text_layer_seconds:.2f}s ({pages_total / max(1e-9, text_layer_seconds):.0f} pages/sec)")
+    if paddle_seconds:
+        # Only present in layout files written by the current step1
+        print(f"   PaddleOCR layout: {paddle_seconds:.2f}s ({paddle_seconds / text_layer_seconds:.0f}x slower)")
+
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
+        json.dump({
+            "documents": len(per_document),
+            "pages": pages_total,
+            "element_agreement": round(agree / max(1, matched), 4),
+            "confusion": {f"{t}->{p}": n for (t, p), n in sorted(confusion.items())},
+            "heading_precision": round(precision, 4),
+            "heading_recall": round(recall, 4),
+            "heading_f1": round(f1, 4),
+            "low_confidence_pages": low_confidence,
+            "text_layer_seconds": round(text_layer_seconds, 3),
+            "paddle_layout_seconds": round(paddle_seconds, 3),
+            "per_document": per_document,
+        }, f, indent=2)
+    print(f"💾 Saved {OUTPUT_FILE}")
@@ -0,0 +1,182 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+from importlib import metadata
+import numpy as np
+
+from instrumentation import get_logger, metrics
+from encoder_backends import ENCODER_BACKEND, encoder_id, load_encoder
+
+# === CONFIG ===
+MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+CACHE_DIR = "embedding_cache"
+BATCH_SIZE = 64
+CACHE_MAX_SHARDS = 64  # shard files merged into one when loading more than this
+
+log = get_logger("embeddings")
+
+
+def text_hash(text):
+    """Content hash used as the cache key of a single text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def library_version():
+    try:
+        return metadata.version("sentence-transformers")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class EmbeddingEngine:
+    """Batched, normalized sentence encoding with an on-disk content-hash cache
+
+    The cache lives in cache_dir/<key>/ where the key covers the model name
+    and the sentence-transformers version, so a model or library change
+    never serves stale vectors. Each encode() that computes new vectors
+    appends one vectors-*.npy shard and one shards.jsonl line, so writes
+    cost O(new texts) instead of rewriting the whole cache. The model itself
+    is only loaded when at least one text is missing from the cache.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, batch_size=BATCH_SIZE, cache_dir=CACHE_DIR, model=None,
+                 backend=ENCODER_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self._model = model
+        # encode() mutates the cache; pipeline branches may share one engine
+        self.lock = threading.Lock()
+
+        self.cache_key = f"{encoder_id(model_name, backend)}|sentence-transformers=={library_version()}|normalized"
+        slug = hashlib.sha1(self.cache_key.encode("utf-8")).hexdigest()[:16]
+        self.cache_path = os.path.join(cache_dir, slug) if cache_dir else None
+
+        self.hashes = []
+        self.rows = {}
+        self.vectors = None  # grown by doubling; rows past len(self.hashes) are unused
+        self.shards = 0
+        self.hits = 0
+        self.misses = 0
+        self._load_cache()
+
+    @property
+    def model(self):
+        if self._model is None:
+            log.info(f"🔄 Loading model {encoder_id(self.model_name, self.backend)}...")
+            self._model = load_encoder(self.model_name, self.backend)
+        return self._model
+
+    def _load_cache(self):
+        if not self.cache_path:
+            return
+        shards_path = os.path.join(self.cache_path, "shards.jsonl")
+        if not os.path.exists(shards_path):
+            return
+        broken = False
+        try:
+            with open(shards_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except OSError as e:
+            log.warning(f"⚠️ Ignoring unreadable embedding cache {self.cache_path}: {e}")
+            return
+        for line in lines:
+            try:
+                shard = json.loads(line)
+                vectors = np.load(os.path.join(self.cache_path, shard["file"]))
+            except (OSError, ValueError, KeyError) as e:
+                # A run killed mid-write leaves a torn line or a missing shard
+                log.warning(f"⚠️ Skipping unreadable embedding cache shard in {self.cache_path}: {e}")
+                broken = True
+                continue
+            if shard.get("key") != self.cache_key or len(shard.get("hashes", [])) != len(vectors):
+                log.warning(f"⚠️ Skipping mismatched embedding cache shard {shard['file']}")
+                broken = True
+                continue
+            self._append(shard["hashes"], vectors)
+            self.shards += 1
+        log.info(f"📦 Loaded {len(self.hashes)} cached embeddings from {self.cache_path}")
+        if broken or self.shards > CACHE_MAX_SHARDS:
+            self._compact()
+
+    def _append(self, hashes, vectors):
+        """Add rows to the in-memory cache, growing the buffer geometrically"""
+        used = len(self.hashes)
+        if self.vectors is None or used + len(vectors) > len(self.vectors):
+            capacity = max(used + len(vectors), 2 * used, 1024)
+            grown = np.empty((capacity, vectors.shape[1]), dtype=np.float32)
+            if used:
+                grown[:used] = self.vectors[:used]
+            self.vectors = grown
+        self.vectors[used:used + len(vectors)] = vectors
+        for offset, h in enumerate(hashes):
+            self.rows[h] = used + offset
+        self.hashes.extend(hashes)
+
+    def _write_shard(self, hashes, vectors):
+        """vectors-*.npy for the rows plus its shards.jsonl line (shard first, so a listed shard exists)"""
+        name = f"vectors-{uuid.uuid4().hex}.npy"
+        tmp_path = os.path.join(self.cache_path, f"{name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, vectors)
+        os.replace(tmp_path, os.path.join(self.cache_path, name))
+        return json.dumps({"key": self.cache_key, "file": name, "hashes": list(hashes)}) + "\n"
+
+    def _save_shard(self, hashes, vectors):
+        if not self.cache_path:
+            return
+        os.makedirs(self.cache_path, exist_ok=True)
+        line = self._write_shard(hashes, vectors)
+        with open(os.path.join(self.cache_path, "shards.jsonl"), "a", encoding="utf-8") as f:
+            f.write(line)
+        self.shards += 1
+
+    def _compact(self):
+        """Rewrite the cache as one shard (drops torn lines and leftover files)"""
+        os.makedirs(self.cache_path, exist_ok=True)
+        line = self._write_shard(self.hashes, self.vectors[:len(self.hashes)]) if self.hashes else ""
+        tmp_path = os.path.join(self.cache_path, "shards.jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(line)
+        os.replace(tmp_path, os.path.join(self.cache_path, "shards.jsonl"))
+        keep = json.loads(line)["file"] if line else None
+        for name in os.listdir(self.cache_path):
+            if name.startswith("vectors") and name != keep:
+                os.remove(os.path.join(self.cache_path, name))
+        self.shards = 1 if line else 0
+        log.info(f"🗜️ Compacted embedding cache {self.cache_path} to one shard")
+
+    def encode(self, texts):
+        """Encode texts into an (n, dim) float32 matrix of unit vectors"""
+        with self.lock:
+            return self._encode(texts)
+
+    def _encode(self, texts):
+        hashes = [text_hash(t) for t in texts]
+
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in self.rows and h not in missing:
+                missing[h] = t
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        metrics.count("encode_cache_hits", len(texts) - len(missing))
+        if missing:
+            with metrics.timer("encode", profile=True, texts=len(missing)):
+                new_vectors = self.model.encode(
+                    list(missing.values()),
+                    batch_size=self.batch_size,
+                    normalize_embeddings=True,
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                ).astype(np.float32)
+            self._append(list(missing), new_vectors)
+            self._save_shard(list(missing), new_vectors)
+
+        log.debug(f"🧠 Encoded {len(missing)} new texts, reused {len(texts) - len(missing)} from cache")
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self.vectors[[self.rows[h] for h in hashes]]
@@ -0,0 +1,163 @@
+import os
+import json
+import numpy as np
+
+from instrumentation import metrics
+
+# Matrix dtype written by step3; "float16" halves the store size
+STORE_DTYPE = "float32"
+STREAM_BATCH_ROWS = 4096  # rows per batch for iter_store
+
+
+def store_paths(store_dir, collection):
+    """(matrix path, metadata sidecar path) for a collection"""
+    return (
+        os.path.join(store_dir, f"{collection}.npy"),
+        os.path.join(store_dir, f"{collection}.meta.json"),
+    )
+
+
+def save_store(store_dir, collection, vectors, records, dtype=STORE_DTYPE):
+    """Write a collection as an (n, dim) .npy matrix plus a columnar metadata sidecar
+
+    records[i] describes row i of vectors (doc/title/page/text...); it must not
+    contain the embedding itself.
+    """
+    vectors = np.asarray(vectors, dtype=dtype)
+    if len(vectors) != len(records):
+        raise ValueError(f"{collection}: {len(vectors)} vectors but {len(records)} records")
+
+    os.makedirs(store_dir, exist_ok=True)
+    matrix_path, meta_path = store_paths(store_dir, collection)
+
+    fields = []
+    for record in records:
+        for key in record:
+            if key not in fields:
+                fields.append(key)
+    columns = {key: [record.get(key) for record in records] for key in fields}
+
+    np.save(matrix_path, vectors)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "count": len(records),
+            "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+            "dtype": str(vectors.dtype),
+            "columns": columns
+        }, f, ensure_ascii=False, separators=(",", ":"))
+    return matrix_path
+
+
+@metrics.timed("load")
+def load_store(store_dir, collection, mmap=True):
+    """Return (vectors, records) for a collection
+
+    The matrix is memory-mapped read-only by default, so nothing is copied
+    until it is used. Falls back to the legacy <collection>.jsonl export when
+    no binary store exists.
+    """
+    matrix_path, meta_path = store_paths(store_dir, collection)
+    if not os.path.exists(matrix_path):
+        return load_jsonl(os.path.join(store_dir, f"{collection}.jsonl"))
+
+    vectors = np.load(matrix_path, mmap_mode="r" if mmap else None)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    columns = meta.get("columns", {})
+    records = [
+        {key: values[i] for key, values in columns.items()}
+        for i in range(meta.get("count", len(vectors)))
+    ]
+    return vectors, records
+
+
+def store_count(store_dir, collection):
+    """Row count of a binary store from its sidecar, or None for a JSONL export"""
+    _, meta_path = store_paths(store_dir, collection)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("count")
+
+
+def iter_store(store_dir, collection, batch_size=STREAM_BATCH_ROWS):
+    """(vectors, records) batches of at most batch_size rows, in row order
+
+    The binary matrix is memory-mapped and sliced, and a legacy JSONL export
+    is parsed batch by batch, so no more than one batch of embeddings is held
+    at a time. The metadata columns of a binary store (no embeddings) are read
+    whole up front, so their memory still grows with the store; records are
+    built per batch.
+    """
+    matrix_path, meta_path = store_paths(store_dir, collection)
+    if not os.path.exists(matrix_path):
+        yield from iter_jsonl(os.path.join(store_dir, f"{collection}.jsonl"), batch_size)
+        return
+
+    vectors = np.load(matrix_path, mmap_mode="r")
+    with open(meta_path, "r", encoding="utf-8") as f:
+        columns = json.load(f).get("columns", {})
+    for start in range(0, len(vectors), batch_size):
+        stop = min(start + batch_size, len(vectors))
+        records = [{key: values[i] for key, values in columns.items()} for i in range(start, stop)]
+        yield vectors[start:stop], records
+
+
+def iter_jsonl(jsonl_path, batch_size=STREAM_BATCH_ROWS):
+    """load_jsonl in (vectors, records) batches of at most batch_size rows"""
+    vectors, records = [], []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            embedding = entry.pop("embedding", None)
+            if not embedding:
+                continue
+            vectors.append(embedding)
+            records.append(entry)
+            if len(records) == batch_size:
+                yield np.asarray(vectors, dtype=np.float32), records
+                vectors, records = [], []
+    if records:
+        yield np.asarray(vectors, dtype=np.float32), records
+
+
+def load_jsonl(jsonl_path):
+    """Read a legacy JSONL export into (vectors, records)"""
+    vectors, records = [], []
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            embedding = entry.pop("embedding", None)
+            if not embedding:
+                continue
+            vectors.append(embedding)
+            records.append(entry)
+    return np.asarray(vectors, dtype=np.float32).reshape(len(records), -1), records
+
+
+def export_jsonl(jsonl_path, vectors, records, ensure_ascii=True):
+    """Write the legacy one-entry-per-line JSONL format (embedding as a float list)"""
+    with open(jsonl_path, "w", encoding="utf-8") as f_out:
+        for record, vector in zip(records, vectors):
+            entry = dict(record)
+            entry["embedding"] = np.asarray(vector, dtype=np.float32).tolist()
+            f_out.write(json.dumps(entry, ensure_ascii=ensure_ascii) + "\n")
+
+
+def list_collections(store_dir):
+    """Collections available in store_dir, as binary stores or JSONL exports"""
+    if not os.path.isdir(store_dir):
+        return []
+    names = set()
+    for file in os.listdir(store_dir):
+        if file.endswith(".meta.json"):
+            continue
+        if file.endswith(".npy") or file.endswith(".jsonl"):
+            names.add(os.path.splitext(file)[0])
+    return sorted(names)
@@ -0,0 +1,147 @@
+import os
+import json
+import numpy as np
+
+from instrumentation import get_logger
+
+# === CONFIG ===
+# Backend every step3/step4 script encodes with; stores and queries must agree
+ENCODER_BACKEND = "torch"
+BACKENDS = ["torch", "torch-int8", "onnx", "onnx-int8"]
+MODELS_DIR = "models"
+ONNX_OPSET = 14
+
+log = get_logger("encoder")
+
+
+def local_model_path(model_name):
+    """models/<name> when it exists, else the name itself (hub / local cache)"""
+    local = os.path.join(MODELS_DIR, model_name)
+    return local if os.path.isdir(local) else model_name
+
+
+def onnx_dir(model_name):
+    return os.path.join(MODELS_DIR, f"{os.path.basename(model_name.rstrip('/'))}-onnx")
+
+
+def encoder_id(model_name, backend=ENCODER_BACKEND):
+    """Model identifier for manifests and caches; plain name for the default torch backend"""
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def load_encoder(model_name, backend=ENCODER_BACKEND):
+    """An object with SentenceTransformer's encode() for the requested backend
+
+    torch       full-precision SentenceTransformer
+    torch-int8  the same model with Linear layers dynamically quantized to int8
+    onnx        the transformer exported to models/<name>-onnx/model.onnx, run by onnxruntime
+    onnx-int8   that export with int8 dynamically quantized weights
+    The ONNX export is created on first use and reused afterwards.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend {backend!r}, expected one of {BACKENDS}")
+
+    if backend.startswith("onnx"):
+        return OnnxSentenceEncoder(export_onnx(model_name, quantize=backend == "onnx-int8"))
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(local_model_path(model_name), device="cpu")
+    if backend == "torch-int8":
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def export_onnx(model_name, quantize=False):
+    """Export (once) the model's transformer to ONNX; returns the export folder"""
+    out_dir = onnx_dir(model_name)
+    model_path = os.path.join(out_dir, "model.onnx")
+    int8_path = os.path.join(out_dir, "model.int8.onnx")
+
+    if not os.path.exists(model_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        log.info(f"📦 Exporting {model_name} to {model_path}...")
+        st_model = SentenceTransformer(local_model_path(model_name), device="cpu")
+        transformer = st_model[0]
+        pooling = st_model[1] if len(st_model) > 1 else None
+        os.makedirs(out_dir, exist_ok=True)
+
+        dummy = transformer.tokenizer(["export"], return_tensors="pt")
+        input_names = list(dummy.keys())
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        transformer.auto_model.eval()
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer.auto_model,
+                tuple(dummy[name] for name in input_names),
+                model_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET,
+            )
+        transformer.tokenizer.save_pretrained(out_dir)
+        with open(os.path.join(out_dir, "encoder_config.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "source_model": model_name,
+                "input_names": input_names,
+                "max_seq_length": st_model.max_seq_length,
+                "pooling": "cls" if pooling is not None and getattr(pooling, "pooling_mode_cls_token", False) else "mean",
+                "normalize": any(type(m).__name__ == "Normalize" for m in st_model),
+            }, f, indent=2)
+
+    if quantize and not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        log.info(f"📦 Quantizing {model_path} to int8...")
+        quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+
+    return int8_path if quantize else model_path
+
+
+class OnnxSentenceEncoder:
+    """onnxruntime session + tokenizer + pooling, with SentenceTransformer's encode() signature"""
+
+    def __init__(self, model_path):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        export_dir = os.path.dirname(model_path)
+        with open(os.path.join(export_dir, "encoder_config.json"), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.max_seq_length = self.config["max_seq_length"]
+        self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        log.info(f"✅ Loaded ONNX encoder {model_path}")
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np")
+        feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, convert_to_numpy=True,
+               show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Length-sorted batches pad less, as SentenceTransformer does
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        chunks = [self._encode_batch([texts[i] for i in order[start:start + batch_size]])
+                  for start in range(0, len(texts), batch_size)]
+        vectors = np.empty((len(texts), chunks[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(chunks)
+
+        if normalize_embeddings or self.config.get("normalize"):
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors[0] if single else vectors
@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import cProfile
+import functools
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# === CONFIG ===
+# PIPELINE_LOG_LEVEL: DEBUG shows per-page / per-element detail, WARNING keeps only problems
+LOG_LEVEL = os.environ.get("PIPELINE_LOG_LEVEL", "INFO").upper()
+# PIPELINE_METRICS: JSON-lines file that every process appends its events to
+METRICS_PATH = os.environ.get("PIPELINE_METRICS")
+# PIPELINE_PROFILE: directory for one cProfile dump per profiled stage and process
+PROFILE_DIR = os.environ.get("PIPELINE_PROFILE")
+
+_logging_configured = False
+
+
+def get_logger(name):
+    """Logger writing bare messages to stdout at PIPELINE_LOG_LEVEL"""
+    global _logging_configured
+    if not _logging_configured:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root = logging.getLogger("pipeline")
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _logging_configured = True
+    return logging.getLogger(f"pipeline.{name}")
+
+
+def rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def peak_children_rss_mb():
+    """Largest peak RSS among this process's terminated children (e.g. pool workers)"""
+    if resource is None:
+        return 0.0
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+
+
+class Metrics:
+    """Per-process timers and counters, optionally streamed as JSON lines
+
+    timer(name) accumulates count / total seconds per name and, when a
+    metrics path is set, appends one {"event": "timer", ...} line per call.
+    Lines carry pid and a wall-clock timestamp so events from pool workers
+    can be merged and lined up with an external sampler such as py-spy.
+    """
+
+    def __init__(self, path=METRICS_PATH, profile_dir=PROFILE_DIR):
+        self.path = path
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self._file = None
+        self._file_pid = None
+
+    def configure(self, path=None, profile_dir=None):
+        """Set the metrics file / profile dir after import (e.g. from a CLI flag)"""
+        with self.lock:
+            # Also exported so spawned worker processes pick them up
+            if path is not None:
+                self.path = path
+                os.environ["PIPELINE_METRICS"] = path
+                self._close()
+            if profile_dir is not None:
+                self.profile_dir = profile_dir
+                os.environ["PIPELINE_PROFILE"] = profile_dir
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def emit(self, event, **fields):
+        if not self.path:
+            return
+        record = {"ts": round(time.time(), 6), "pid": os.getpid(), "event": event, **fields}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            # Forked workers must not share the parent's buffered handle
+            if self._file is None or self._file_pid != os.getpid():
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file_pid = os.getpid()
+            self._file.write(line)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, name, profile=False, **fields):
+        """Time a block; profile=True also dumps a cProfile file if PIPELINE_PROFILE is set"""
+        profiler = None
+        if profile and self.profile_dir:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}-{os.getpid()}-{int(time.time() * 1000)}.prof"))
+            with self.lock:
+                count, total = self.timers.get(name, (0, 0.0))
+                self.timers[name] = (count + 1, total + seconds)
+            self.emit("timer", name=name, seconds=round(seconds, 6), **fields)
+
+    def timed(self, name, profile=False):
+        """Decorator form of timer()"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, profile=profile):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "timers": {name: {"count": c, "seconds": round(t, 6)} for name, (c, t) in self.timers.items()},
+                "counters": dict(self.counters),
+                "rss_mb": round(rss_mb(), 1),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            }
+
+    def emit_summary(self, scope):
+        """One "summary" line with this process's totals, timers and RSS"""
+        self.emit("summary", scope=scope, **self.snapshot())
+
+
+# Process-wide instance used by every stage
+metrics = Metrics()
@@ -0,0 +1,143 @@
+import os
+import re
+import numpy as np
+
+from ranking_engine import top_k_indices
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how i in is it its of on or our that the their this to was
+were what when where which who will with you your we my me do does can into about over than then
+""".split())
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def index_path(store_dir, collection):
+    return os.path.join(store_dir, f"{collection}.bm25.npz")
+
+
+def stem(token):
+    """Plural folding only: "forms" -> "form", "policies" -> "policy" (not "class")"""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercased word tokens without stopwords, plurals folded"""
+    return [stem(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS and not t.isdigit()]
+
+
+class BM25Index:
+    """Array-backed inverted index with BM25 weights computed at build time
+
+    Postings are CSR arrays: term t owns rows[offsets[t]:offsets[t + 1]] and
+    the matching entries of weights, which already hold
+    idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len)). A query is
+    then one gather-and-add per query term.
+    """
+
+    def __init__(self, terms, idf, offsets, rows, weights, n_rows):
+        self.terms = terms          # vocabulary, index = term id
+        self.idf = idf              # (n_terms,) float32
+        self.offsets = offsets      # (n_terms + 1,) int64
+        self.rows = rows            # (n_postings,) int32 row ids
+        self.weights = weights      # (n_postings,) float32 BM25 contributions
+        self.n_rows = n_rows
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+
+    @classmethod
+    def build(cls, texts, k1=K1, b=B):
+        term_ids, postings = {}, []  # postings: (term id, row, tf)
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.append((term_ids.setdefault(token, len(term_ids)), row, tf))
+
+        n, n_terms = len(texts), len(term_ids)
+        if postings:
+            term_col, row_col, tf_col = (np.array(c) for c in zip(*postings))
+        else:
+            term_col = row_col = tf_col = np.zeros(0, dtype=np.int64)
+        order = np.lexsort((row_col, term_col))
+        term_col, row_col, tf = term_col[order], row_col[order], tf_col[order].astype(np.float32)
+
+        df = np.bincount(term_col, minlength=n_terms)
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_len = float(lengths.mean()) if n else 0.0
+        norm = k1 * (1.0 - b + b * lengths[row_col] / max(avg_len, 1e-9))
+        weights = (idf[term_col] * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32)
+        offsets = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        terms = [None] * n_terms
+        for token, i in term_ids.items():
+            terms[i] = token
+        return cls(terms, idf, offsets, row_col.astype(np.int32), weights, n)
+
+    def scores(self, query):
+        """(n_rows,) BM25 score of every row for a query string"""
+        out = np.zeros(self.n_rows, dtype=np.float32)
+        for token in set(tokenize(query)):
+            t = self.term_ids.get(token)
+            if t is not None:
+                a, b = self.offsets[t], self.offsets[t + 1]
+                out[self.rows[a:b]] += self.weights[a:b]
+        return out
+
+    def search(self, query, k):
+        """(row ids, scores) of the k best rows with a non-zero score, best first"""
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores)
+        if len(hits) == 0:
+            return hits, scores[hits]
+        best = hits[top_k_indices(scores[hits], min(k, len(hits)))]
+        return best, scores[best]
+
+    def save(self, path):
+        np.savez(path, terms=np.array(self.terms, dtype=str), idf=self.idf, offsets=self.offsets,
+                 rows=self.rows, weights=self.weights, n_rows=np.int64(self.n_rows))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["terms"].tolist(), data["idf"], data["offsets"], data["rows"], data["weights"],
+                   int(data["n_rows"]))
+
+
+def record_text(record):
+    """Indexed text of a store record: its title plus its body"""
+    title = record.get("section_title") or record.get("title") or ""
+    body = record.get("content") or record.get("text") or ""
+    return f"{title}\n{body}"
+
+
+def build_lexical_index(store_dir, collection, records):
+    """Build and save the BM25 index that goes with a collection store (row ids = store rows)"""
+    index = BM25Index.build([record_text(r) for r in records])
+    path = index_path(store_dir, collection)
+    index.save(path)
+    print(f"🔤 Built BM25 index with {len(index.terms)} terms: {path}")
+    return index
+
+
+def load_lexical_index(store_dir, collection):
+    """The collection's BM25 index, or None when it has not been built"""
+    path = index_path(store_dir, collection)
+    return BM25Index.load(path) if os.path.exists(path) else None
+
+
+def remove_lexical_index(store_dir, collection):
+    """Drop a collection's BM25 index so a rebuilt store never pairs with stale row ids"""
+    path = index_path(store_dir, collection)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,150 @@
+import re
+import time
+import zlib
+import numpy as np
+
+from instrumentation import metrics
+
+# === CONFIG ===
+NUM_PERM = 128            # MinHash permutations per signature
+BANDS = 32                # LSH bands of NUM_PERM // BANDS rows; candidates from ~(1/BANDS)^(1/rows) = 0.42 Jaccard
+SHINGLE_WORDS = 5         # word n-gram size
+JACCARD_THRESHOLD = 0.8   # estimated Jaccard a candidate needs to join a cluster
+SEED = 1
+
+PRIME = np.uint64((1 << 32) + 15)  # smallest prime above 2^32
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """Distinct 32-bit hashes of the text's word n-grams (the whole text when shorter)"""
+    words = TOKEN_PATTERN.findall(text.lower())
+    grams = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH banding over texts added one at a time
+
+    Only cluster representatives are indexed. A new text is compared with
+    the representatives that share at least one band bucket with it, and
+    joins the most similar one whose estimated Jaccard similarity reaches
+    the threshold; otherwise it becomes a representative itself. Each add is
+    one signature plus a few bucket lookups, so clustering stays far below
+    the all-pairs cost.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=JACCARD_THRESHOLD,
+                 shingle_words=SHINGLE_WORDS, seed=SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm={num_perm} is not a multiple of bands={bands}")
+        rng = np.random.RandomState(seed)
+        # (a * h + b) mod PRIME with a, b, h < 2^32 stays inside uint64
+        self.a = rng.randint(1, 2**32, size=num_perm, dtype=np.uint64)[:, None]
+        self.b = rng.randint(0, 2**32, size=num_perm, dtype=np.uint64)[:, None]
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_words = shingle_words
+        self.seed = seed
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = []  # one per representative
+
+    @property
+    def params(self):
+        """Settings that change the clusters (for the manifest)"""
+        return {"num_perm": self.num_perm, "bands": self.bands, "threshold": self.threshold,
+                "shingle_words": self.shingle_words, "seed": self.seed}
+
+    def signature(self, text):
+        hashes = shingles(text, self.shingle_words)
+        return ((self.a * hashes[None, :] + self.b) % PRIME).min(axis=1)
+
+    def add(self, text):
+        """Representative id the text duplicates, or None when it starts a new cluster"""
+        signature = self.signature(text)
+        keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+        candidates = {rep for band, key in enumerate(keys) for rep in self.buckets[band].get(key, ())}
+        best, best_similarity = None, 0.0
+        for rep in sorted(candidates):
+            similarity = float(np.mean(self.signatures[rep] == signature))
+            if similarity >= self.threshold and similarity > best_similarity:
+                best, best_similarity = rep, similarity
+        if best is not None:
+            return best
+
+        rep = len(self.signatures)
+        self.signatures.append(signature)
+        for band, key in enumerate(keys):
+            self.buckets[band].setdefault(key, []).append(rep)
+        return None
+
+
+class NearDuplicateFilter:
+    """Near-duplicate folding for records that arrive over time (streamed pages)
+
+    add() returns the records that start a new cluster, passed through
+    expand (e.g. chunking) when given, and remembers what it returned for
+    each representative. A later copy is not returned; its fields (all but
+    text_field) are appended to the "duplicates" list shared by the records
+    returned for its representative, so they gain the back-reference even
+    after they were handed on.
+    """
+
+    def __init__(self, index=None, text_field="text", expand=None):
+        self.index = index or NearDuplicateIndex()
+        self.text_field = text_field
+        self.expand = expand
+        self.emitted = []  # records returned for each representative id
+        self.records = 0
+        self.dropped = []
+        self.seconds = 0.0
+
+    def add(self, records):
+        start = time.perf_counter()
+        out = []
+        for record in records:
+            self.records += 1
+            rep = self.index.add(record[self.text_field])
+            if rep is None:
+                emitted = self.expand([record]) if self.expand is not None else [dict(record)]
+                self.emitted.append(emitted)
+                out.extend(emitted)
+                continue
+            targets = self.emitted[rep]
+            if targets:
+                if "duplicates" not in targets[0]:
+                    shared = []
+                    for target in targets:
+                        target["duplicates"] = shared
+                targets[0]["duplicates"].append({k: v for k, v in record.items() if k != self.text_field})
+            self.dropped.append(record)
+        self.seconds += time.perf_counter() - start
+        return out
+
+    def stats(self):
+        """Counts, dedup ratio and time spent so far"""
+        return {
+            "records": self.records,
+            "representatives": len(self.emitted),
+            "duplicates": len(self.dropped),
+            "ratio": round(len(self.dropped) / self.records, 4) if self.records else 0.0,
+            "ms": round(self.seconds * 1000, 3),
+        }
+
+
+@metrics.timed("near_dedup")
+def dedup_records(records, text_field="text", index=None):
+    """(representatives, dropped, stats): near-duplicate records folded into their first copy
+
+    A representative that stands for other records gets a "duplicates" list
+    with their fields (all but text_field), so every source location stays
+    traceable; the input records are not modified. stats holds the counts,
+    the dedup ratio and the time taken. index is a fresh NearDuplicateIndex,
+    for other settings than the defaults.
+    """
+    dedup = NearDuplicateFilter(index, text_field)
+    representatives = dedup.add(records)
+    metrics.count("near_duplicates", len(dedup.dropped))
+    return representatives, dedup.dropped, dedup.stats()
@@ -0,0 +1,162 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+from embedding_store import load_store, save_store, store_paths
+
+MANIFEST_PATH = "pipeline_manifest.json"
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_hash(paths):
+    """Combined content hash of several files (order-independent)"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        digest.update(file_hash(path).encode("ascii"))
+    return digest.hexdigest()
+
+
+class PipelineManifest:
+    """Which output came from which input, keyed on content hash + stage params
+
+    Layout: {"stages": {stage: {key: {"hash", "params", "outputs", ...}}}}.
+    Keys are input paths (or collection/doc for per-collection stages). An
+    entry is current when the input hash and params match and every recorded
+    output still exists.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.stages = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.stages = json.load(f).get("stages", {})
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ Ignoring unreadable manifest {path}: {e}")
+
+    def entry(self, stage, key):
+        return self.stages.get(stage, {}).get(key)
+
+    def is_current(self, stage, key, input_hash, params):
+        entry = self.entry(stage, key)
+        return (
+            entry is not None
+            and entry.get("hash") == input_hash
+            and entry.get("params") == params
+            and all(os.path.exists(p) for p in entry.get("outputs", []))
+        )
+
+    def record(self, stage, key, input_hash, params, outputs, **extra):
+        with self.lock:
+            self.stages.setdefault(stage, {})[key] = {
+                "hash": input_hash,
+                "params": params,
+                "outputs": list(outputs),
+                **extra
+            }
+
+    def forget(self, stage, key):
+        with self.lock:
+            self.stages.get(stage, {}).pop(key, None)
+
+    def keys(self, stage, collection=None):
+        entries = self.stages.get(stage, {})
+        if collection is None:
+            return list(entries)
+        return [k for k, e in entries.items() if e.get("collection") == collection]
+
+    def save(self):
+        with self.lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stages": self.stages}, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def update_collection_store(manifest, stage, store_dir, collection, docs, params,
+                            collect_records, text_field, engine, dtype):
+    """Rebuild a collection's embedding store, recomputing only changed documents
+
+    docs is a list of (doc_key, doc_path, input_hash) in store order.
+    collect_records(doc_path) returns the records of one document; their
+    text_field is what gets encoded. Rows of unchanged documents are copied
+    from the previous store using the row ranges kept in the manifest.
+    Returns (vectors, records, changed_docs), or None when everything is
+    already current.
+    """
+    matrix_path, meta_path = store_paths(store_dir, collection)
+    previous = None
+    if os.path.exists(matrix_path):
+        # Read fully: the same file is overwritten below
+        previous = load_store(store_dir, collection, mmap=False)
+
+    def manifest_key(doc_key):
+        return f"{collection}/{doc_key}"
+
+    current_keys = {manifest_key(doc_key) for doc_key, _, _ in docs}
+    removed = [k for k in manifest.keys(stage, collection) if k not in current_keys]
+
+    # Row ranges are only trusted when they tile the previous store exactly
+    reusable = {}
+    if previous is not None:
+        for doc_key, _, input_hash in docs:
+            key = manifest_key(doc_key)
+            entry = manifest.entry(stage, key)
+            if entry and manifest.is_current(stage, key, input_hash, params):
+                reusable[doc_key] = entry["rows"]
+        ranges = [manifest.entry(stage, k)["rows"] for k in manifest.keys(stage, collection)]
+        total = sum(end - start for start, end in ranges)
+        if total != len(previous[1]):
+            reusable = {}
+
+    changed = [doc_key for doc_key, _, _ in docs if doc_key not in reusable]
+    if previous is not None and not changed and not removed:
+        return None
+
+    # Collect changed documents first so they are encoded in one batch
+    doc_records = {}
+    for doc_key, doc_path, _ in docs:
+        if doc_key not in reusable:
+            doc_records[doc_key] = collect_records(doc_path)
+    new_records = [r for doc_key in changed for r in doc_records[doc_key]]
+    new_vectors = engine.encode([r[text_field] for r in new_records]) if new_records else None
+
+    vectors, records, new_offset = [], [], 0
+    row_ranges = {}
+    for doc_key, _, _ in docs:
+        start = len(records)
+        if doc_key in reusable:
+            a, b = reusable[doc_key]
+            vectors.append(previous[0][a:b].astype(np.float32))
+            records.extend(previous[1][a:b])
+        else:
+            count = len(doc_records[doc_key])
+            if count:
+                vectors.append(new_vectors[new_offset:new_offset + count])
+            records.extend(doc_records[doc_key])
+            new_offset += count
+        row_ranges[doc_key] = [start, len(records)]
+
+    vectors = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    save_store(store_dir, collection, vectors, records, dtype=dtype)
+
+    for key in removed:
+        manifest.forget(stage, key)
+    for doc_key, _, input_hash in docs:
+        manifest.record(stage, manifest_key(doc_key), input_hash, params,
+                        [matrix_path, meta_path], collection=collection, rows=row_ranges[doc_key])
+    manifest.save()
+    return vectors, records, changed
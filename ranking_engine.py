@@ -0,0 +1,134 @@
+import numpy as np
+
+# Same defaults as step4_ranking.py
+TOP_K = 10
+REDUNDANCY_THRESHOLD = 0.9
+# Hybrid ranking: share of the fused score that comes from BM25
+LEXICAL_WEIGHT = 0.3
+
+
+def normalize_rows(matrix):
+    """float32 copy of matrix with every row scaled to unit length"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def score(query_vector, unit_matrix):
+    """Cosine similarity of one query against every row of a normalized matrix"""
+    return unit_matrix @ normalize_rows(query_vector)[0]
+
+
+def top_k_indices(scores, k):
+    """Indices of the k best scores, best first (ties keep corpus order)"""
+    n = len(scores)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= n:
+        candidates = np.arange(n)
+    else:
+        # argpartition picks arbitrary rows among ties at the cut; take the earliest
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        better = np.flatnonzero(scores > kth)
+        candidates = np.concatenate([better, np.flatnonzero(scores == kth)[:k - len(better)]])
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def select_diverse(unit_matrix, scores, k=TOP_K, threshold=REDUNDANCY_THRESHOLD):
+    """Greedy top-k that skips rows too similar to an already selected row
+
+    Equivalent to walking all rows by descending score and dropping any whose
+    cosine to a selected row exceeds threshold, but only the best-scoring
+    candidates are sorted and a running max-similarity vector is updated with
+    one matrix-vector product per pick. The candidate pool grows only when
+    redundancy drops too many of them.
+    """
+    n = len(scores)
+    if n == 0 or k <= 0:
+        return []
+
+    pool_size = min(n, max(4 * k, 64))
+    while True:
+        candidates = top_k_indices(scores, pool_size)
+        candidate_matrix = unit_matrix[candidates]
+        max_similarity = np.full(len(candidates), -np.inf, dtype=np.float32)
+        selected = []
+
+        for position, index in enumerate(candidates):
+            if max_similarity[position] > threshold:
+                continue
+            selected.append(int(index))
+            if len(selected) == k:
+                return selected
+            np.maximum(max_similarity, candidate_matrix @ unit_matrix[index], out=max_similarity)
+
+        if pool_size >= n:
+            return selected
+        pool_size = min(n, pool_size * 4)
+
+
+def score_many(query_matrix, unit_matrix):
+    """(queries, corpus) cosine matrix from one query-matrix x corpus-matrix product"""
+    return normalize_rows(query_matrix) @ unit_matrix.T
+
+
+def parse_query(entry):
+    """(persona, job) from a query entry
+
+    Accepts the flat {"persona": str, "job": str} form as well as the
+    challenge1b_input.json form {"persona": {"role": ...},
+    "job_to_be_done": {"task": ...}}.
+    """
+    persona = entry.get("persona", "")
+    if isinstance(persona, dict):
+        persona = persona.get("role", "")
+    job = entry.get("job", entry.get("job_to_be_done", ""))
+    if isinstance(job, dict):
+        job = job.get("task", "")
+    return persona or "", job or ""
+
+
+def query_text(persona, job):
+    """Query string the step4 scripts encode"""
+    return f"{persona}. {job}"
+
+
+def aggregate_scores(scores, groups, n_groups, method="max"):
+    """Per-group scores from per-row scores (e.g. chunks -> sections); method is max or mean"""
+    if method == "max":
+        out = np.full(n_groups, -np.inf, dtype=np.float32)
+        np.maximum.at(out, groups, scores)
+        return out
+    if method == "mean":
+        counts = np.bincount(groups, minlength=n_groups)
+        return (np.bincount(groups, weights=scores, minlength=n_groups) / np.maximum(counts, 1)).astype(np.float32)
+    raise ValueError(f"Unknown aggregation {method!r}, expected 'max' or 'mean'")
+
+
+def fuse_scores(dense, lexical, weight=LEXICAL_WEIGHT, lexical_max=None):
+    """Convex mix of cosine scores and BM25 scores scaled to [0, 1] by their maximum
+
+    lexical_max overrides that maximum, for scoring a slice of the rows.
+    """
+    top = lexical_max if lexical_max is not None else (float(lexical.max()) if len(lexical) else 0.0)
+    if top <= 0:
+        return dense
+    return ((1.0 - weight) * dense + weight * (lexical / top)).astype(np.float32)
+
+
+def lexical_candidates(lexical_scores, limit, k):
+    """Rows worth scoring densely: the `limit` best BM25 matches, or None for all rows
+
+    None when limit is None, the collection is small enough to score fully
+    or fewer than k rows share a term with the query.
+    """
+    if limit is None:
+        return None
+    hits = np.flatnonzero(lexical_scores > 0)
+    if len(lexical_scores) <= limit or len(hits) < k:
+        return None
+    return np.sort(hits[top_k_indices(lexical_scores[hits], min(limit, len(hits)))])
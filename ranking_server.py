@@ -0,0 +1,207 @@
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import numpy as np
+
+import step4_ranking
+import step4_ranking_text
+from embedding_store import load_store, list_collections
+from ann_index import load_index
+from lexical_index import load_lexical_index
+from reranker import Reranker, RERANKER_MODEL
+from ranking_engine import query_text
+from encoder_backends import ENCODER_BACKEND, encoder_id, load_encoder
+
+# === CONFIG ===
+HOST = "127.0.0.1"
+PORT = 8765
+MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+# Latencies kept per endpoint for the p50/p99 figures
+LATENCY_WINDOW = 10000
+
+SOURCES = {
+    "sections": step4_ranking.INPUT_DIR,
+    "texts": step4_ranking_text.INPUT_DIR,
+}
+
+
+class UnknownStore(LookupError):
+    """The requested source or collection has no store (HTTP 404)"""
+
+
+class RankingService:
+    """MiniLM model and embedding stores held warm for repeated rank() calls"""
+
+    def __init__(self, model_name=MODEL_NAME, preload=True, backend=ENCODER_BACKEND, reranker=None):
+        print(f"🔄 Loading model {encoder_id(model_name, backend)}...")
+        self.model = load_encoder(model_name, backend)
+        self.reranker = reranker
+        self.encode_lock = threading.Lock()
+        self.store_lock = threading.Lock()
+        self.stores = {}  # (source, collection) -> (vectors, records, ann_index, lexical_index)
+        self.latencies = {}
+        self.request_counts = {}
+        self.metrics_lock = threading.Lock()  # handler threads record latencies concurrently
+        if preload:
+            for source, store_dir in SOURCES.items():
+                for collection in list_collections(store_dir):
+                    self.get_store(source, collection)
+        print(f"✅ Ranking service ready ({len(self.stores)} stores loaded)")
+
+    def get_store(self, source, collection):
+        key = (source, collection)
+        with self.store_lock:
+            if key not in self.stores:
+                store_dir = SOURCES[source]
+                if collection not in list_collections(store_dir):
+                    raise UnknownStore(f"Unknown collection for {source}: {collection}")
+                vectors, records = load_store(store_dir, collection)
+                ann_index = load_index(store_dir, collection) if source == "sections" else None
+                lexical_index = load_lexical_index(store_dir, collection)
+                self.stores[key] = (vectors, records, ann_index, lexical_index)
+                print(f"📦 Loaded {source}/{collection}: {len(records)} rows")
+            return self.stores[key]
+
+    def rank(self, collection, persona, job, k=step4_ranking.TOP_K, source="sections"):
+        """Same JSON as output_rankings/ranked_*.json (or output_rankings_text for texts)"""
+        if source not in SOURCES:
+            raise UnknownStore(f"Unknown source: {source}")
+        vectors, records, ann_index, lexical_index = self.get_store(source, collection)
+        query = query_text(persona, job)
+        with self.encode_lock:
+            query_emb = self.model.encode([query])[0]
+        if source == "sections":
+            if self.reranker is None:
+                return step4_ranking.rank_sections(query_emb, vectors, records, ann_index, k,
+                                                   lexical_index=lexical_index, query=query)
+            sections = step4_ranking.rank_sections(query_emb, vectors, records, ann_index, max(k, self.reranker.top_n),
+                                                   lexical_index=lexical_index, query=query)
+            return step4_ranking.rerank_sections(self.reranker, query, sections, k)
+        return step4_ranking_text.rank_texts(query_emb, vectors, records, lexical_index=lexical_index, query=query)[:k]
+
+    def record_latency(self, endpoint, seconds):
+        with self.metrics_lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+            self.latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds * 1000)
+
+    def metrics(self):
+        with self.metrics_lock:
+            snapshot = {endpoint: (self.request_counts[endpoint], list(window))
+                        for endpoint, window in self.latencies.items()}
+        report = {}
+        for endpoint, (requests, window) in snapshot.items():
+            values = np.asarray(window, dtype=np.float64)
+            report[endpoint] = {
+                "requests": requests,
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p99_ms": round(float(np.percentile(values, 99)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return report
+
+
+def parse_params(params):
+    """(collection, persona, job, k, source) from a query string or JSON body; ValueError if malformed"""
+    if not isinstance(params, dict):
+        raise ValueError("Request body must be a JSON object")
+    strings = {}
+    for key, default in (("collection", ""), ("persona", ""), ("job", ""), ("source", "sections")):
+        value = params.get(key, default)
+        if not isinstance(value, str):
+            raise ValueError(f"{key} must be a string")
+        strings[key] = value
+    k = params.get("k", step4_ranking.TOP_K)
+    if isinstance(k, str) and k.strip().lstrip("+").isdigit():
+        k = int(k)
+    if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+        raise ValueError(f"k must be a positive integer, got {k!r}")
+    return strings["collection"], strings["persona"], strings["job"], k, strings["source"]
+
+
+class RankingHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rank(self, params):
+        start = time.perf_counter()
+        try:
+            result = self.service.rank(*parse_params(params))
+        except UnknownStore as e:
+            self._send_json(404, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            # Never leave the client without a response
+            print(f"❌ /rank failed: {e!r}")
+            self._send_json(500, {"error": "Internal server error"})
+            return
+        self.service.record_latency("rank", time.perf_counter() - start)
+        self._send_json(200, result)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/rank":
+            self._rank({key: values[0] for key, values in parse_qs(url.query).items()})
+        elif url.path == "/metrics":
+            self._send_json(200, self.service.metrics())
+        elif url.path == "/health":
+            self._send_json(200, {"status": "ok", "stores": len(self.service.stores)})
+        else:
+            self._send_json(404, {"error": f"Unknown path: {url.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/rank":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"error": f"Invalid JSON body: {e}"})
+            return
+        self._rank(params)
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the cost of a warm query
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve step4 rankings from a warm model")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--lazy", action="store_true", help="Load stores on first use instead of at startup")
+    parser.add_argument("--rerank", nargs="?", const=RERANKER_MODEL, metavar="MODEL",
+                        help=f"Rerank section results (default model: {RERANKER_MODEL})")
+    args = parser.parse_args()
+
+    reranker = None
+    if args.rerank:
+        try:
+            reranker = Reranker(args.rerank)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+    RankingHandler.service = RankingService(preload=not args.lazy, reranker=reranker)
+    server = ThreadingHTTPServer((args.host, args.port), RankingHandler)
+    print(f"🚀 Ranking server listening on http://{args.host}:{args.port}")
+    print("   GET /rank?collection=...&persona=...&job=...&k=10[&source=texts]")
+    print("   GET /metrics (p50/p99 latency), GET /health")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Shutting down")
+    finally:
+        server.server_close()
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+from encoder_backends import MODELS_DIR
+from embedding_engine import text_hash
+from instrumentation import get_logger, metrics
+
+# === CONFIG ===
+# "cross-encoder/<name>" (sentence-transformers CrossEncoder) or a causal LM folder such as Qwen2-0.5B
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+LLM_RERANKER_MODEL = "Qwen2-0.5B"  # models/Qwen2-0.5B (weights must be downloaded into it)
+RERANK_TOP_N = 20         # cosine / hybrid candidates that get rescored
+RERANK_BATCH = 8
+LATENCY_BUDGET_MS = 1500  # per query; past it the remaining candidates keep their first-stage order
+MAX_PASSAGE_CHARS = 2000  # long sections are cut before tokenization
+CACHE_DIR = "embedding_cache"
+CACHE_MAX_ENTRIES = 100000  # (query, passage) scores kept; the least recently used are dropped
+
+log = get_logger("rerank")
+
+LLM_PROMPT = (
+    "Judge whether the passage is useful for the request.\n"
+    "Request: {query}\n"
+    "Passage: {passage}\n"
+    "Is the passage useful for the request? Answer Yes or No.\n"
+    "Answer:"
+)
+
+
+def local_weights(model_name):
+    """models/<name> when it holds model weights, else None
+
+    Rerankers only load from models/ (never the hub), so a missing download
+    fails up front instead of reaching for the network mid-query.
+    """
+    path = os.path.join(MODELS_DIR, model_name)
+    if not os.path.isdir(path):
+        return None
+    for file in os.listdir(path):
+        if file.endswith(".safetensors") or (file.startswith("pytorch_model") and file.endswith(".bin")):
+            return path
+    return None
+
+
+class CrossEncoderScorer:
+    """sentence-transformers CrossEncoder: one relevance logit per (query, passage)"""
+
+    def __init__(self, path):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(path, max_length=512, device="cpu")
+
+    def score(self, query, passages, batch_size=RERANK_BATCH):
+        pairs = [(query, p) for p in passages]
+        return np.asarray(self.model.predict(pairs, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
+
+
+class CausalLMScorer:
+    """Local causal LM (Qwen2-0.5B) as a pointwise judge: logit(" Yes") - logit(" No")
+
+    Runs in float32 on CPU; 4-bit bitsandbytes loading needs a GPU.
+    """
+
+    def __init__(self, path):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        # The answer token is the last one, so pad on the left
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(path, torch_dtype=torch.float32)
+        self.model.eval()
+        self.yes_id = self.tokenizer.encode(" Yes", add_special_tokens=False)[0]
+        self.no_id = self.tokenizer.encode(" No", add_special_tokens=False)[0]
+
+    def score(self, query, passages, batch_size=RERANK_BATCH):
+        prompts = [LLM_PROMPT.format(query=query, passage=p) for p in passages]
+        # Passages are pre-cut to MAX_PASSAGE_CHARS, so the prompt's "Answer:" tail is never truncated
+        tokens = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        with self.torch.no_grad():
+            logits = self.model(**tokens).logits[:, -1, :]
+        return (logits[:, self.yes_id] - logits[:, self.no_id]).float().numpy()
+
+
+def require_weights(model_name):
+    """local_weights(model_name), or FileNotFoundError saying where to put them"""
+    path = local_weights(model_name)
+    if path is None:
+        raise FileNotFoundError(f"No weights for reranker {model_name} in {os.path.join(MODELS_DIR, model_name)}/; "
+                                f"download them there or turn reranking off")
+    return path
+
+
+def load_scorer(model_name):
+    path = require_weights(model_name)
+    if model_name.startswith("cross-encoder/") or "cross-encoder" in model_name.lower():
+        return CrossEncoderScorer(path)
+    return CausalLMScorer(path)
+
+
+class Reranker:
+    """Second-stage rescoring of the first-stage top-N under a latency budget
+
+    Scores are cached per (query, passage) content hash, so repeated queries
+    cost no model calls. New scores are appended to a JSONL file; the cache
+    keeps the CACHE_MAX_ENTRIES most recently used and the file is rewritten
+    only when it holds twice that many lines. Without a scorer, the model's
+    local weights must exist (FileNotFoundError otherwise). Candidates are scored in first-stage order,
+    one batch at a time; when the next batch would overrun the budget, the
+    scored prefix is reordered and the rest keeps its first-stage order.
+    """
+
+    def __init__(self, model_name=RERANKER_MODEL, top_n=RERANK_TOP_N, batch_size=RERANK_BATCH,
+                 budget_ms=LATENCY_BUDGET_MS, cache_dir=CACHE_DIR, scorer=None):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self._scorer = scorer
+        self.lock = threading.Lock()
+        if scorer is None:
+            require_weights(model_name)  # fail now, not on the first query
+
+        slug = hashlib.sha1(f"rerank|{model_name}".encode("utf-8")).hexdigest()[:16]
+        self.cache_path = os.path.join(cache_dir, f"rerank-{slug}.jsonl") if cache_dir else None
+        self.cache = {}  # key -> score, least recently used first
+        self.file_lines = 0
+        self._load_cache()
+
+    @property
+    def scorer(self):
+        if self._scorer is None:
+            log.info(f"🔄 Loading reranker {self.model_name}...")
+            self._scorer = load_scorer(self.model_name)
+        return self._scorer
+
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        broken = False
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self.file_lines += 1
+                    try:
+                        key, value = json.loads(line)
+                    except ValueError:
+                        broken = True  # torn line from a killed run
+                        continue
+                    self.cache.pop(key, None)
+                    self.cache[key] = value
+        except OSError as e:
+            log.warning(f"⚠️ Ignoring unreadable rerank cache {self.cache_path}: {e}")
+            return
+        self._evict()
+        if broken or self.file_lines > 2 * CACHE_MAX_ENTRIES:
+            self._compact()
+
+    def _evict(self):
+        while len(self.cache) > CACHE_MAX_ENTRIES:
+            del self.cache[next(iter(self.cache))]
+
+    def _compact(self):
+        """Rewrite the file with the entries still cached"""
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps([key, value]) + "\n" for key, value in self.cache.items())
+        os.replace(tmp_path, self.cache_path)
+        self.file_lines = len(self.cache)
+
+    def _save_scores(self, entries):
+        """Append new (key, score) pairs; O(new) unless the file is due for compaction"""
+        self._evict()
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        if self.file_lines + len(entries) > 2 * CACHE_MAX_ENTRIES:
+            self._compact()
+            return
+        with open(self.cache_path, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps([key, value]) + "\n" for key, value in entries)
+        self.file_lines += len(entries)
+
+    def rerank(self, query, candidates, passage_of):
+        """candidates (first-stage order) reordered by reranker score
+
+        passage_of(candidate) gives the text to judge. Returns (reordered
+        candidates, scores aligned with them or None where unscored, stats).
+        """
+        with self.lock:
+            return self._rerank(query, candidates, passage_of)
+
+    def _rerank(self, query, candidates, passage_of):
+        head, tail = candidates[:self.top_n], candidates[self.top_n:]
+        passages = [passage_of(c)[:MAX_PASSAGE_CHARS] for c in head]
+        query_key = text_hash(query)
+        keys = [f"{query_key}:{text_hash(p)}" for p in passages]
+        scores = [self.cache.get(k) for k in keys]
+        for k, s in zip(keys, scores):
+            if s is not None:
+                self.cache[k] = self.cache.pop(k)  # most recently used
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            self.scorer  # a one-off model load is not charged to the query budget
+        start = time.perf_counter()
+        cache_hits = len(head) - len(missing)
+        batch_ms, exhausted, computed = 0.0, False, []
+        for offset in range(0, len(missing), self.batch_size):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms + batch_ms > self.budget_ms:
+                exhausted = True
+                break
+            batch = missing[offset:offset + self.batch_size]
+            batch_start = time.perf_counter()
+            with metrics.timer("rerank_batch", profile=True, pairs=len(batch)):
+                batch_scores = self.scorer.score(query, [passages[i] for i in batch], self.batch_size)
+            batch_ms = (time.perf_counter() - batch_start) * 1000
+            for i, s in zip(batch, batch_scores):
+                scores[i] = float(s)
+                self.cache[keys[i]] = float(s)
+                computed.append((keys[i], float(s)))
+        if computed:
+            self._save_scores(computed)
+
+        # Rescore the longest fully scored prefix; the rest stays in first-stage order
+        prefix = next((i for i, s in enumerate(scores) if s is None), len(scores))
+        order = sorted(range(prefix), key=lambda i: -scores[i]) + list(range(prefix, len(head)))
+        stats = {
+            "candidates": len(head),
+            "reranked": prefix,
+            "cache_hits": cache_hits,
+            "budget_exhausted": exhausted,
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+        metrics.count("rerank_cache_hits", cache_hits)
+        if exhausted:
+            log.warning(f"⏱️ Rerank budget of {self.budget_ms} ms exhausted after {prefix}/{len(head)} candidates")
+        return [head[i] for i in order] + tail, [scores[i] for i in order] + [None] * len(tail), stats
@@ -0,0 +1,536 @@
+import os
+import json
+import time
+import argparse
+import logging
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+import step4_ranking
+import step4_ranking_text
+from step2_extract_only_headings import extract_headings, OUTPUT_DIR as HEADINGS_DIR
+from step2_extract_only_texts import build_sections, SectionAssembler, OUTPUT_ROOT as TEXTS_DIR
+from step3_embeddings import (sections_from_layout, LayoutSectionAssembler, BUILD_LEXICAL_INDEX,
+                             OUTPUT_DIR as SECTION_STORE_DIR)
+from step3_embeddings_text import (texts_from_sections, CHUNK_TEXTS, NEAR_DEDUP, NEAR_DEDUP_ACROSS_DOCS,
+                                   OUTPUT_DIR as TEXT_STORE_DIR)
+from near_dedup import NearDuplicateFilter
+from text_chunking import TextChunker
+from step4_challenge_output import (challenge_output, load_challenge_input, timing_block, write_challenge_output,
+                                    OUTPUT_DIR as CHALLENGE_DIR)
+from lexical_index import BM25Index, record_text
+from embedding_engine import EmbeddingEngine
+from encoder_backends import ENCODER_BACKEND, BACKENDS
+from embedding_store import save_store
+from ranking_engine import normalize_rows, parse_query, query_text, score
+from instrumentation import metrics, rss_mb as current_rss_mb, peak_rss_mb
+
+# === CONFIG ===
+BASE_DIR = "."
+LAYOUT_DIR = "outputs"
+LAYOUT_FILE = "parallel_layout_results1.json"
+MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+STREAM_BATCH = 32  # sections encoded per batch in --stream mode
+
+
+class StageReport:
+    """Wall time and memory per pipeline stage (thread-safe)"""
+
+    def __init__(self):
+        self.rows = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        rss_before = current_rss_mb()
+        try:
+            yield
+        finally:
+            row = {
+                "stage": name,
+                "seconds": round(time.perf_counter() - start, 3),
+                "rss_mb": round(current_rss_mb(), 1),
+                "rss_delta_mb": round(current_rss_mb() - rss_before, 1),
+            }
+            with self.lock:
+                self.rows.append(row)
+            metrics.emit("stage", **row)
+
+    def add(self, name, seconds):
+        row = {"stage": name, "seconds": round(seconds, 3), "rss_mb": round(current_rss_mb(), 1), "rss_delta_mb": 0.0}
+        with self.lock:
+            self.rows.append(row)
+        metrics.emit("stage", **row)
+
+    def print(self):
+        print("\n📊 Stage report")
+        print(f"{'stage':<28} {'seconds':>9} {'rss MB':>9} {'delta MB':>9}")
+        for row in self.rows:
+            print(f"{row['stage']:<28} {row['seconds']:>9.2f} {row['rss_mb']:>9.1f} {row['rss_delta_mb']:>9.1f}")
+        print(f"{'peak RSS':<28} {'':>9} {peak_rss_mb():>9.1f}")
+
+
+def discover_collections(base_dir, names=None):
+    """{collection: [pdf paths]} for every <collection>/PDFs folder"""
+    collections = {}
+    for collection_name in sorted(os.listdir(base_dir)):
+        pdf_dir = os.path.join(base_dir, collection_name, "PDFs")
+        if not os.path.isdir(pdf_dir) or (names and collection_name not in names):
+            continue
+        collections[collection_name] = sorted(
+            os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.endswith(".pdf")
+        )
+    return collections
+
+
+def load_query(base_dir, collection_name):
+    input_json_path = os.path.join(base_dir, collection_name, "challenge1b_input.json")
+    if not os.path.exists(input_json_path):
+        return "", ""
+    with open(input_json_path, "r", encoding="utf-8") as f:
+        return parse_query(json.load(f))
+
+
+def write_json(path, data, **kwargs):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **kwargs)
+
+
+def run_layout(collections, args):
+    """{collection: {doc: layout result}}, from step1 or from layout checkpoints"""
+    layouts = {name: {} for name in collections}
+
+    if args.reuse_layout:
+        for collection_name, pdfs in collections.items():
+            for pdf_path in pdfs:
+                doc = os.path.splitext(os.path.basename(pdf_path))[0]
+                path = os.path.join(LAYOUT_DIR, collection_name, doc, LAYOUT_FILE)
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        layouts[collection_name][doc] = json.load(f)
+                else:
+                    print(f"⚠️ No layout checkpoint for {pdf_path}")
+        return layouts
+
+    from step1_paddle import FastPDFProcessor
+
+    jobs, owners = [], {}
+    for collection_name, pdfs in collections.items():
+        for pdf_path in pdfs:
+            doc = os.path.splitext(os.path.basename(pdf_path))[0]
+            output_dir = os.path.join(LAYOUT_DIR, collection_name, doc) if args.checkpoint else None
+            jobs.append((pdf_path, output_dir))
+            owners[pdf_path] = (collection_name, doc)
+
+    with FastPDFProcessor(max_workers=args.workers, batch_size=args.batch_size,
+                          text_layer=args.text_layer) as processor:
+        completed = processor.process_documents(jobs, dpi=args.dpi)
+
+    for pdf_path, pages in completed.items():
+        collection_name, doc = owners[pdf_path]
+        layouts[collection_name][doc] = {"document": pdf_path, "total_pages": len(pages), "pages": pages}
+    return layouts
+
+
+def lexical_inputs(collection_name, records, args):
+    """(in-memory BM25 index, query string) for hybrid ranking, or (None, None)"""
+    if not BUILD_LEXICAL_INDEX:
+        return None, None
+    return BM25Index.build([record_text(r) for r in records]), query_text(*load_query(args.base_dir, collection_name))
+
+
+def write_section_ranking(collection_name, query_emb, vectors, sections, args):
+    """Write and return the ranked sections (None without a query)"""
+    if query_emb is None:
+        return None
+    lexical_index, query = lexical_inputs(collection_name, sections, args)
+    ranked = step4_ranking.rank_sections(query_emb, vectors, sections, k=args.top_k,
+                                         lexical_index=lexical_index, query=query)
+    write_json(os.path.join(step4_ranking.OUTPUT_DIR, f"ranked_{collection_name}.json"), ranked, indent=2)
+    return ranked
+
+
+def write_text_ranking(collection_name, query_emb, vectors, records, args):
+    """Write and return the ranked texts (None without a query)"""
+    if query_emb is None:
+        return None
+    lexical_index, query = lexical_inputs(collection_name, records, args)
+    ranked = step4_ranking_text.rank_texts(query_emb, vectors, records, lexical_index=lexical_index, query=query)
+    write_json(os.path.join(step4_ranking_text.OUTPUT_DIR, f"ranked_{collection_name}.json"),
+               ranked, indent=2, ensure_ascii=False)
+    return ranked
+
+
+def write_challenge_outputs(collections, rankings, args, report, t0):
+    """challenge1b_output.json per collection from the in-memory section and text rankings"""
+    for collection_name in collections:
+        ranked = rankings.get(collection_name, {})
+        if ranked.get("sections") is None:
+            continue
+        input_data = load_challenge_input(args.base_dir, collection_name)
+        if input_data is None:
+            continue
+        # Layout and query encoding are shared by all collections and count towards each one
+        stages = {row["stage"].split(":")[0]: row["seconds"] for row in report.rows
+                  if row["stage"].endswith(f":{collection_name}") or ":" not in row["stage"]}
+        timing = timing_block(time.perf_counter() - t0, stages)
+        output = challenge_output(input_data, ranked["sections"], ranked.get("texts") or [], timing=timing)
+        output_path = write_challenge_output(args.challenge_dir, collection_name, output)
+        print(f"🏁 {collection_name}: {output_path} after {timing['seconds']:.2f} s")
+
+
+def headings_branch(layouts, args, report):
+    with report.stage("headings"):
+        for collection_name, docs in layouts.items():
+            headings = [h for data in docs.values() for h in extract_headings(data)]
+            if args.checkpoint and headings:
+                write_json(os.path.join(HEADINGS_DIR, f"{collection_name}.json"), headings, indent=2)
+
+
+def sections_branch(layouts, query_embeddings, engine, args, report, rankings):
+    for collection_name, docs in layouts.items():
+        with report.stage(f"sections:{collection_name}"):
+            sections = [s for doc, data in docs.items() for s in sections_from_layout(doc, [data])]
+        with report.stage(f"encode_sections:{collection_name}"):
+            vectors = engine.encode([s["content"] for s in sections])
+            if args.checkpoint:
+                save_store(SECTION_STORE_DIR, collection_name, vectors, sections)
+        with report.stage(f"rank_sections:{collection_name}"):
+            rankings[collection_name]["sections"] = write_section_ranking(
+                collection_name, query_embeddings.get(collection_name), vectors, sections, args)
+
+
+def near_dedup_filter(chunker):
+    """Near-duplicate filter emitting chunked store records (None when NEAR_DEDUP is off)"""
+    if not NEAR_DEDUP:
+        return None
+    return NearDuplicateFilter(expand=chunker.chunk_records if chunker is not None else None)
+
+
+def text_records(sections, chunker, dedup=None):
+    """step3_embeddings_text records for sections: near-duplicates folded, split into token windows when chunking"""
+    records = texts_from_sections(sections)
+    if dedup is not None:
+        return dedup.add(records)
+    return chunker.chunk_records(records) if chunker is not None else records
+
+
+def print_dedup_summary(collection_name, filters):
+    if not filters:
+        return
+    stats = [f.stats() for f in filters]
+    records, representatives = sum(s["records"] for s in stats), sum(s["representatives"] for s in stats)
+    ratio = 1 - representatives / records if records else 0.0
+    print(f"🧬 {collection_name}: {records} sections -> {representatives} representatives ({ratio:.1%} near-duplicates)")
+
+
+def texts_branch(layouts, query_embeddings, engine, args, report, rankings, chunker):
+    for collection_name, docs in layouts.items():
+        with report.stage(f"texts:{collection_name}"):
+            records, filters = [], []
+            for doc, data in docs.items():
+                sections = build_sections(data, doc)
+                if args.checkpoint:
+                    write_json(os.path.join(TEXTS_DIR, collection_name, doc, LAYOUT_FILE),
+                               sections, indent=2, ensure_ascii=False)
+                # Per document, like step3, unless copies are folded across documents
+                if not filters or not NEAR_DEDUP_ACROSS_DOCS:
+                    filters.append(near_dedup_filter(chunker))
+                records.extend(text_records(sections, chunker, filters[-1]))
+            print_dedup_summary(collection_name, [f for f in filters if f is not None])
+        with report.stage(f"encode_texts:{collection_name}"):
+            vectors = engine.encode([r["text"] for r in records])
+            if args.checkpoint:
+                save_store(TEXT_STORE_DIR, collection_name, vectors, records)
+        with report.stage(f"rank_texts:{collection_name}"):
+            rankings[collection_name]["texts"] = write_text_ranking(
+                collection_name, query_embeddings.get(collection_name), vectors, records, args)
+
+
+def run_batch(collections, engine, args, report, chunker=None):
+    """Whole-document layout first, then the three branches in parallel
+
+    Returns {collection: {"sections": ranked, "texts": ranked}}.
+    """
+    with report.stage("layout"):
+        layouts = run_layout(collections, args)
+
+    with report.stage("encode_queries"):
+        query_embeddings = encode_queries(collections, engine, args)
+
+    # Independent branches run concurrently on the in-memory layout results;
+    # each writes its own key of the per-collection rankings
+    rankings = {collection_name: {} for collection_name in layouts}
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [
+            pool.submit(headings_branch, layouts, args, report),
+            pool.submit(sections_branch, layouts, query_embeddings, engine, args, report, rankings),
+            pool.submit(texts_branch, layouts, query_embeddings, engine, args, report, rankings, chunker),
+        ]
+        for future in futures:
+            future.result()
+    return rankings
+
+
+class StreamingCollection:
+    """One collection's records, encoded in bounded batches as they are emitted"""
+
+    def __init__(self, engine, text_field, query_emb, batch_size=STREAM_BATCH):
+        self.engine = engine
+        self.text_field = text_field
+        self.query_unit = None if query_emb is None else normalize_rows(query_emb)
+        self.batch_size = batch_size
+        self.pending = []
+        self.records = []
+        self.vector_chunks = []
+        self.best = None  # (score, record) of the provisional top result
+        self.improved = False  # best changed since the caller last looked
+
+    def add(self, records):
+        """Queue records; returns True when this call produced the first scored batch"""
+        self.pending.extend(records)
+        if len(self.pending) >= self.batch_size:
+            return self.flush()
+        return False
+
+    def flush(self):
+        if not self.pending:
+            return False
+        vectors = self.engine.encode([r[self.text_field] for r in self.pending])
+        first = not self.vector_chunks
+        self.vector_chunks.append(vectors)
+        self.records.extend(self.pending)
+        if self.query_unit is not None:
+            scores = score(self.query_unit, vectors)
+            i = int(scores.argmax())
+            if self.best is None or scores[i] > self.best[0]:
+                self.best = (float(scores[i]), self.pending[i])
+                self.improved = True
+        self.pending = []
+        return first and self.query_unit is not None
+
+    def finish(self):
+        self.flush()
+        if not self.vector_chunks:
+            return np.zeros((0, 0), dtype=np.float32), []
+        return np.concatenate(self.vector_chunks), self.records
+
+
+def provisional_path(collection_name):
+    return os.path.join(step4_ranking.OUTPUT_DIR, f"provisional_{collection_name}.json")
+
+
+def write_provisional(collection_name, stream, seconds):
+    """provisional_<collection>.json with the best section scored so far (cosine only, no redundancy pass)"""
+    similarity, section = stream.best
+    write_json(provisional_path(collection_name),
+               {**section, "similarity": similarity, "seconds": round(seconds, 3)}, indent=2, ensure_ascii=False)
+
+
+def iter_checkpoint_pages(collections, titles):
+    """Pages from existing outputs/ results, shaped like FastPDFProcessor.stream_pages()
+
+    titles[pdf_path] is set to the "document" recorded in each result file.
+    """
+    for collection_name, pdfs in collections.items():
+        for pdf_path in pdfs:
+            doc = os.path.splitext(os.path.basename(pdf_path))[0]
+            path = os.path.join(LAYOUT_DIR, collection_name, doc, LAYOUT_FILE)
+            if not os.path.exists(path):
+                print(f"⚠️ No layout checkpoint for {pdf_path}")
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            titles[pdf_path] = data.get("document", pdf_path)
+            pages = data.get("pages", [])
+            for page_num, page in enumerate(pages):
+                yield pdf_path, page_num, [page], 0.0, page_num == len(pages) - 1
+
+
+def run_streaming(collections, engine, args, report, t0, chunker=None):
+    """Layout pages flow straight into section assembly, encoding and scoring
+
+    Pages are consumed in order as the pool finishes them; each page is
+    dropped once the assemblers have seen it, so only open sections and
+    encoded records stay in memory. Whenever a scored batch beats the best
+    section so far, it is written to provisional_<collection>.json; the
+    rankings are final once every page is in, and the provisional file is
+    then removed.
+    Returns {collection: {"sections": ranked, "texts": ranked}}.
+    """
+    owners = {}
+    for collection_name, pdfs in collections.items():
+        for pdf_path in pdfs:
+            owners[pdf_path] = (collection_name, os.path.splitext(os.path.basename(pdf_path))[0])
+
+    titles = {}
+    processor = None
+    if args.reuse_layout:
+        pages = iter_checkpoint_pages(collections, titles)
+    else:
+        from step1_paddle import FastPDFProcessor
+        # Start workers before the model is loaded in this process
+        processor = FastPDFProcessor(max_workers=args.workers, batch_size=args.batch_size,
+                                     text_layer=args.text_layer).start()
+        pages = processor.stream_pages([(p, None) for p in owners], dpi=args.dpi)
+
+    with report.stage("encode_queries"):
+        query_embeddings = encode_queries(collections, engine, args)
+
+    section_streams = {c: StreamingCollection(engine, "content", query_embeddings.get(c), args.stream_batch)
+                       for c in collections}
+    text_streams = {c: StreamingCollection(engine, "text", query_embeddings.get(c), args.stream_batch)
+                    for c in collections}
+    headings = {c: [] for c in collections}
+    dedup_filters = {c: [] for c in collections}  # one near-duplicate filter per streamed document
+    assemblers = {}
+    checkpoints = {}
+    announced = set()  # collections whose first provisional result was printed
+
+    try:
+        with report.stage("stream"):
+            for pdf_path, page_num, page_results, _, is_last in pages:
+                collection_name, doc = owners[pdf_path]
+                if pdf_path not in assemblers:
+                    assemblers[pdf_path] = (LayoutSectionAssembler(doc), SectionAssembler(titles.get(pdf_path, pdf_path)),
+                                            near_dedup_filter(chunker))
+                    if assemblers[pdf_path][2] is not None:
+                        dedup_filters[collection_name].append(assemblers[pdf_path][2])
+                section_assembler, text_assembler, dedup = assemblers[pdf_path]
+
+                new_sections, new_texts = [], []
+                for page in page_results:
+                    new_sections.extend(section_assembler.feed(page.get("elements", []), page.get("page_number")))
+                    new_texts.extend(text_assembler.feed_page(page))
+                    headings[collection_name].extend(
+                        extract_headings({"document": titles.get(pdf_path, pdf_path), "pages": [page]}))
+                if is_last:
+                    new_sections.extend(section_assembler.close())
+                    new_texts.extend(text_assembler.close())
+                    del assemblers[pdf_path]
+
+                if args.checkpoint:
+                    state = checkpoints.setdefault(pdf_path, {"pages": [], "sections": []})
+                    state["pages"].extend(page_results)
+                    state["sections"].extend(new_texts)
+                    if is_last:
+                        write_stream_checkpoint(collection_name, doc, pdf_path, checkpoints.pop(pdf_path))
+
+                first = section_streams[collection_name].add(new_sections)
+                first = text_streams[collection_name].add(text_records(new_texts, chunker, dedup)) or first
+                if first and not any(row["stage"] == "first_scored_batch" for row in report.rows):
+                    report.add("first_scored_batch", time.perf_counter() - t0)
+                stream = section_streams[collection_name]
+                if stream.improved:
+                    if collection_name not in announced:
+                        announced.add(collection_name)
+                        print(f"⚡ {collection_name}: provisional top section after "
+                              f"{time.perf_counter() - t0:.2f} s: {stream.best[1].get('section_title', '')!r}")
+                    write_provisional(collection_name, stream, time.perf_counter() - t0)
+                    stream.improved = False
+    finally:
+        if processor is not None:
+            processor.close()
+
+    rankings = {}
+    for collection_name in collections:
+        query_emb = query_embeddings.get(collection_name)
+        with report.stage(f"rank_sections:{collection_name}"):
+            vectors, sections = section_streams[collection_name].finish()
+            if args.checkpoint:
+                save_store(SECTION_STORE_DIR, collection_name, vectors, sections)
+            ranked_sections = write_section_ranking(collection_name, query_emb, vectors, sections, args)
+            if os.path.exists(provisional_path(collection_name)):
+                os.remove(provisional_path(collection_name))
+        print_dedup_summary(collection_name, dedup_filters[collection_name])
+        with report.stage(f"rank_texts:{collection_name}"):
+            vectors, records = text_streams[collection_name].finish()
+            if args.checkpoint:
+                save_store(TEXT_STORE_DIR, collection_name, vectors, records)
+            ranked_texts = write_text_ranking(collection_name, query_emb, vectors, records, args)
+        rankings[collection_name] = {"sections": ranked_sections, "texts": ranked_texts}
+        if args.checkpoint and headings[collection_name]:
+            write_json(os.path.join(HEADINGS_DIR, f"{collection_name}.json"), headings[collection_name], indent=2)
+    return rankings
+
+
+def write_stream_checkpoint(collection_name, doc, pdf_path, state):
+    """Layout and text-section files of one streamed document"""
+    write_json(os.path.join(LAYOUT_DIR, collection_name, doc, LAYOUT_FILE),
+               {"document": pdf_path, "total_pages": len(state["pages"]), "pages": state["pages"]},
+               indent=2, ensure_ascii=False)
+    write_json(os.path.join(TEXTS_DIR, collection_name, doc, LAYOUT_FILE),
+               state["sections"], indent=2, ensure_ascii=False)
+
+
+def encode_queries(collections, engine, args):
+    query_embeddings = {}
+    for collection_name in collections:
+        persona, job = load_query(args.base_dir, collection_name)
+        if persona or job:
+            query_embeddings[collection_name] = engine.model.encode([query_text(persona, job)])[0]
+        else:
+            print(f"⚠️ {collection_name}: no persona/job, ranking skipped")
+    return query_embeddings
+
+
+def dpi_arg(value):
+    return value if value == "adaptive" else int(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run layout -> extraction -> embedding -> ranking in one process")
+    parser.add_argument("--base-dir", default=BASE_DIR, help="Folder holding the Collection X/ directories")
+    parser.add_argument("--collections", nargs="*", help="Only these collections")
+    parser.add_argument("--checkpoint", action="store_true", help="Also write the intermediate step files")
+    parser.add_argument("--reuse-layout", action="store_true", help=f"Read step1 results from {LAYOUT_DIR}/ instead of running layout")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--dpi", type=dpi_arg, default=72, help='Render DPI, or "adaptive" for a per-page DPI')
+    parser.add_argument("--text-layer", action="store_true", help="Classify pages from the PDF text layer, model only as fallback")
+    parser.add_argument("--stream", action="store_true", help="Assemble, encode and score pages as layout finishes them")
+    parser.add_argument("--stream-batch", type=int, default=STREAM_BATCH, help="Sections per encode batch in --stream mode")
+    parser.add_argument("--encoder-backend", default=ENCODER_BACKEND, choices=BACKENDS,
+                        help="Sentence encoder backend (int8 / ONNX variants are faster on CPU)")
+    parser.add_argument("--top-k", type=int, default=step4_ranking.TOP_K)
+    parser.add_argument("--challenge-dir", default=CHALLENGE_DIR, help="Where <collection>/challenge1b_output.json is written")
+    parser.add_argument("--report-json", help="Write the stage report to this file")
+    parser.add_argument("--metrics", help="Append JSON-lines timer/counter events (all processes) to this file")
+    parser.add_argument("--profile", help="Dump cProfile stats of inference/encode/rank calls into this folder")
+    parser.add_argument("--log-level", default=None, help="DEBUG, INFO, WARNING (default: $PIPELINE_LOG_LEVEL or INFO)")
+    args = parser.parse_args()
+    if args.stream and NEAR_DEDUP and NEAR_DEDUP_ACROSS_DOCS:
+        # Streamed documents interleave, so the first copy (the one embedded) would differ from batch mode
+        parser.error("--stream folds near-duplicates per document only; turn off NEAR_DEDUP_ACROSS_DOCS")
+
+    metrics.configure(path=args.metrics, profile_dir=args.profile)
+    if args.log_level:
+        logging.getLogger("pipeline").setLevel(args.log_level.upper())
+
+    report = StageReport()
+    t0 = time.perf_counter()
+
+    collections = discover_collections(args.base_dir, args.collections)
+    print(f"📚 {len(collections)} collections, {sum(len(p) for p in collections.values())} PDFs")
+
+    engine = EmbeddingEngine(MODEL_NAME, backend=args.encoder_backend)
+    chunker = TextChunker.for_model(MODEL_NAME) if CHUNK_TEXTS else None
+    if args.stream:
+        rankings = run_streaming(collections, engine, args, report, t0, chunker)
+    else:
+        rankings = run_batch(collections, engine, args, report, chunker)
+    write_challenge_outputs(collections, rankings, args, report, t0)
+
+    report.add("total", time.perf_counter() - t0)
+    report.print()
+    metrics.emit_summary("run_pipeline")
+    if args.report_json:
+        write_json(args.report_json, {"stages": report.rows, "peak_rss_mb": round(peak_rss_mb(), 1)}, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-from paddleocr import LayoutDetection
 from PIL import Image
 import fitz  # PyMuPDF
 import os
@@ -8,95 +7,294 @@ from io import BytesIO
 import multiprocessing as mp
 import gc
 import time
-import traceback
+from collections import OrderedDict
 import numpy as np
 
+from instrumentation import get_logger, metrics, rss_mb
+from text_layer_layout import classify_page, MIN_CONFIDENCE as TEXT_LAYER_MIN_CONFIDENCE
+
 os.environ['OMP_NUM_THREADS'] = str(min(8, os.cpu_count()))
 os.environ['MKL_NUM_THREADS'] = str(min(8, os.cpu_count()))
 
+LAYOUT_MODEL_NAME = "PP-DocLayout-L"
+# model_name that swaps PaddleOCR for StubLayoutModel (benchmarks, offline runs)
+STUB_LAYOUT_MODEL = "stub"
+
+log = get_logger("layout")
+
 # Global variable for model (loaded once per process)
 layout_model = None
+layout_model_name = LAYOUT_MODEL_NAME
+# Pages handed to one layout_model.predict call inside a worker
+layout_batch_size = 1
+# Classify born-digital pages from their text layer; only doubtful pages reach the model
+use_text_layer = False
+
+# dpi="adaptive" (or a dict overriding these) picks a resolution per page
+ADAPTIVE_DPI = "adaptive"
+BASE_DPI = 72                   # resolution of a page at the reference density
+MIN_DPI = 48
+MAX_DPI = 150
+MAX_PAGE_PIXELS = 2_000_000     # rendered pixel budget per page
+REFERENCE_WORD_DENSITY = 4.0    # words per square inch of a full single-column text page
+
+# Open PDF handles kept by each worker (pdf_path -> fitz.Document)
+MAX_CACHED_DOCS = 4
+worker_docs = OrderedDict()
+
+class StubLayoutModel:
+    """Stand-in for LayoutDetection: one title band and one text body per page
 
-def init_worker():
-    """Initialize the model once per worker process"""
+    Lets the render / text extraction / IPC path run without PaddleOCR.
+    """
+
+    def predict(self, images, batch_size=1):
+        results = []
+        for img in images:
+            height, width = img.shape[:2]
+            results.append({"boxes": [
+                {"label": "paragraph_title", "score": 1.0,
+                 "coordinate": [0.08 * width, 0.06 * height, 0.92 * width, 0.10 * height]},
+                {"label": "text", "score": 1.0,
+                 "coordinate": [0.08 * width, 0.10 * height, 0.92 * width, 0.94 * height]},
+            ]})
+        return results
+
+def init_worker(batch_size=1, cpu_threads=None, text_layer=False, model_name=LAYOUT_MODEL_NAME):
+    """Initialize the model once per worker process
+
+    With text_layer the model is only loaded once a page needs it.
+    """
+    global layout_batch_size, use_text_layer, layout_model_name
+    layout_batch_size = batch_size
+    use_text_layer = text_layer
+    layout_model_name = model_name
+    if cpu_threads:
+        # Must be set before Paddle is imported to take effect
+        os.environ['OMP_NUM_THREADS'] = str(cpu_threads)
+        os.environ['MKL_NUM_THREADS'] = str(cpu_threads)
+    if not text_layer:
+        load_layout_model()
+
+def load_layout_model():
     global layout_model
+    if layout_model is not None:
+        return layout_model
+    if layout_model_name == STUB_LAYOUT_MODEL:
+        layout_model = StubLayoutModel()
+        return layout_model
     try:
-        print(f"🔄 Loading model in process {os.getpid()}...")
-        layout_model = LayoutDetection(model_name="PP-DocLayout-L")
-        print(f"✅ Model loaded successfully in process {os.getpid()}")
+        # Imported here so the text-extraction helpers can be used without PaddleOCR
+        from paddleocr import LayoutDetection
+        log.info(f"🔄 Loading model in process {os.getpid()}...")
+        layout_model = LayoutDetection(model_name=layout_model_name)
+        log.info(f"✅ Model loaded successfully in process {os.getpid()}")
     except Exception as e:
-        print(f"❌ Failed to load model in process {os.getpid()}: {e}")
-        traceback.print_exc()
+        log.exception(f"❌ Failed to load model in process {os.getpid()}: {e}")
         raise
+    return layout_model
+
+def get_worker_document(pdf_path):
+    """Return this process's cached handle for pdf_path, opening it on first use"""
+    doc = worker_docs.pop(pdf_path, None)
+    if doc is None:
+        doc = fitz.open(pdf_path)
+    worker_docs[pdf_path] = doc
+    while len(worker_docs) > MAX_CACHED_DOCS:
+        _, old_doc = worker_docs.popitem(last=False)
+        old_doc.close()
+    return doc
+
+def adaptive_dpi(page, min_dpi=MIN_DPI, max_dpi=MAX_DPI, max_pixels=MAX_PAGE_PIXELS, base_dpi=BASE_DPI):
+    """Render resolution for one page from its size and text density
+
+    A page at REFERENCE_WORD_DENSITY renders at base_dpi; the DPI scales with
+    the square root of the density ratio, i.e. linearly with glyph size, so
+    sparse pages render smaller and dense ones (small print, several columns)
+    larger. The result is clamped to [min_dpi, max_dpi] and to the resolution
+    that fits max_pixels.
+    """
+    rect = page.rect
+    area_sq_in = rect.width * rect.height / 72.0 ** 2
+    if area_sq_in <= 0:
+        return min_dpi
+    density = len(page.get_text("words")) / area_sq_in
+    dpi = min(max(base_dpi * (density / REFERENCE_WORD_DENSITY) ** 0.5, min_dpi), max_dpi)
+    budget_dpi = 72.0 * (max_pixels / (rect.width * rect.height)) ** 0.5
+    return int(max(1, min(dpi, budget_dpi)))
+
+def resolve_dpi(page, dpi):
+    """Concrete DPI for a page: ints pass through, adaptive policies are evaluated"""
+    if dpi == ADAPTIVE_DPI:
+        return adaptive_dpi(page)
+    if isinstance(dpi, dict):
+        return adaptive_dpi(page, **dpi)
+    return dpi
+
+def render_page_array(doc, page_num, dpi=72):
+    """Render a page straight into an RGB (H, W, 3) uint8 array, no PNG round-trip"""
+    pix = doc.load_page(page_num).get_pixmap(dpi=dpi, alpha=False)
+    img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n != 3:
+        img_array = np.ascontiguousarray(img_array[:, :, :3])
+    return img_array
 
 def process_page_worker(args):
-    """Worker function that uses the pre-loaded model"""
-    global layout_model
-    
-    page_num = args["page_num"]
-    img = args["img"]
-    pdf_path = args["pdf_path"]
-    dpi = args["dpi"]
-    
+    """Worker function for a single page (a batch of one)"""
+    return process_batch_worker([args])[0]
+
+def process_batch_worker(batch):
+    """Worker function that lays out several pages with one predict call
+
+    Each entry carries only (pdf_path, page_num, dpi) in worker-side rendering
+    mode; an "img" entry is used instead when the parent already rendered the
+    page. In text-layer mode only pages the text layer cannot classify
+    confidently are rendered for the model. Pages may come from different
+    PDFs. Returns one
+    (pdf_path, page_num, results, layout_time) tuple per page, in batch order.
+    """
     try:
-        print(f"🔍 Processing page {page_num + 1}... (PID: {os.getpid()})")
-        
-        if layout_model is None:
-            raise RuntimeError("Layout model not initialized in worker process")
+        log.debug(f"🔍 Processing {len(batch)} page(s)... (PID: {os.getpid()})")
         
-        # Convert PIL Image to numpy array (RGB format)
-        img_array = np.array(img)
+        # Adaptive policies become one concrete DPI per page
+        page_dpis = []
+        for args in batch:
+            dpi = args["dpi"]
+            if not isinstance(dpi, (int, float)):
+                dpi = resolve_dpi(get_worker_document(args["pdf_path"]).load_page(args["page_num"]), dpi)
+            page_dpis.append(dpi)
         
-        start = time.time()
-        layout_output = layout_model.predict(img_array, batch_size=1)
-        layout_time = time.time() - start
+        results = {}
+        if use_text_layer:
+            for i, args in enumerate(batch):
+                if args.get("img") is not None:
+                    continue
+                start = time.time()
+                doc = get_worker_document(args["pdf_path"])
+                with metrics.timer("text_layer"):
+                    result, confidence = classify_page(doc.load_page(args["page_num"]), args["page_num"], page_dpis[i])
+                if confidence >= TEXT_LAYER_MIN_CONFIDENCE:
+                    results[i] = (result, time.time() - start)
+            log.debug(f"📝 {len(results)}/{len(batch)} page(s) classified from the text layer")
         
-        print(f"📊 Layout detection took {layout_time:.2f}s for page {page_num + 1}")
-        print(f"🔍 Found {len(layout_output)} layout results for page {page_num + 1}")
-        
-        # Open PDF document for text extraction
-        doc = fitz.open(pdf_path)
-        
-        results = []
-        for det_result in layout_output:
-            result = process_layout_result(det_result, doc, page_num, dpi)
-            results.append(result)
-            print(f"📄 Page {page_num + 1}: Found {len(result.get('elements', []))} elements")
+        neural = [(i, args) for i, args in enumerate(batch) if i not in results]
+        if neural:
+            model = layout_model if layout_model is not None else load_layout_model()
+            if model is None:
+                raise RuntimeError("Layout model not initialized in worker process")
+            
+            img_arrays = []
+            for i, args in neural:
+                img = args.get("img")
+                if img is None:
+                    doc = get_worker_document(args["pdf_path"])
+                    with metrics.timer("render", dpi=page_dpis[i]):
+                        img_arrays.append(render_page_array(doc, args["page_num"], page_dpis[i]))
+                else:
+                    # Convert PIL Image to numpy array (RGB format)
+                    img_arrays.append(np.array(img))
+            
+            start = time.time()
+            with metrics.timer("inference", profile=True, pages=len(neural)):
+                layout_output = list(model.predict(img_arrays, batch_size=layout_batch_size))
+            layout_time = time.time() - start
+            page_layout_time = layout_time / len(neural)
+            
+            log.debug(f"📊 Layout detection took {layout_time:.2f}s for {len(neural)} page(s)")
+            if len(layout_output) != len(neural):
+                raise RuntimeError(f"Expected {len(neural)} layout results, got {len(layout_output)}")
+            
+            for (i, args), img_array, det_result in zip(neural, img_arrays, layout_output):
+                image_size = (img_array.shape[1], img_array.shape[0])
+                doc = get_worker_document(args["pdf_path"])
+                with metrics.timer("text_extraction"):
+                    result = process_layout_result(det_result, doc, args["page_num"], page_dpis[i], image_size=image_size)
+                results[i] = (result, page_layout_time)
+            
+            # Clean up images from memory
+            del img_arrays
+            gc.collect()
         
-        doc.close()
+        batch_results = []
+        for i, args in enumerate(batch):
+            result, page_time = results[i]
+            if page_dpis[i] != args["dpi"]:
+                # Coordinates are in pixels of this page's own rendering
+                result["dpi"] = page_dpis[i]
+            log.debug("📄 Page %d: Found %d elements", args["page_num"] + 1, len(result.get("elements", [])))
+            batch_results.append((args["pdf_path"], args["page_num"], [result], page_time))
         
-        # Clean up image from memory
-        del img, img_array
-        gc.collect()
-        
-        print(f"✅ Page {page_num + 1} completed")
-        return results, layout_time
+        log.debug(f"✅ {len(batch)} page(s) completed")
+        metrics.count("pages", len(batch))
+        metrics.emit("worker_batch", pages=len(batch), text_layer_pages=len(batch) - len(neural), rss_mb=round(rss_mb(), 1))
+        return batch_results
         
     except Exception as e:
-        print(f"❌ Error processing page {page_num + 1}: {e}")
-        traceback.print_exc()
-        return [], 0.0
+        if len(batch) > 1:
+            # Retry page by page so one bad page only costs itself
+            log.warning(f"⚠️ Batch of {len(batch)} pages failed ({e}), retrying each page")
+            return [page for args in batch for page in process_batch_worker([args])]
+        log.exception(f"❌ Error processing page {batch[0]['page_num'] + 1} of {batch[0]['pdf_path']}: {e}")
+        return [(batch[0]["pdf_path"], batch[0]["page_num"], [], 0.0)]
 
-def extract_text_from_coordinates(pdf_doc, page_num, bbox, dpi=72):
-    """Extract text from specific coordinates in PDF"""
-    try:
-        page = pdf_doc.load_page(page_num)
-        page_rect = page.rect
-        pix = page.get_pixmap(dpi=dpi)
-        scale_x = page_rect.width / pix.width
-        scale_y = page_rect.height / pix.height
+class PageGeometry:
+    """Per-page context: loaded page, image->PDF scale factors and word index"""
+
+    def __init__(self, pdf_doc, page_num, dpi=72, image_size=None):
+        self.page = pdf_doc.load_page(page_num)
+        page_rect = self.page.rect
+        if image_size is not None:
+            # Exact scale from the rendered image the layout model actually saw
+            image_width, image_height = image_size
+            self.scale_x = page_rect.width / image_width
+            self.scale_y = page_rect.height / image_height
+        else:
+            self.scale_x = self.scale_y = 72.0 / dpi
+
+        # (x0, y0, x1, y1, word, block_no, line_no, word_no) in reading order
+        self.words = self.page.get_text("words")
+        self.word_boxes = np.array([w[:4] for w in self.words], dtype=np.float32).reshape(-1, 4)
+        widths = self.word_boxes[:, 2] - self.word_boxes[:, 0]
+        heights = self.word_boxes[:, 3] - self.word_boxes[:, 1]
+        self.word_areas = np.clip(widths, 0, None) * np.clip(heights, 0, None)
+
+    def to_pdf_rect(self, bbox):
+        """Map an image-space bbox to PDF coordinates"""
         x1, y1, x2, y2 = bbox
-        pdf_rect = fitz.Rect(
-            x1 * scale_x, y1 * scale_y,
-            x2 * scale_x, y2 * scale_y
-        )
-        text = page.get_text("text", clip=pdf_rect)
-        return text.strip() if text else ""
+        return (x1 * self.scale_x, y1 * self.scale_y, x2 * self.scale_x, y2 * self.scale_y)
+
+    def text_in_bbox(self, bbox, min_overlap=0.5):
+        """Join the words that lie (mostly) inside an image-space bbox"""
+        if not self.words:
+            return ""
+        x0, y0, x1, y1 = self.to_pdf_rect(bbox)
+        boxes = self.word_boxes
+        inter_w = np.clip(np.minimum(boxes[:, 2], x1) - np.maximum(boxes[:, 0], x0), 0, None)
+        inter_h = np.clip(np.minimum(boxes[:, 3], y1) - np.maximum(boxes[:, 1], y0), 0, None)
+        inter = inter_w * inter_h
+        hits = np.nonzero((inter > 0) & (inter >= min_overlap * self.word_areas))[0]
+
+        lines = []
+        current_key = None
+        for idx in hits:
+            word = self.words[idx]
+            key = (word[5], word[6])
+            if key != current_key:
+                lines.append([])
+                current_key = key
+            lines[-1].append(word[4])
+        return "\n".join(" ".join(line) for line in lines).strip()
+
+
+def extract_text_from_coordinates(page_geometry, bbox):
+    """Extract text from specific coordinates using the page's word index"""
+    try:
+        return page_geometry.text_in_bbox(bbox)
     except Exception as e:
-        print(f"⚠️ Error extracting text from coordinates: {e}")
+        log.warning(f"⚠️ Error extracting text from coordinates: {e}")
         return ""
 
-def process_layout_result(det_result, pdf_doc, page_num, dpi=72):
+def process_layout_result(det_result, pdf_doc, page_num, dpi=72, image_size=None):
     """Process layout detection results for a single page"""
     result = {
         "page_number": page_num + 1,
@@ -105,16 +303,17 @@ def process_layout_result(det_result, pdf_doc, page_num, dpi=72):
     }
     
     try:
-        print(f"🔄 Processing layout result for page {page_num + 1}: {type(det_result)}")
+        log.debug("🔄 Processing layout result for page %d: %s", page_num + 1, type(det_result))
         
         boxes = det_result.get('boxes', [])
         if not boxes:
-            print(f"⚠️ No boxes found in layout result for page {page_num + 1}")
-            print(f"📋 Layout result keys: {list(det_result.keys()) if isinstance(det_result, dict) else 'Not a dict'}")
+            log.warning(f"⚠️ No boxes found in layout result for page {page_num + 1}")
+            log.debug(f"📋 Layout result keys: {list(det_result.keys()) if isinstance(det_result, dict) else 'Not a dict'}")
             return result
             
-        print(f"📦 Found {len(boxes)} boxes for page {page_num + 1}")
+        log.debug("📦 Found %d boxes for page %d", len(boxes), page_num + 1)
         sorted_boxes = sorted(boxes, key=lambda b: b.get('coordinate', [0, 0])[1])
+        geometry = None
         
         for i, box in enumerate(sorted_boxes):
             label = box.get('label', 'unknown').lower()
@@ -125,9 +324,12 @@ def process_layout_result(det_result, pdf_doc, page_num, dpi=72):
             
             text_content = ""
             if label in ['doc_title', 'paragraph_title', 'text']:
-                text_content = extract_text_from_coordinates(pdf_doc, page_num, coordinate, dpi)
+                if geometry is None:
+                    # Built once per page and shared by every box on it
+                    geometry = PageGeometry(pdf_doc, page_num, dpi, image_size)
+                text_content = extract_text_from_coordinates(geometry, coordinate)
                 if text_content:
-                    print(f"📝 Extracted text for {label}: {text_content[:50]}...")
+                    log.debug("📝 Extracted text for %s: %s...", label, text_content[:50])
             
             element = {
                 "id": i + 1,
@@ -139,20 +341,89 @@ def process_layout_result(det_result, pdf_doc, page_num, dpi=72):
             result["elements"].append(element)
             
     except Exception as e:
-        print(f"❌ Error processing layout result for page {page_num + 1}: {e}")
-        traceback.print_exc()
+        log.exception(f"❌ Error processing layout result for page {page_num + 1}: {e}")
         result["error"] = str(e)
     
     return result
 
 class FastPDFProcessor:
-    def __init__(self, max_workers=None):
+    def __init__(self, max_workers=None, render_in_worker=True, batch_size=1, cpu_threads=None, text_layer=False,
+                 model_name=LAYOUT_MODEL_NAME):
         if max_workers is None:
             self.max_workers = min(mp.cpu_count(), 4)  # Limit to 4 to avoid memory issues
         else:
             self.max_workers = max_workers
+        # Pages per predict call; trade workers (cores) for batch width together
+        self.batch_size = max(1, batch_size)
+        if cpu_threads is None:
+            cpu_threads = max(1, min(8, mp.cpu_count() // self.max_workers))
+        self.cpu_threads = cpu_threads
+        # pages, seconds and pages/sec of the last process_documents call
+        self.last_run_stats = {}
+        self.failed_pages = {}  # pdf_path -> page numbers without a layout result in the last process_documents()
+        # Workers render their own pages; only (pdf_path, page_num, dpi) is pickled
+        self.render_in_worker = render_in_worker
+        # Text-layer classification first, layout model only for low-confidence pages
+        self.text_layer = text_layer
+        self.model_name = model_name
+        # Long-lived pool, created by start() / the context manager
+        self.pool = None
         
-        print(f"🚀 Initialized FastPDFProcessor with {self.max_workers} workers")
+        log.info(f"🚀 Initialized FastPDFProcessor with {self.max_workers} workers "
+              f"(batch size {self.batch_size}, {self.cpu_threads} threads per worker"
+              f"{', text layer first' if self.text_layer else ''})")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(terminate=exc_type is not None)
+
+    def start(self):
+        """Start the worker pool; each worker loads the layout model once"""
+        if self.pool is None:
+            log.info(f"🔄 Starting {self.max_workers} worker processes...")
+            self.pool = mp.Pool(
+                processes=self.max_workers,
+                initializer=init_worker,
+                initargs=(self.batch_size, self.cpu_threads, self.text_layer, self.model_name),
+            )
+        return self
+
+    def close(self, terminate=False):
+        """Shut the worker pool down"""
+        if self.pool is None:
+            return
+        if terminate:
+            self.pool.terminate()
+        else:
+            self.pool.close()
+        self.pool.join()
+        self.pool = None
+        log.info("✅ All workers completed")
+
+    def count_pages(self, pdf_path):
+        """Page count without rendering anything"""
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+
+    def build_page_tasks(self, pdf_path, dpi=72):
+        """Worker arguments for every page of pdf_path"""
+        if self.render_in_worker:
+            page_count = self.count_pages(pdf_path)
+            log.debug(f"☘️ Queueing {page_count} pages for worker-side rendering (DPI: {dpi})...")
+            return [
+                {"page_num": page_num, "pdf_path": pdf_path, "dpi": dpi}
+                for page_num in range(page_count)
+            ]
+
+        images = self.convert_pdf_to_images_in_memory(pdf_path, dpi)
+        return [
+            {"page_num": page_num, "img": img, "pdf_path": pdf_path, "dpi": dpi}
+            for page_num, img in images
+        ]
 
     def convert_pdf_to_images_in_memory(self, pdf_path, dpi=72):
         """Convert PDF pages to in-memory images"""
@@ -162,122 +433,197 @@ class FastPDFProcessor:
         doc = fitz.open(pdf_path)
         images = []
 
-        print(f"☘️ Converting {len(doc)} pages to in-memory images (DPI: {dpi})...")
+        log.debug(f"☘️ Converting {len(doc)} pages to in-memory images (DPI: {dpi})...")
 
         for page_num in range(len(doc)):
             try:
                 page = doc.load_page(page_num)
-                pix = page.get_pixmap(dpi=dpi)
+                pix = page.get_pixmap(dpi=resolve_dpi(page, dpi))
                 img_bytes = BytesIO(pix.tobytes("png"))
                 img = Image.open(img_bytes).convert("RGB")
                 images.append((page_num, img))
-                print(f"📄 Converted page {page_num + 1} ({img.size[0]}x{img.size[1]})")
+                log.debug(f"📄 Converted page {page_num + 1} ({img.size[0]}x{img.size[1]})")
                 
                 # Clean up pixmap
                 pix = None
             except Exception as e:
-                print(f"❌ Error converting page {page_num + 1}: {e}")
+                log.error(f"❌ Error converting page {page_num + 1}: {e}")
 
         doc.close()
-        print(f"✅ Successfully converted {len(images)} pages")
+        log.debug(f"✅ Successfully converted {len(images)} pages")
         return images
 
     def process_pdf_parallel(self, pdf_path, output_dir="output", dpi=72):
         """Process PDF with parallel workers"""
-        print("🚀 Starting parallel PDF layout processing...")
+        results = self.process_documents([(pdf_path, output_dir)], dpi)
+        return results.get(pdf_path, [])
+
+    def stream_pages(self, jobs, dpi=72):
+        """Yield laid-out pages as workers finish them, in page order per document
+
+        jobs is a list of (pdf_path, output_dir) (output_dir is ignored here).
+        Pages from every document go through one global queue with
+        imap_unordered; out-of-order pages wait in a small per-document buffer
+        until the pages before them are in. Yields
+        (pdf_path, page_num, page_results, layout_time, is_last).
+        """
+        log.info("🚀 Starting parallel PDF layout processing...")
         t0 = time.time()
+        documents = {}
+        tasks = []
+
+        for pdf_path, _ in jobs:
+            try:
+                page_tasks = self.build_page_tasks(pdf_path, dpi)
+            except Exception as e:
+                log.exception(f"❌ Error preparing {pdf_path}: {e}")
+                continue
+            if not page_tasks:
+                log.warning(f"❌ No pages to process in {pdf_path}!")
+                continue
+            documents[pdf_path] = {
+                "total_pages": len(page_tasks),
+                "next_page": 0,
+                "pending": {},
+            }
+            tasks.extend(page_tasks)
+
+        if not tasks:
+            return
+
+        # Batches may mix pages from different PDFs
+        batches = [tasks[i:i + self.batch_size] for i in range(0, len(tasks), self.batch_size)]
+        log.info(f"📚 Queued {len(tasks)} pages from {len(documents)} documents in {len(batches)} batches")
+
+        owns_pool = self.pool is None
+        if owns_pool:
+            self.start()
 
         try:
-            # Convert PDF to images
-            images = self.convert_pdf_to_images_in_memory(pdf_path, dpi)
-            
-            if not images:
-                print("❌ No images to process!")
-                return []
-            
-            # Prepare arguments for workers
-            args = [
-                {
-                    "page_num": page_num, 
-                    "img": img, 
-                    "pdf_path": pdf_path, 
-                    "dpi": dpi
-                } 
-                for page_num, img in images
-            ]
+            for batch_results in self.pool.imap_unordered(process_batch_worker, batches):
+                for pdf_path, page_num, page_results, layout_time in batch_results:
+                    state = documents[pdf_path]
+                    state["pending"][page_num] = (page_results, layout_time)
+                    while state["next_page"] in state["pending"]:
+                        page_num = state["next_page"]
+                        page_results, layout_time = state["pending"].pop(page_num)
+                        state["next_page"] += 1
+                        is_last = state["next_page"] == state["total_pages"]
+                        yield pdf_path, page_num, page_results, layout_time, is_last
+                    if state["next_page"] == state["total_pages"]:
+                        del documents[pdf_path]
+        except Exception as e:
+            log.exception(f"❌ Error in stream_pages: {e}")
+        finally:
+            if owns_pool:
+                self.close()
 
-            print(f"🔄 Starting {self.max_workers} worker processes...")
-            
-            # Process pages in parallel with model initialization
-            with mp.Pool(processes=self.max_workers, initializer=init_worker) as pool:
-                results = pool.map(process_page_worker, args)
+        total_time = time.time() - t0
+        pages_per_sec = len(tasks) / total_time if total_time > 0 else 0.0
+        self.last_run_stats = {
+            "workers": self.max_workers,
+            "batch_size": self.batch_size,
+            "cpu_threads": self.cpu_threads,
+            "pages": len(tasks),
+            "seconds": round(total_time, 3),
+            "pages_per_sec": round(pages_per_sec, 3),
+        }
+        metrics.emit("layout_run", **self.last_run_stats)
+        log.info(f"\n🕰️ Processed {len(tasks)} pages in {total_time:.2f} seconds")
+        log.info(f"⚡ {pages_per_sec:.2f} pages/sec with {self.max_workers} workers x batch size {self.batch_size}")
+        gc.collect()
+
+    def process_documents(self, jobs, dpi=72):
+        """Lay out many PDFs through one global page queue
+
+        jobs is a list of (pdf_path, output_dir); output_dir may be None to
+        skip writing the JSON checkpoint. Pages are regrouped per document as
+        stream_pages() delivers them; each document is saved as soon as its
+        last page is in. Returns {pdf_path: page results}; pages that failed
+        are missing from them and listed in self.failed_pages.
+        """
+        t0 = time.time()
+        output_dirs = dict(jobs)
+        documents = {}
+        completed = {}
+        self.failed_pages = {}
 
-            print("✅ All workers completed")
+        for pdf_path, page_num, page_results, layout_time, is_last in self.stream_pages(jobs, dpi):
+            state = documents.setdefault(pdf_path, {
+                "output_dir": output_dirs[pdf_path],
+                "pages": {},
+                "layout_time": 0.0,
+            })
+            state["pages"][page_num] = page_results
+            if not page_results:
+                self.failed_pages.setdefault(pdf_path, []).append(page_num)
+            state["layout_time"] += layout_time
+            if is_last:
+                state["total_pages"] = page_num + 1
+                completed[pdf_path] = self.finish_document(pdf_path, state, time.time() - t0)
+                del documents[pdf_path]
 
-            # Collect results
-            final_results = []
-            layout_total = 0
-            for page_results, layout_time in results:
-                final_results.extend(page_results)
-                layout_total += layout_time
+        log.info(f"📚 Completed {len(completed)} documents")
+        return completed
 
-            total_time = time.time() - t0
+    def finish_document(self, pdf_path, state, total_time):
+        """Order a completed document's pages, save them and print its titles"""
+        final_results = []
+        for page_num in sorted(state["pages"]):
+            final_results.extend(state["pages"][page_num])
+        layout_total = state["layout_time"]
 
-            print(f"📊 Processing summary:")
-            print(f"   - Total pages: {len(images)}")
-            print(f"   - Results collected: {len(final_results)}")
-            print(f"   - Total layout time: {layout_total:.2f}s")
-            print(f"   - Total processing time: {total_time:.2f}s")
+        log.info(f"📊 {pdf_path}: {state['total_pages']} pages, {len(final_results)} results, "
+                 f"layout {layout_total:.2f}s, total {total_time:.2f}s")
 
-            # Save results
+        # Save results (output_dir None keeps them in memory only)
+        output_dir = state["output_dir"]
+        if output_dir is not None:
             os.makedirs(output_dir, exist_ok=True)
             output_file = os.path.join(output_dir, "parallel_layout_results1.json")
-            
+
             with open(output_file, "w", encoding="utf-8") as f:
                 json.dump({
                     "document": pdf_path,
-                    "total_pages": len(images),
+                    "total_pages": state["total_pages"],
                     "processing_time": f"{total_time:.2f}s",
                     "layout_time_total": f"{layout_total:.2f}s",
-                    "optimization": "multiprocessing+in-memory+shared-model",
+                    "optimization": ("multiprocessing+worker-render+shared-pool" if self.render_in_worker else "multiprocessing+in-memory+shared-pool")
+                                    + ("+text-layer" if self.text_layer else ""),
                     "pages": final_results
                 }, f, indent=2, ensure_ascii=False)
 
-            print(f"\n🕰️ Done in {total_time:.2f} seconds. Layout time: {layout_total:.2f} seconds")
-            print(f"📄 Results saved to: {output_file}")
-            
-            # Print extracted titles like your original code
-            self.print_extracted_titles(final_results)
-            
-            # Clean up
-            del images
-            gc.collect()
-            
-            return final_results
-            
-        except Exception as e:
-            print(f"❌ Error in process_pdf_parallel: {e}")
-            traceback.print_exc()
-            return []
+            log.info(f"📄 Results saved to: {output_file}")
+
+        # Print extracted titles like your original code
+        self.print_extracted_titles(final_results)
+        return final_results
 
     def print_extracted_titles(self, results):
         """Print extracted titles like the original code"""
-        print("\n📋 EXTRACTED TITLES:")
-        print("=" * 50)
+        log.debug("\n📋 EXTRACTED TITLES:")
+        log.debug("=" * 50)
         
         title_count = 0
         for page_result in results:
             for element in page_result.get('elements', []):
                 if element['type'] in ['doc_title', 'paragraph_title'] and element['text'].strip():
-                    print(f"📄 Page {page_result['page_number']}: {element['text'].strip()}")
+                    log.debug(f"📄 Page {page_result['page_number']}: {element['text'].strip()}")
                     title_count += 1
         
-        print(f"\n🎯 Found {title_count} titles total")
+        log.info(f"\n🎯 Found {title_count} titles total")
 
 
 if __name__ == "__main__":
+    from pipeline_manifest import PipelineManifest, file_hash
+
     base_dir = "CHALLENGE_1B"
-    processor = FastPDFProcessor(max_workers=4)  # Adjust as needed
+    dpi = 72
+    text_layer = False  # classify born-digital pages from the PDF text layer first
+    manifest = PipelineManifest()
+    params = {"dpi": dpi, "model": f"text-layer+{LAYOUT_MODEL_NAME}" if text_layer else LAYOUT_MODEL_NAME}
+    jobs = []
+    pending = {}  # pdf_path -> (content hash, output file)
 
     for collection_name in os.listdir(base_dir):
         collection_path = os.path.join(base_dir, collection_name)
@@ -292,10 +638,34 @@ if __name__ == "__main__":
                     pdf_path = os.path.join(pdf_dir, filename)
                     pdf_name = os.path.splitext(filename)[0]
                     
-                    print(f"\n📘 Processing PDF: {pdf_path}")
-                    
                     # Save result to a separate file for each PDF
                     pdf_output_dir = os.path.join(output_dir, pdf_name)
-                    os.makedirs(pdf_output_dir, exist_ok=True)
-                    
-                    processor.process_pdf_parallel(pdf_path, output_dir=pdf_output_dir)
+                    output_file = os.path.join(pdf_output_dir, "parallel_layout_results1.json")
+
+                    # Skip PDFs whose content, DPI and model match the manifest
+                    pdf_hash = file_hash(pdf_path)
+                    if manifest.is_current("layout", pdf_path, pdf_hash, params):
+                        log.debug(f"⏭️ Layout is current: {pdf_path}")
+                        continue
+
+                    log.debug(f"\n📘 Queueing PDF: {pdf_path}")
+                    jobs.append((pdf_path, pdf_output_dir))
+                    pending[pdf_path] = (pdf_hash, output_file)
+
+    if jobs:
+        # One pool for the whole run: the model loads once per worker
+        with FastPDFProcessor(max_workers=4, text_layer=text_layer) as processor:  # Adjust as needed
+            completed = processor.process_documents(jobs, dpi=dpi)
+
+        for pdf_path in completed:
+            # Documents with failed pages stay unrecorded, so the next run retries them
+            if pdf_path in processor.failed_pages:
+                log.warning(f"⚠️ {pdf_path}: pages {[p + 1 for p in sorted(processor.failed_pages[pdf_path])]} failed, will be retried")
+                continue
+            pdf_hash, output_file = pending[pdf_path]
+            manifest.record("layout", pdf_path, pdf_hash, params, [output_file])
+        manifest.save()
+    else:
+        log.info("✅ All layouts are current")
+
+    metrics.emit_summary("step1_paddle")
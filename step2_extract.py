@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing as mp
+
+from pipeline_manifest import PipelineManifest
+from step2_extract_only_headings import extract_headings, document_title, OUTPUT_DIR as HEADINGS_DIR
+from step2_extract_only_texts import build_sections, OUTPUT_ROOT as TEXTS_DIR
+from instrumentation import metrics
+
+# === CONFIG ===
+INPUT_ROOT = "outputs"
+WORKERS = min(mp.cpu_count(), 8)
+PRETTY = False  # indent=2 output (bigger and slower to write); compact by default
+
+
+def dump_json(data, path, pretty=PRETTY, ensure_ascii=True):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        if pretty:
+            json.dump(data, f, indent=2, ensure_ascii=ensure_ascii)
+        else:
+            json.dump(data, f, separators=(",", ":"), ensure_ascii=ensure_ascii)
+
+
+def extract_document(job):
+    """Read one layout file once; write its sections and return its headings
+
+    job is (collection, input_path, output_path, current_hash, pretty). When
+    the file's hash equals current_hash both outputs are already up to date
+    and nothing is parsed.
+    """
+    collection, input_path, output_path, current_hash, pretty = job
+    with open(input_path, "rb") as f:
+        raw = f.read()
+    input_hash = hashlib.sha256(raw).hexdigest()
+    result = {"collection": collection, "input_path": input_path, "hash": input_hash}
+    if input_hash == current_hash:
+        return result
+
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        print(f"❌ Skipping invalid JSON: {input_path}")
+        return {**result, "error": True}
+
+    sections = build_sections(data, os.path.basename(input_path))
+    dump_json(sections, output_path, pretty, ensure_ascii=False)
+    result.update(doc_title=document_title(data), headings=extract_headings(data), output_path=output_path)
+    return result
+
+
+def find_layout_files(input_root=INPUT_ROOT):
+    """{collection: [layout file paths]} in a stable order"""
+    collections = {}
+    for collection_name in sorted(os.listdir(input_root)):
+        collection_path = os.path.join(input_root, collection_name)
+        if not os.path.isdir(collection_path):
+            continue
+        paths = []
+        for root, dirs, files in os.walk(collection_path):
+            dirs.sort()
+            for file_name in sorted(files):
+                if file_name.startswith("parallel_layout_results") and file_name.endswith(".json"):
+                    paths.append(os.path.join(root, file_name))
+        collections[collection_name] = paths
+    return collections
+
+
+def load_previous_headings(path):
+    """Headings of the previous collection output grouped by doc_title, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        by_doc = {}
+        for heading in json.load(f):
+            by_doc.setdefault(heading.get("doc_title"), []).append(heading)
+    return by_doc
+
+
+def current_hash(manifest, input_path, output_path, headings_path):
+    """Hash both step2 outputs of input_path were built from, if both are current"""
+    texts = manifest.entry("extracted_texts", input_path)
+    headings = manifest.entry("headings", input_path)
+    if not texts or not headings or texts.get("hash") != headings.get("hash"):
+        return None
+    input_hash = texts["hash"]
+    if not manifest.is_current("extracted_texts", input_path, input_hash, {}):
+        return None
+    if not manifest.is_current("headings", input_path, input_hash, {}) or not os.path.exists(headings_path):
+        return None
+    # The texts output must also be where this run would write it
+    return input_hash if texts.get("outputs") == [output_path] else None
+
+
+def run(input_root=INPUT_ROOT, workers=WORKERS, pretty=PRETTY):
+    manifest = PipelineManifest()
+    collections = find_layout_files(input_root)
+
+    jobs = []
+    for collection_name, paths in collections.items():
+        headings_path = os.path.join(HEADINGS_DIR, f"{collection_name}.json")
+        for input_path in paths:
+            output_path = os.path.join(TEXTS_DIR, os.path.relpath(input_path, input_root))
+            jobs.append((collection_name, input_path, output_path,
+                         current_hash(manifest, input_path, output_path, headings_path), pretty))
+
+    # Map: documents fan out across the pool
+    start = time.perf_counter()
+    if workers > 1 and len(jobs) > 1:
+        with mp.Pool(min(workers, len(jobs))) as pool:
+            results = {r["input_path"]: r for r in pool.imap_unordered(extract_document, jobs, chunksize=4)}
+    else:
+        results = {r["input_path"]: r for r in map(extract_document, jobs)}
+    elapsed = time.perf_counter() - start
+    print(f"📄 Extracted {len(jobs)} layout files in {elapsed:.2f}s with {workers} workers")
+
+    # Merge: per-collection headings in file order, previous output for unchanged documents
+    for collection_name, paths in collections.items():
+        headings_path = os.path.join(HEADINGS_DIR, f"{collection_name}.json")
+        previous_by_doc = None
+        all_headings = []
+        changed = 0
+        for input_path in paths:
+            result = results[input_path]
+            if result.get("error"):
+                continue
+            if "headings" not in result:
+                if previous_by_doc is None:
+                    previous_by_doc = load_previous_headings(headings_path) or {}
+                doc_title = manifest.entry("headings", input_path)["doc_title"]
+                all_headings.extend(previous_by_doc.get(doc_title, []))
+                continue
+
+            changed += 1
+            all_headings.extend(result["headings"])
+            manifest.record("extracted_texts", input_path, result["hash"], {}, [result["output_path"]])
+            manifest.record("headings", input_path, result["hash"], {}, [headings_path],
+                            collection=collection_name, doc_title=result["doc_title"])
+
+        current = set(paths)
+        removed = [k for k in manifest.keys("headings", collection_name) if k not in current]
+        for key in removed:
+            manifest.forget("headings", key)
+            manifest.forget("extracted_texts", key)
+        if not changed and not removed:
+            print(f"⏭️ {collection_name}: step2 outputs are current")
+            continue
+
+        if all_headings:
+            dump_json(all_headings, headings_path, pretty)
+        print(f"✅ {collection_name}: {changed} documents extracted, {len(all_headings)} headings")
+
+    manifest.save()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headings and text sections from outputs/ in one pass")
+    parser.add_argument("--input-root", default=INPUT_ROOT)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--pretty", action="store_true", default=PRETTY, help="Indented JSON output")
+    args = parser.parse_args()
+
+    run(args.input_root, args.workers, args.pretty)
+
+    metrics.emit_summary("step2_extract")
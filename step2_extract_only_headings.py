@@ -1,47 +1,95 @@
 import os
 import json
+from pipeline_manifest import PipelineManifest, file_hash
+from instrumentation import metrics
 
 INPUT_ROOT = "outputs"
 OUTPUT_DIR = "extracted_headings"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-collection_sections = {}
-
-# Traverse each collection (e.g., Collection 1, Collection 2)
-for collection_name in os.listdir(INPUT_ROOT):
-    collection_path = os.path.join(INPUT_ROOT, collection_name)
-    if not os.path.isdir(collection_path):
-        continue
-
-    all_sections = []
-
-    for root, dirs, files in os.walk(collection_path):
-        for file_name in files:
-            if not file_name.startswith("parallel_layout_results") or not file_name.endswith(".json"):
-                continue
-
-            input_path = os.path.join(root, file_name)
-            with open(input_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-
-            doc_path = data.get("document", "")
-            doc_title = os.path.splitext(os.path.basename(doc_path))[0]
-
-            for page in data.get("pages", []):
-                for elem in page.get("elements", []):
-                    if elem.get("type") == "paragraph_title":
-                        heading = elem.get("text", "").strip()
-                        if heading:
-                            all_sections.append({
-                                "heading": heading,
-                                "level": "paragraph_title",
-                                "doc_title": doc_title
-                            })
-
-    # Save all sections for this collection
-    if all_sections:
+
+
+def document_title(data):
+    """PDF name (without extension) of a step1 layout result"""
+    doc_path = data.get("document", "")
+    return os.path.splitext(os.path.basename(doc_path.replace("\\", "/")))[0]
+
+
+@metrics.timed("headings")
+def extract_headings(data):
+    """paragraph_title headings of one step1 layout result"""
+    doc_title = document_title(data)
+    headings = []
+    for page in data.get("pages", []):
+        for elem in page.get("elements", []):
+            if elem.get("type") == "paragraph_title":
+                heading = elem.get("text", "").strip()
+                if heading:
+                    headings.append({
+                        "heading": heading,
+                        "level": "paragraph_title",
+                        "doc_title": doc_title
+                    })
+    return headings
+
+
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    manifest = PipelineManifest()
+
+    # Traverse each collection (e.g., Collection 1, Collection 2)
+    for collection_name in os.listdir(INPUT_ROOT):
+        collection_path = os.path.join(INPUT_ROOT, collection_name)
+        if not os.path.isdir(collection_path):
+            continue
+
+        all_sections = []
         output_path = os.path.join(OUTPUT_DIR, f"{collection_name}.json")
-        with open(output_path, "w", encoding="utf-8") as out_f:
-            json.dump(all_sections, out_f, indent=2)
 
-print("✅ Extracted one JSON file per collection in extracted_sections/")
+        # Headings of unchanged documents are spliced in from the previous output
+        previous_by_doc = None
+        if os.path.exists(output_path):
+            with open(output_path, "r", encoding="utf-8") as f:
+                previous_by_doc = {}
+                for heading in json.load(f):
+                    previous_by_doc.setdefault(heading.get("doc_title"), []).append(heading)
+
+        seen_keys = set()
+        changed = 0
+
+        for root, dirs, files in os.walk(collection_path):
+            for file_name in files:
+                if not file_name.startswith("parallel_layout_results") or not file_name.endswith(".json"):
+                    continue
+
+                input_path = os.path.join(root, file_name)
+                input_hash = file_hash(input_path)
+                seen_keys.add(input_path)
+                if previous_by_doc is not None and manifest.is_current("headings", input_path, input_hash, {}):
+                    doc_title = manifest.entry("headings", input_path)["doc_title"]
+                    all_sections.extend(previous_by_doc.get(doc_title, []))
+                    continue
+
+                changed += 1
+                with open(input_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+
+                manifest.record("headings", input_path, input_hash, {}, [output_path],
+                                collection=collection_name, doc_title=document_title(data))
+                all_sections.extend(extract_headings(data))
+
+        removed = [k for k in manifest.keys("headings", collection_name) if k not in seen_keys]
+        for key in removed:
+            manifest.forget("headings", key)
+        if not changed and not removed:
+            print(f"⏭️ {collection_name}: headings are current")
+            continue
+
+        # Save all sections for this collection
+        if all_sections:
+            with open(output_path, "w", encoding="utf-8") as out_f:
+                json.dump(all_sections, out_f, indent=2)
+
+    manifest.save()
+
+    print("✅ Extracted one JSON file per collection in extracted_sections/")
+
+    metrics.emit_summary("step2_extract_only_headings")
@@ -1,63 +1,84 @@
 import os
 import json
+from pipeline_manifest import PipelineManifest, file_hash
+from instrumentation import metrics
 
 # === CONFIG ===
 INPUT_ROOT = "outputs"
 OUTPUT_ROOT = "extracted_texts"
 
-os.makedirs(OUTPUT_ROOT, exist_ok=True)
+class SectionAssembler:
+    """Incremental (title, joined text) section builder fed one page at a time
 
-def process_file(input_path, output_path):
-    with open(input_path, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            print(f"❌ Skipping invalid JSON: {input_path}")
-            return
+    feed_page() returns the sections closed by that page (a section closes
+    when the next paragraph_title appears); close() returns the last one.
+    Only the open section is kept, never the pages.
+    """
 
-    doc_title = data.get("document", os.path.basename(input_path))
-    pages = data.get("pages", [])
+    def __init__(self, doc_title=""):
+        self.doc_title = doc_title
+        self.current_title = None
+        self.current_text_blocks = []
+        self.current_page_number = None
+        self.tracking_text_started = False
 
-    structured_sections = []
-    current_title = None
-    current_text_blocks = []
-    current_page_number = None
-    tracking_text_started = False
+    def _emit(self):
+        if self.current_title and self.current_text_blocks:
+            return [{
+                "title": self.current_title.strip(),
+                "text": " ".join(t.strip() for t in self.current_text_blocks),
+                "doc_title": self.doc_title,
+                "page_number": self.current_page_number
+            }]
+        return []
 
-    for page in pages:
+    def feed_page(self, page):
+        closed = []
         page_number = page.get("page_number", None)
-        elements = page.get("elements", [])
-        for elem in elements:
+        for elem in page.get("elements", []):
             elem_type = elem.get("type")
             if elem_type == "paragraph_title":
                 # Save the previous section
-                if current_title and current_text_blocks:
-                    structured_sections.append({
-                        "title": current_title.strip(),
-                        "text": " ".join(t.strip() for t in current_text_blocks),
-                        "doc_title": doc_title,
-                        "page_number": current_page_number
-                    })
+                closed.extend(self._emit())
                 # Reset for next
-                current_title = elem.get("text", "")
-                current_text_blocks = []
-                current_page_number = None
-                tracking_text_started = False
+                self.current_title = elem.get("text", "")
+                self.current_text_blocks = []
+                self.current_page_number = None
+                self.tracking_text_started = False
 
             elif elem_type == "text":
-                if not tracking_text_started:
-                    current_page_number = page_number
-                    tracking_text_started = True
-                current_text_blocks.append(elem.get("text", ""))
-
-    # Final section
-    if current_title and current_text_blocks:
-        structured_sections.append({
-            "title": current_title.strip(),
-            "text": " ".join(t.strip() for t in current_text_blocks),
-            "doc_title": doc_title,
-            "page_number": current_page_number
-        })
+                if not self.tracking_text_started:
+                    self.current_page_number = page_number
+                    self.tracking_text_started = True
+                self.current_text_blocks.append(elem.get("text", ""))
+        return closed
+
+    def close(self):
+        # Final section
+        closed = self._emit()
+        self.current_title = None
+        self.current_text_blocks = []
+        return closed
+
+@metrics.timed("section_assembly")
+def build_sections(data, default_title=""):
+    """Group a step1 layout result into (title, joined text) sections"""
+    assembler = SectionAssembler(data.get("document", default_title))
+    structured_sections = []
+    for page in data.get("pages", []):
+        structured_sections.extend(assembler.feed_page(page))
+    structured_sections.extend(assembler.close())
+    return structured_sections
+
+def process_file(input_path, output_path):
+    with open(input_path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            print(f"❌ Skipping invalid JSON: {input_path}")
+            return
+
+    structured_sections = build_sections(data, os.path.basename(input_path))
 
     # Write output
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -65,11 +86,26 @@ def process_file(input_path, output_path):
         json.dump(structured_sections, f, indent=2, ensure_ascii=False)
     print(f"✅ Saved: {output_path}")
 
-# === Recursively process all JSONs ===
-for dirpath, _, filenames in os.walk(INPUT_ROOT):
-    for filename in filenames:
-        if filename.endswith(".json"):
-            input_path = os.path.join(dirpath, filename)
-            relative_path = os.path.relpath(input_path, INPUT_ROOT)
-            output_path = os.path.join(OUTPUT_ROOT, relative_path)
-            process_file(input_path, output_path)
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_ROOT, exist_ok=True)
+
+    # === Recursively process all JSONs whose layout output changed ===
+    manifest = PipelineManifest()
+    skipped = 0
+    for dirpath, _, filenames in os.walk(INPUT_ROOT):
+        for filename in filenames:
+            if filename.endswith(".json"):
+                input_path = os.path.join(dirpath, filename)
+                relative_path = os.path.relpath(input_path, INPUT_ROOT)
+                output_path = os.path.join(OUTPUT_ROOT, relative_path)
+                input_hash = file_hash(input_path)
+                if manifest.is_current("extracted_texts", input_path, input_hash, {}):
+                    skipped += 1
+                    continue
+                process_file(input_path, output_path)
+                manifest.record("extracted_texts", input_path, input_hash, {}, [output_path])
+
+    manifest.save()
+    print(f"⏭️ Skipped {skipped} unchanged files")
+
+    metrics.emit_summary("step2_extract_only_texts")
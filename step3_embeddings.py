@@ -1,76 +1,163 @@
 import os
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from embedding_engine import EmbeddingEngine
+from encoder_backends import ENCODER_BACKEND, encoder_id
+from embedding_store import export_jsonl, load_store
+from pipeline_manifest import PipelineManifest, tree_hash, update_collection_store
+from ann_index import build_index, remove_index, index_path as ann_index_path
+from lexical_index import build_lexical_index, remove_lexical_index, index_path as lexical_index_path
+from instrumentation import metrics
 
 # Paths
 INPUT_DIR = "outputs"
 OUTPUT_DIR = "section_embeddings"
 MODEL_NAME = "paraphrase-MiniLM-L6-v2"
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-model = SentenceTransformer(MODEL_NAME)
+BATCH_SIZE = 64
+STORE_DTYPE = "float32"  # or "float16"
+EXPORT_JSONL = False     # also write the legacy <collection>.jsonl
+BUILD_ANN_INDEX = False  # also build <collection>.ivf.npz for approximate step4 search
+BUILD_LEXICAL_INDEX = True  # also build <collection>.bm25.npz for hybrid BM25 + dense step4 ranking
 
 def normalize_text(text):
     return text.lower().strip()
 
-for collection in sorted(os.listdir(INPUT_DIR)):
-    collection_path = os.path.join(INPUT_DIR, collection)
-    if not os.path.isdir(collection_path):
-        continue
-
-    embeddings = []
-
-    for doc in sorted(os.listdir(collection_path)):
-        doc_path = os.path.join(collection_path, doc)
-        if not os.path.isdir(doc_path):
+def layout_elements(data):
+    """Elements of a layout result, whether flat ("elements") or per page ("pages")"""
+    if "elements" in data:
+        return data.get("elements", [])
+    return [elem for page in data.get("pages", []) for elem in page.get("elements", [])]
+
+class LayoutSectionAssembler:
+    """Incremental heading + following text sections, fed layout elements in order"""
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.section_text = ""
+        self.current_heading = None
+        self.heading_page = None
+
+    def _emit(self):
+        if self.current_heading and self.section_text:
+            return [{
+                "doc": self.doc,
+                "section_title": self.current_heading,
+                "page_number": self.heading_page,
+                "content": self.section_text.strip()
+            }]
+        return []
+
+    def feed(self, elements, page_number=None):
+        """Returns the sections closed by these elements (page_number: their page, if known)"""
+        closed = []
+        for element in elements:
+            el_type = element.get("type", "")
+            el_text = element.get("text", "").strip()
+
+            if el_type in ["paragraph_title", "doc_title"]:
+                closed.extend(self._emit())
+                self.current_heading = el_text
+                self.heading_page = page_number
+                self.section_text = ""
+
+            elif el_type == "text" and self.current_heading:
+                self.section_text += el_text.strip() + "\n"
+        return closed
+
+    def close(self):
+        # Last section of the file
+        closed = self._emit()
+        self.current_heading = None
+        self.heading_page = None
+        self.section_text = ""
+        return closed
+
+@metrics.timed("section_assembly")
+def sections_from_layout(doc, layout_results):
+    """Sections (heading + following text) across a document's layout results"""
+    assembler = LayoutSectionAssembler(doc)
+    sections = []
+    for data in layout_results:
+        if "pages" in data:
+            for page in data["pages"]:
+                sections.extend(assembler.feed(page.get("elements", []), page.get("page_number")))
+        else:
+            sections.extend(assembler.feed(layout_elements(data)))
+    sections.extend(assembler.close())
+    return sections
+
+def collect_doc_sections(doc_path):
+    """Sections (heading + following text) of one document folder"""
+    layout_results = []
+    for file in sorted(os.listdir(doc_path)):
+        if not file.endswith(".json"):
             continue
 
-        section_text = ""
-        current_heading = None
-
-        for file in sorted(os.listdir(doc_path)):
-            if not file.endswith(".json"):
+        with open(os.path.join(doc_path, file), "r", encoding="utf-8") as f:
+            try:
+                layout_results.append(json.load(f))
+            except json.JSONDecodeError:
                 continue
+    return sections_from_layout(os.path.basename(doc_path), layout_results)
+
+def missing_artifacts(collection):
+    """Enabled side files (ANN index, BM25 index, JSONL export) absent for a collection"""
+    wanted = {
+        "ANN index": BUILD_ANN_INDEX and ann_index_path(OUTPUT_DIR, collection),
+        "BM25 index": BUILD_LEXICAL_INDEX and lexical_index_path(OUTPUT_DIR, collection),
+        "JSONL export": EXPORT_JSONL and os.path.join(OUTPUT_DIR, f"{collection}.jsonl"),
+    }
+    return [name for name, path in wanted.items() if path and not os.path.exists(path)]
+
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    engine = EmbeddingEngine(MODEL_NAME, batch_size=BATCH_SIZE, backend=ENCODER_BACKEND)
+    manifest = PipelineManifest()
+    params = {"model": encoder_id(MODEL_NAME, ENCODER_BACKEND), "dtype": STORE_DTYPE}
+
+    for collection in sorted(os.listdir(INPUT_DIR)):
+        collection_path = os.path.join(INPUT_DIR, collection)
+        if not os.path.isdir(collection_path):
+            continue
 
-            with open(os.path.join(doc_path, file), "r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    continue
-
-            elements = data.get("elements", [])
-            for element in elements:
-                el_type = element.get("type", "")
-                el_text = element.get("text", "").strip()
-
-                if el_type in ["paragraph_title", "doc_title"]:
-                    if current_heading and section_text:
-                        embeddings.append({
-                            "doc": doc,
-                            "section_title": current_heading,
-                            "content": section_text.strip()
-                        })
-                    current_heading = el_text
-                    section_text = ""
-
-                elif el_type == "text" and current_heading:
-                    section_text += el_text.strip() + "\n"
-
-        # Save last section of the file
-        if current_heading and section_text:
-            embeddings.append({
-                "doc": doc,
-                "section_title": current_heading,
-                "content": section_text.strip()
-            })
-
-    print(f"📄 {collection}: Found {len(embeddings)} sections")
-
-    output_path = os.path.join(OUTPUT_DIR, f"{collection}.jsonl")
-    with open(output_path, "w", encoding="utf-8") as f_out:
-        for entry in embeddings:
-            entry["embedding"] = model.encode(entry["content"]).tolist()
-            f_out.write(json.dumps(entry) + "\n")
-
-    print(f"✅ Saved embeddings to {output_path}")
\ No newline at end of file
+        # (doc, path, content hash of its layout files)
+        docs = []
+        for doc in sorted(os.listdir(collection_path)):
+            doc_path = os.path.join(collection_path, doc)
+            if not os.path.isdir(doc_path):
+                continue
+            json_files = [os.path.join(doc_path, f) for f in os.listdir(doc_path) if f.endswith(".json")]
+            docs.append((doc, doc_path, tree_hash(json_files)))
+
+        # Only documents whose layout output changed are parsed and encoded
+        result = update_collection_store(manifest, "section_embeddings", OUTPUT_DIR, collection, docs, params,
+                                         collect_doc_sections, "content", engine, STORE_DTYPE)
+        if result is None:
+            # The store is current, but an enabled artifact may still be missing
+            missing = missing_artifacts(collection)
+            if not missing:
+                print(f"⏭️ {collection}: embeddings are current")
+                continue
+            print(f"🔧 {collection}: embeddings are current, rebuilding {', '.join(missing)}")
+            vectors, embeddings = load_store(OUTPUT_DIR, collection)
+            changed = []
+        else:
+            vectors, embeddings, changed = result
+
+        print(f"📄 {collection}: Found {len(embeddings)} sections ({len(changed)} documents recomputed)")
+
+        output_path = os.path.join(OUTPUT_DIR, f"{collection}.npy")
+        if BUILD_ANN_INDEX:
+            build_index(OUTPUT_DIR, collection, vectors)
+        else:
+            remove_index(OUTPUT_DIR, collection)
+        if BUILD_LEXICAL_INDEX:
+            build_lexical_index(OUTPUT_DIR, collection, embeddings)
+        else:
+            remove_lexical_index(OUTPUT_DIR, collection)
+        if EXPORT_JSONL:
+            export_jsonl(os.path.join(OUTPUT_DIR, f"{collection}.jsonl"), vectors, embeddings)
+
+        print(f"✅ Saved embeddings to {output_path}")
+
+    metrics.emit_summary("step3_embeddings")
@@ -1,66 +1,177 @@
 import os
 import json
-from sentence_transformers import SentenceTransformer
+import time
+import hashlib
+from embedding_engine import EmbeddingEngine
+from encoder_backends import ENCODER_BACKEND, encoder_id
+from embedding_store import export_jsonl, load_store
+from pipeline_manifest import PipelineManifest, tree_hash, update_collection_store
+from ann_index import remove_index
+from lexical_index import build_lexical_index, remove_lexical_index, index_path as lexical_index_path
+from instrumentation import metrics
+from text_chunking import TextChunker
+from near_dedup import NearDuplicateIndex, dedup_records
 
 # === CONFIG ===
 INPUT_DIR = "extracted_texts"
 OUTPUT_DIR = "text_embeddings"
 MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+BATCH_SIZE = 64
+STORE_DTYPE = "float32"  # or "float16"
+EXPORT_JSONL = False     # also write the legacy <collection>.jsonl
+BUILD_LEXICAL_INDEX = True  # also build <collection>.bm25.npz for hybrid BM25 + dense step4 ranking
+CHUNK_TEXTS = True       # split long sections into token windows (see text_chunking.py)
+NEAR_DEDUP = True        # embed one section per near-duplicate cluster within a document (see near_dedup.py)
+NEAR_DEDUP_ACROSS_DOCS = False  # fold copies across documents too; the whole collection becomes one incremental unit
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-model = SentenceTransformer(MODEL_NAME)
+def texts_from_sections(sections):
+    """Embedding records for the step2 sections of one document"""
+    embedded_texts = []
+    for section in sections:
+        text = section.get("text", "").strip()
+        title = section.get("title", "").strip()
+        doc_title = section.get("doc_title", "").strip()
+        page_number = section.get("page_number", None)
 
-for collection in sorted(os.listdir(INPUT_DIR)):
-    collection_path = os.path.join(INPUT_DIR, collection)
-    if not os.path.isdir(collection_path):
-        continue
+        if text:
+            embedded_texts.append({
+                "doc": doc_title,
+                "title": title,
+                "page": page_number,
+                "text": text
+            })
+    return embedded_texts
 
+def collect_doc_texts(doc_path):
+    """Text entries of one extracted_texts document folder"""
     embedded_texts = []
 
-    # Go into each doc subfolder
-    for doc_folder in sorted(os.listdir(collection_path)):
-        doc_path = os.path.join(collection_path, doc_folder)
-        if not os.path.isdir(doc_path):
+    # Read each JSON file inside
+    for file in sorted(os.listdir(doc_path)):
+        if not file.endswith(".json"):
             continue
 
-        # Read each JSON file inside
-        for file in sorted(os.listdir(doc_path)):
-            if not file.endswith(".json"):
-                continue
+        file_path = os.path.join(doc_path, file)
+
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                sections = json.load(f)
+        except json.JSONDecodeError:
+            print(f"⚠️ Skipped corrupt JSON: {file_path}")
+            continue
+
+        if not isinstance(sections, list):
+            print(f"⚠️ Unexpected structure in file: {file_path}")
+            continue
+
+        embedded_texts.extend(texts_from_sections(sections))
+    return embedded_texts
+
+def collect_collection_texts(collection_path):
+    """Text entries of every document folder of a collection, in store order"""
+    return [record
+            for doc_folder in sorted(os.listdir(collection_path))
+            if os.path.isdir(os.path.join(collection_path, doc_folder))
+            for record in collect_doc_texts(os.path.join(collection_path, doc_folder))]
 
-            file_path = os.path.join(doc_path, file)
+def missing_artifacts(collection):
+    """Enabled side files (BM25 index, JSONL export) absent for a collection"""
+    wanted = {
+        "BM25 index": BUILD_LEXICAL_INDEX and lexical_index_path(OUTPUT_DIR, collection),
+        "JSONL export": EXPORT_JSONL and os.path.join(OUTPUT_DIR, f"{collection}.jsonl"),
+    }
+    return [name for name, path in wanted.items() if path and not os.path.exists(path)]
 
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    sections = json.load(f)
-            except json.JSONDecodeError:
-                print(f"⚠️ Skipped corrupt JSON: {file_path}")
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    engine = EmbeddingEngine(MODEL_NAME, batch_size=BATCH_SIZE, backend=ENCODER_BACKEND)
+    manifest = PipelineManifest()
+    params = {"model": encoder_id(MODEL_NAME, ENCODER_BACKEND), "dtype": STORE_DTYPE}
+    chunker = TextChunker.for_model(MODEL_NAME) if CHUNK_TEXTS else None
+    if chunker is not None:
+        params["chunks"] = chunker.params
+    if NEAR_DEDUP:
+        params["near_dedup"] = {**NearDuplicateIndex().params, "across_docs": NEAR_DEDUP_ACROSS_DOCS}
+    dedup_runs = {}  # collection -> dedup counts, rows not embedded and seconds spent collecting
+
+    def collect_records(path):
+        """Records of one document folder, or of a whole collection when folding across documents"""
+        if not NEAR_DEDUP:
+            records = collect_doc_texts(path)
+            return chunker.chunk_records(records) if chunker is not None else records
+        start = time.perf_counter()
+        if NEAR_DEDUP_ACROSS_DOCS:
+            collection, records = os.path.basename(path), collect_collection_texts(path)
+        else:
+            collection, records = os.path.basename(os.path.dirname(path)), collect_doc_texts(path)
+        records, dropped, stats = dedup_records(records)
+        if chunker is not None:
+            records, dropped = chunker.chunk_records(records), chunker.chunk_records(dropped)
+        run = dedup_runs.setdefault(collection, {"records": 0, "representatives": 0, "ms": 0.0,
+                                                 "skipped_rows": 0, "seconds": 0.0})
+        for key in ("records", "representatives", "ms"):
+            run[key] += stats[key]
+        run["skipped_rows"] += len(dropped)
+        run["seconds"] += time.perf_counter() - start
+        return records
+
+    for collection in sorted(os.listdir(INPUT_DIR)):
+        collection_path = os.path.join(INPUT_DIR, collection)
+        if not os.path.isdir(collection_path):
+            continue
+
+        # Go into each doc subfolder: (doc folder, path, content hash of its files)
+        docs = []
+        for doc_folder in sorted(os.listdir(collection_path)):
+            doc_path = os.path.join(collection_path, doc_folder)
+            if not os.path.isdir(doc_path):
                 continue
+            json_files = [os.path.join(doc_path, f) for f in os.listdir(doc_path) if f.endswith(".json")]
+            docs.append((doc_folder, doc_path, tree_hash(json_files)))
+        if NEAR_DEDUP and NEAR_DEDUP_ACROSS_DOCS:
+            # Clusters span documents, so the whole collection is one unit
+            # (unchanged texts still come from the embedding cache)
+            combined = hashlib.sha256("".join(f"{d}:{h}\n" for d, _, h in docs).encode("utf-8")).hexdigest()
+            docs = [(collection, collection_path, combined)]
 
-            if not isinstance(sections, list):
-                print(f"⚠️ Unexpected structure in file: {file_path}")
+        # Only documents whose extracted texts changed are read and encoded
+        start, misses = time.perf_counter(), engine.misses
+        result = update_collection_store(manifest, "text_embeddings", OUTPUT_DIR, collection, docs, params,
+                                         collect_records, "text", engine, STORE_DTYPE)
+        seconds, encoded = time.perf_counter() - start, engine.misses - misses
+        if result is None:
+            # The store is current, but an enabled artifact may still be missing
+            missing = missing_artifacts(collection)
+            if not missing:
+                print(f"⏭️ {collection}: embeddings are current")
                 continue
+            print(f"🔧 {collection}: embeddings are current, rebuilding {', '.join(missing)}")
+            vectors, embedded_texts = load_store(OUTPUT_DIR, collection)
+            changed = []
+        else:
+            vectors, embedded_texts, changed = result
+
+        print(f"📄 {collection}: Found {len(embedded_texts)} text elements ({len(changed)} documents recomputed)")
+        if collection in dedup_runs:
+            run = dedup_runs.pop(collection)
+            ratio = 1 - run["representatives"] / run["records"] if run["records"] else 0.0
+            # Saved time at this run's encode rate over the rows actually encoded (cache hits excluded)
+            saved = f", ~{run['skipped_rows'] * (seconds - run['seconds']) / encoded:.2f} s saved" if encoded else ""
+            print(f"🧬 {collection}: {run['records']} recomputed sections -> {run['representatives']} representatives "
+                  f"({ratio:.1%} near-duplicates, {run['ms']:.0f} ms); {run['skipped_rows']} rows not embedded"
+                  f"{saved}")
+
+        output_path = os.path.join(OUTPUT_DIR, f"{collection}.npy")
+        # rank_texts keeps every entry above the similarity floor, so an ANN
+        # candidate list has nothing to prune; drop indexes from older runs
+        remove_index(OUTPUT_DIR, collection)
+        if BUILD_LEXICAL_INDEX:
+            build_lexical_index(OUTPUT_DIR, collection, embedded_texts)
+        else:
+            remove_lexical_index(OUTPUT_DIR, collection)
+        if EXPORT_JSONL:
+            export_jsonl(os.path.join(OUTPUT_DIR, f"{collection}.jsonl"), vectors, embedded_texts, ensure_ascii=False)
+
+        print(f"✅ Saved embeddings to {output_path}")
 
-            for section in sections:
-                text = section.get("text", "").strip()
-                title = section.get("title", "").strip()
-                doc_title = section.get("doc_title", "").strip()
-                page_number = section.get("page_number", None)
-
-                if text:
-                    embedded_texts.append({
-                        "doc": doc_title,
-                        "title": title,
-                        "page": page_number,
-                        "text": text,
-                        "embedding": model.encode(text).tolist()
-                    })
-
-    print(f"📄 {collection}: Found {len(embedded_texts)} text elements")
-
-    output_path = os.path.join(OUTPUT_DIR, f"{collection}.jsonl")
-    with open(output_path, "w", encoding="utf-8") as f_out:
-        for entry in embedded_texts:
-            f_out.write(json.dumps(entry, ensure_ascii=False) + "\n")
-
-    print(f"✅ Saved embeddings to {output_path}")
+    metrics.emit_summary("step3_embeddings_text")
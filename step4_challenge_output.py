@@ -0,0 +1,189 @@
+import os
+import re
+import json
+import time
+import argparse
+from datetime import datetime
+
+import step4_ranking
+import step4_ranking_text
+from encoder_backends import ENCODER_BACKEND, load_encoder
+from embedding_store import load_store, list_collections
+from ranking_engine import parse_query, query_text
+from lexical_index import load_lexical_index
+from ann_index import load_index
+from instrumentation import metrics
+
+# === CONFIG ===
+BASE_DIR = "."
+OUTPUT_DIR = "challenge_outputs"  # <collection>/challenge1b_output.json (the bundled ones are the reference answers)
+OUTPUT_NAME = "challenge1b_output.json"
+MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+TOP_SECTIONS = 5
+TOP_SUBSECTIONS = 5
+TIME_LIMIT_SECONDS = 60  # per collection, as in the challenge rules
+
+
+def load_challenge_input(base_dir, collection_name):
+    """Parsed challenge1b_input.json of a collection, or None"""
+    input_json_path = os.path.join(base_dir, collection_name, "challenge1b_input.json")
+    if not os.path.exists(input_json_path):
+        print(f"⚠️ {input_json_path} not found.")
+        return None
+    with open(input_json_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def doc_key(doc):
+    """Document name without folders or extension ("...\\PDFs\\A.pdf" and "A" both give "A")"""
+    return os.path.splitext(re.split(r"[\\/]", doc or "")[-1])[0]
+
+
+def section_pages(text_records):
+    """{(doc, title): first page} from text records, for section stores written without page numbers"""
+    pages = {}
+    for record in text_records:
+        key = (doc_key(record.get("doc")), (record.get("title") or "").strip())
+        if record.get("page") is not None:
+            pages.setdefault(key, record["page"])
+    return pages
+
+
+def subsection_texts(sections, texts, limit):
+    """Ranked text entries joined to the ranked sections
+
+    Each section (in rank order) takes the best text of its document, from
+    its own page when there is one; the rest is filled with the best texts
+    left over.
+    """
+    chosen, used = [], set()
+    for section in sections:
+        doc, page = doc_key(section.get("doc")), section.get("page_number")
+        same_doc = [i for i, t in enumerate(texts) if i not in used and doc_key(t.get("doc")) == doc]
+        pick = next((i for i in same_doc if texts[i].get("page") == page), same_doc[0] if same_doc else None)
+        if pick is not None:
+            used.add(pick)
+            chosen.append(texts[pick])
+        if len(chosen) == limit:
+            return chosen
+    chosen.extend(t for i, t in enumerate(texts) if i not in used)
+    return chosen[:limit]
+
+
+def challenge_output(input_data, sections, texts, pages=None, timing=None,
+                     top_sections=TOP_SECTIONS, top_subsections=TOP_SUBSECTIONS):
+    """challenge1b_output.json from ranked sections (rank_sections) and texts (rank_texts)"""
+    persona, job = parse_query(input_data)
+    pages = pages or {}
+    sections = sections[:top_sections]
+
+    extracted_sections = []
+    for rank, section in enumerate(sections, 1):
+        page = section.get("page_number")
+        if page is None:
+            page = pages.get((doc_key(section.get("doc")), section.get("section_title", "").strip()))
+        extracted_sections.append({
+            "document": f"{doc_key(section.get('doc'))}.pdf",
+            "section_title": section.get("section_title", ""),
+            "importance_rank": rank,
+            "page_number": page,
+        })
+
+    subsection_analysis = [{
+        "document": f"{doc_key(text.get('doc'))}.pdf",
+        "refined_text": " ".join(text.get("text", "").split()),
+        "page_number": text.get("page"),
+    } for text in subsection_texts(sections, texts, top_subsections)]
+
+    output = {
+        "metadata": {
+            "input_documents": [d.get("filename", "") for d in input_data.get("documents", [])],
+            "persona": persona,
+            "job_to_be_done": job,
+            "processing_timestamp": datetime.now().isoformat(),
+        },
+        "extracted_sections": extracted_sections,
+        "subsection_analysis": subsection_analysis,
+    }
+    if timing is not None:
+        output["timing"] = timing
+    return output
+
+
+def timing_block(seconds, stages):
+    """Per-collection timing: wall seconds, per-stage seconds and the challenge limit check"""
+    return {
+        "seconds": round(seconds, 3),
+        "stages": {name: round(value, 3) for name, value in stages.items()},
+        "time_limit_seconds": TIME_LIMIT_SECONDS,
+        "within_limit": seconds <= TIME_LIMIT_SECONDS,
+    }
+
+
+def write_challenge_output(output_dir, collection_name, output):
+    output_path = os.path.join(output_dir, collection_name, OUTPUT_NAME)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f_out:
+        json.dump(output, f_out, indent=4, ensure_ascii=False)
+    return output_path
+
+
+def answer_collection(model, collection_name, input_data):
+    """Rank a collection's section and text stores for its query and join them in memory"""
+    start = time.perf_counter()
+    stages = {}
+
+    stage_start = time.perf_counter()
+    query = query_text(*parse_query(input_data))
+    query_emb = model.encode([query])[0]
+    stages["encode_query"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    section_dir = step4_ranking.INPUT_DIR
+    vectors, records = load_store(section_dir, collection_name)
+    ann_index = load_index(section_dir, collection_name) if step4_ranking.USE_ANN_INDEX else None
+    lexical_index = load_lexical_index(section_dir, collection_name) if step4_ranking.USE_LEXICAL_INDEX else None
+    sections = step4_ranking.rank_sections(query_emb, vectors, records, ann_index, step4_ranking.TOP_K,
+                                           lexical_index=lexical_index, query=query)
+    stages["rank_sections"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    texts, text_records = [], []
+    text_dir = step4_ranking_text.INPUT_DIR
+    if collection_name in list_collections(text_dir):
+        vectors, text_records = load_store(text_dir, collection_name)
+        lexical_index = load_lexical_index(text_dir, collection_name) if step4_ranking_text.USE_LEXICAL_INDEX else None
+        texts = step4_ranking_text.rank_texts(query_emb, vectors, text_records, lexical_index=lexical_index, query=query)
+    else:
+        print(f"⚠️ {collection_name}: no text store in {text_dir}/, subsection_analysis stays empty")
+    stages["rank_texts"] = time.perf_counter() - stage_start
+
+    pages = None if all("page_number" in s for s in sections) else section_pages(text_records)
+    seconds = time.perf_counter() - start
+    return challenge_output(input_data, sections, texts, pages, timing_block(seconds, stages))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write challenge1b_output.json for every collection store in one pass")
+    parser.add_argument("--base-dir", default=BASE_DIR, help="Folder holding the Collection X/challenge1b_input.json files")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--collections", nargs="*", help="Only these collections")
+    args = parser.parse_args()
+
+    model = load_encoder(MODEL_NAME, ENCODER_BACKEND)
+    for collection_name in list_collections(step4_ranking.INPUT_DIR):
+        if args.collections and collection_name not in args.collections:
+            continue
+        input_data = load_challenge_input(args.base_dir, collection_name)
+        if input_data is None:
+            continue
+
+        output = answer_collection(model, collection_name, input_data)
+        output_path = write_challenge_output(args.output_dir, collection_name, output)
+        timing = output["timing"]
+        print(f"✅ {collection_name}: {len(output['extracted_sections'])} sections, "
+              f"{len(output['subsection_analysis'])} subsections in {timing['seconds']:.2f} s -> {output_path}")
+        if not timing["within_limit"]:
+            print(f"⚠️ {collection_name} took longer than the {TIME_LIMIT_SECONDS} s limit")
+
+    metrics.emit_summary("step4_challenge_output")
@@ -1,16 +1,32 @@
 import os
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from encoder_backends import ENCODER_BACKEND, load_encoder
+from embedding_store import load_store, list_collections
+from ranking_engine import (normalize_rows, score, select_diverse, fuse_scores, lexical_candidates, parse_query,
+                            query_text, LEXICAL_WEIGHT)
+from ann_index import load_index
+from lexical_index import load_lexical_index, record_text
+from reranker import Reranker
+from instrumentation import metrics
 
 # Paths
 INPUT_DIR = "section_embeddings"
 OUTPUT_DIR = "output_rankings"
 MODEL_NAME = "paraphrase-MiniLM-L6-v2"
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-model = SentenceTransformer(MODEL_NAME)
+TOP_K = 10
+REDUNDANCY_THRESHOLD = 0.9
+# Query <collection>.ivf.npz (when step3 built one) for candidates first
+USE_ANN_INDEX = True
+ANN_CANDIDATES = 200
+ANN_NPROBE = 16  # recall knob: lists probed per query
+# Fuse BM25 over <collection>.bm25.npz (when step3 built one) with the cosine scores
+USE_LEXICAL_INDEX = True
+# Set to e.g. 200 to dense-score only the BM25 top rows of large collections
+# (faster, but sections with no query term can no longer rank); None scores every row
+LEXICAL_CANDIDATES = None
+# Rescore the first-stage top-N with a cross-encoder / local LLM (see reranker.py)
+USE_RERANKER = False
 
 def get_persona_job(collection_name):
     input_json_path = os.path.join(collection_name, "challenge1b_input.json")
@@ -18,54 +34,114 @@ def get_persona_job(collection_name):
         print(f"⚠️ {input_json_path} not found.")
         return "", ""
     with open(input_json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        return data.get("persona", ""), data.get("job", "")
-
-def is_redundant(new_emb, existing_embs, threshold=0.9):
-    return any(cosine_similarity([new_emb], [e])[0][0] > threshold for e in existing_embs)
-
-# Process all .jsonl files in section_embeddings/
-for file in sorted(os.listdir(INPUT_DIR)):
-    if not file.endswith(".jsonl"):
-        continue
-
-    collection_name = file.replace(".jsonl", "")
-    persona, job = get_persona_job(collection_name)
-    if not persona and not job:
-        continue
-
-    query = f"{persona}. {job}"
-    query_emb = model.encode([query])[0]
-
-    # Read all embedded entries
-    embedded_sections = []
-    with open(os.path.join(INPUT_DIR, file), "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                data = json.loads(line)
-                data["similarity"] = float(cosine_similarity([query_emb], [data["embedding"]])[0][0])
-                embedded_sections.append(data)
-            except Exception as e:
-                print(f"⚠️ Error reading line: {e}")
-
-    print(f"📄 {collection_name}: Found {len(embedded_sections)} sections")
-
-    # Sort and filter top 10
-    embedded_sections = sorted(embedded_sections, key=lambda x: x["similarity"], reverse=True)
-    top_sections, seen = [], []
-
-    for s in embedded_sections:
-        emb = np.array(s["embedding"])
-        if not is_redundant(emb, seen):
-            seen.append(emb)
-            s.pop("embedding", None)  # remove large field
-            top_sections.append(s)
-        if len(top_sections) == 10:
-            break
+        return parse_query(json.load(f))
+
+@metrics.timed("rank", profile=True)
+def rank_sections(query_emb, vectors, records, ann_index=None, k=TOP_K, lexical_index=None, query=None,
+                  lexical_weight=LEXICAL_WEIGHT):
+    """Top-k non-redundant sections for a query embedding (ranked_*.json entries)
+
+    With a lexical_index and the query string, BM25 is fused into the
+    ranking score ("score") and, when LEXICAL_CANDIDATES is set, also
+    narrows the rows that are dense-scored; "similarity" stays the cosine
+    similarity.
+    """
+    if not len(records):
+        return []
+
+    lexical_scores = None
+    if lexical_index is not None and query and lexical_index.n_rows == len(records):
+        lexical_scores = lexical_index.scores(query)
+
+    candidates = None
+    if ann_index is not None and len(ann_index.order) == len(records):
+        # step3 stores unit vectors, so only the candidates are touched
+        candidates = ann_index.search(vectors, query_emb, ANN_CANDIDATES, ANN_NPROBE)
+        if lexical_scores is not None:
+            lexical_rows = lexical_candidates(lexical_scores, LEXICAL_CANDIDATES, k)
+            if lexical_rows is not None:
+                candidates = np.union1d(candidates, lexical_rows)
+    elif lexical_scores is not None:
+        candidates = lexical_candidates(lexical_scores, LEXICAL_CANDIDATES, k)
+    if candidates is None:
+        candidates = np.arange(len(records))
+
+    # One matrix-vector product scores every candidate
+    unit_vectors = normalize_rows(vectors[candidates])
+    similarities = score(query_emb, unit_vectors)
+    return ranked_sections(records, candidates, unit_vectors, similarities,
+                           None if lexical_scores is None else lexical_scores[candidates], k, lexical_weight)
+
+
+def ranked_sections(records, rows, unit_vectors, similarities, lexical_scores=None, k=TOP_K,
+                    lexical_weight=LEXICAL_WEIGHT, threshold=REDUNDANCY_THRESHOLD):
+    """ranked_*.json entries from scored rows: BM25 fusion, then the redundancy pass
+
+    unit_vectors, similarities and lexical_scores (None for cosine only) are
+    per scored row; rows maps them back to records. Every section ranking
+    entry point ends here, so a query ranks the same whichever one serves it.
+    Redundancy is suppressed with a running max-similarity vector.
+    """
+    ranking = similarities
+    if lexical_scores is not None:
+        ranking = fuse_scores(similarities, lexical_scores, lexical_weight)
+    top_sections = []
+    for position in select_diverse(unit_vectors, ranking, k, threshold):
+        section = dict(records[rows[position]])
+        section["similarity"] = float(similarities[position])
+        if lexical_scores is not None:
+            section["score"] = float(ranking[position])
+        top_sections.append(section)
+    return top_sections
 
+
+def rerank_sections(reranker, query, sections, k=TOP_K):
+    """First-stage sections reordered by the reranker and cut to k (scored ones carry rerank_score)"""
+    ranked, scores, _ = reranker.rerank(query, sections, record_text)
+    top_sections = []
+    for section, rerank_score in zip(ranked[:k], scores):
+        if rerank_score is not None:
+            section["rerank_score"] = rerank_score
+        top_sections.append(section)
+    return top_sections
+
+
+if __name__ == "__main__":
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    output_path = os.path.join(OUTPUT_DIR, f"ranked_{collection_name}.json")
-    with open(output_path, "w", encoding="utf-8") as f_out:
-        json.dump(top_sections, f_out, indent=2)
+    model = load_encoder(MODEL_NAME, ENCODER_BACKEND)
+    reranker = None
+    if USE_RERANKER:
+        try:
+            reranker = Reranker()
+        except FileNotFoundError as e:
+            print(f"⚠️ {e}; ranking without the reranker")
+
+    # Process every collection store (or legacy .jsonl) in section_embeddings/
+    for collection_name in list_collections(INPUT_DIR):
+        persona, job = get_persona_job(collection_name)
+        if not persona and not job:
+            continue
+
+        query = query_text(persona, job)
+        query_emb = model.encode([query])[0]
+
+        # Memory-mapped embedding matrix + metadata, no per-line JSON parsing
+        vectors, records = load_store(INPUT_DIR, collection_name)
+        print(f"📄 {collection_name}: Found {len(records)} sections")
+
+        ann_index = load_index(INPUT_DIR, collection_name) if USE_ANN_INDEX else None
+        if ann_index is not None:
+            print(f"🗂️ Using IVF index with {ann_index.n_lists} lists")
+        lexical_index = load_lexical_index(INPUT_DIR, collection_name) if USE_LEXICAL_INDEX else None
+        k = max(TOP_K, reranker.top_n) if reranker is not None else TOP_K
+        top_sections = rank_sections(query_emb, vectors, records, ann_index, k, lexical_index=lexical_index, query=query)
+        if reranker is not None:
+            top_sections = rerank_sections(reranker, query, top_sections)
+
+        output_path = os.path.join(OUTPUT_DIR, f"ranked_{collection_name}.json")
+        with open(output_path, "w", encoding="utf-8") as f_out:
+            json.dump(top_sections, f_out, indent=2)
+
+        print(f"✅ Saved top {len(top_sections)} sections to {output_path}")
 
-    print(f"✅ Saved top 10 sections to {output_path}")
+    metrics.emit_summary("step4_ranking")
@@ -0,0 +1,131 @@
+import os
+import re
+import json
+import time
+import argparse
+import numpy as np
+import step4_ranking
+from encoder_backends import ENCODER_BACKEND, load_encoder
+from embedding_store import load_store
+from lexical_index import load_lexical_index
+from ranking_engine import normalize_rows, score_many, parse_query, query_text, LEXICAL_WEIGHT
+from instrumentation import metrics
+
+# === CONFIG ===
+INPUT_DIR = "section_embeddings"
+OUTPUT_DIR = "output_rankings_batch"
+MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+TOP_K = 10
+REDUNDANCY_THRESHOLD = 0.9
+QUERY_BATCH_SIZE = 64
+
+
+def load_queries(queries_path):
+    """Read a JSON list or JSONL file of persona/job queries
+
+    Each entry may carry an "id"; otherwise its position is used. Entries can
+    be flat ({"persona": ..., "job": ...}) or in challenge1b_input.json form.
+    """
+    with open(queries_path, "r", encoding="utf-8") as f:
+        if queries_path.endswith(".jsonl"):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = [entries]
+
+    queries = []
+    for position, entry in enumerate(entries):
+        persona, job = parse_query(entry)
+        if not persona and not job:
+            print(f"⚠️ Skipping empty query #{position}")
+            continue
+        query_id = str(entry.get("id", position))
+        queries.append({"id": query_id, "persona": persona, "job": job})
+    return queries
+
+
+@metrics.timed("rank_batch", profile=True)
+def rank_queries(model, vectors, records, queries, k=TOP_K, threshold=REDUNDANCY_THRESHOLD,
+                 lexical_index=None, lexical_weight=LEXICAL_WEIGHT):
+    """Rank one loaded corpus for many queries; returns one ranked list per query
+
+    With a lexical_index, each query's BM25 scores are fused in exactly as
+    step4_ranking.rank_sections does.
+    """
+    if not queries or not len(records):
+        return [[] for _ in queries]
+
+    texts = [query_text(q["persona"], q["job"]) for q in queries]
+    query_matrix = model.encode(texts, batch_size=QUERY_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False)
+
+    unit_vectors = normalize_rows(vectors)
+    similarity_matrix = score_many(query_matrix, unit_vectors)
+
+    if lexical_index is not None and lexical_index.n_rows != len(records):
+        lexical_index = None  # BM25 row ids must line up with the store
+    rows = np.arange(len(records))
+    rankings = []
+    for text, similarities in zip(texts, similarity_matrix):
+        lexical_scores = lexical_index.scores(text) if lexical_index is not None else None
+        rankings.append(step4_ranking.ranked_sections(records, rows, unit_vectors, similarities, lexical_scores,
+                                                      k, lexical_weight, threshold))
+    return rankings
+
+
+def safe_name(query_id):
+    return re.sub(r"[^\w\-. ]", "_", query_id).strip() or "query"
+
+
+def output_names(query_ids):
+    """safe_name per query id, with _2, _3... added where two ids sanitize to the same file
+
+    Compared case-insensitively, since "A" and "a" are one file on Windows
+    and macOS.
+    """
+    names, taken = [], set()
+    for query_id in query_ids:
+        base = name = safe_name(query_id)
+        suffix = 1
+        while name.lower() in taken:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        taken.add(name.lower())
+        names.append(name)
+    return names
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank many persona/job queries against one collection")
+    parser.add_argument("collection", help='Collection name, e.g. "Collection 1"')
+    parser.add_argument("queries", help="JSON list or JSONL file of persona/job queries")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="Embedding store directory")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--k", type=int, default=TOP_K)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    print(f"🎯 Loaded {len(queries)} queries from {args.queries}")
+
+    model = load_encoder(MODEL_NAME, ENCODER_BACKEND)
+    vectors, records = load_store(args.input_dir, args.collection)
+    print(f"📄 {args.collection}: Found {len(records)} sections")
+    lexical_index = load_lexical_index(args.input_dir, args.collection) if step4_ranking.USE_LEXICAL_INDEX else None
+
+    start = time.perf_counter()
+    rankings = rank_queries(model, vectors, records, queries, args.k, lexical_index=lexical_index)
+    elapsed = time.perf_counter() - start
+
+    output_dir = os.path.join(args.output_dir, args.collection)
+    os.makedirs(output_dir, exist_ok=True)
+    names = output_names([query["id"] for query in queries])
+    for name, ranked in zip(names, rankings):
+        output_path = os.path.join(output_dir, f"ranked_{name}.json")
+        with open(output_path, "w", encoding="utf-8") as f_out:
+            json.dump(ranked, f_out, indent=2)
+
+    rate = len(queries) / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Ranked {len(queries)} queries in {elapsed:.3f}s ({rate:,.1f} queries/sec)")
+    print(f"💾 Saved to: {output_dir}/")
+
+    metrics.emit_summary("step4_ranking_batch")
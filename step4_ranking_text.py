@@ -1,27 +1,37 @@
 import os
 import json
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from encoder_backends import ENCODER_BACKEND, load_encoder
 import hashlib
+import heapq
 import re
+from embedding_store import load_store, list_collections, iter_store, store_count, STREAM_BATCH_ROWS
+from ranking_engine import (normalize_rows, score, aggregate_scores, fuse_scores, parse_query, query_text,
+                            LEXICAL_WEIGHT)
+from lexical_index import load_lexical_index
+from text_chunking import AGGREGATION, is_chunked, merge_chunks
+from instrumentation import get_logger, metrics
 
 # Paths
 INPUT_DIR = "text_embeddings"
 OUTPUT_DIR = "output_rankings_text"
 MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+MIN_SIMILARITY = 0.2
+USE_LEXICAL_INDEX = True  # fuse BM25 over <collection>.bm25.npz into the ranking score
+# Score the store in STREAM_BATCH_ROWS batches instead of loading its embeddings whole.
+# STREAM_TOP_K=None gives the same results as rank_texts and still keeps every unique entry
+# above the floor; a number keeps only the best k, which bounds the ranking state (the
+# metadata columns are still read whole)
+STREAM_RANKING = False
+STREAM_TOP_K = None
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-model = SentenceTransformer(MODEL_NAME)
+log = get_logger("ranking")
 
 def get_persona_job(collection_name):
     """Fetch persona and job from challenge1b_input.json in the collection folder."""
     input_json_path = os.path.join(collection_name, "challenge1b_input.json")
     with open(input_json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        persona = data.get("persona", "")
-        job = data.get("job", "")
-    return persona, job
+        return parse_query(json.load(f))
 
 
 def clean_text_for_deduplication(text):
@@ -36,136 +46,264 @@ def create_text_hash(text):
     cleaned = clean_text_for_deduplication(text)
     return hashlib.md5(cleaned.encode('utf-8')).hexdigest()
 
-def calculate_cosine_similarity(embedding1, embedding2):
-    """Calculate cosine similarity between two embeddings"""
-    # Reshape embeddings to 2D arrays for sklearn
-    emb1 = np.array(embedding1).reshape(1, -1)
-    emb2 = np.array(embedding2).reshape(1, -1)
-    
-    # Calculate cosine similarity
-    similarity = cosine_similarity(emb1, emb2)[0][0]
-    return float(similarity)
-
-def is_embedding_redundant(new_embedding, existing_embeddings, threshold=0.9):
-    """Check if new embedding is too similar to existing ones"""
-    if len(existing_embeddings) == 0:
-        return False
-    
-    for existing_emb in existing_embeddings:
-        similarity = calculate_cosine_similarity(new_embedding, existing_emb)
-        if similarity > threshold:
-            return True
-    return False
-
-# Process each JSONL file
-for filename in sorted(os.listdir(INPUT_DIR)):
-    if not filename.endswith(".jsonl"):
-        continue
-
-    print(f"\n" + "="*60)
-    print(f"🔄 Processing: {filename}")
-    print("="*60)
-    
-    collection_name = filename.split("_")[0].replace(".jsonl", "").strip()
-    persona, job = get_persona_job(collection_name)
-    query = f"{persona}. {job}"
-
-    print(f"🎯 Query: {query}")
-    print("🔄 Encoding query...")
-    query_embedding = model.encode([query])[0]
-    print(f"✅ Query embedding shape: {query_embedding.shape}")
-
-    input_path = os.path.join(INPUT_DIR, filename)
-    
-    # Step 1: Load all entries and deduplicate by text content
-    print("📖 Loading and deduplicating text entries...")
-    unique_texts = {}  # hash -> entry with best similarity
-    total_entries = 0
-    
-    with open(input_path, "r", encoding="utf-8") as f:
-        for line_num, line in enumerate(f, 1):
-            if line_num % 200 == 0:
-                print(f"  Processed {line_num} lines...")
-                
-            try:
-                entry = json.loads(line.strip())
-                total_entries += 1
-            except json.JSONDecodeError:
-                continue
+def text_entry(entry, similarity, ranking_score=None):
+    """ranked_*.json entry for a store record (ranking_score only when fused)"""
+    result = {
+        "doc": entry.get("doc", ""),
+        "file": entry.get("file", ""),
+        "page": entry.get("page", 0),
+        "text": entry["text"].strip(),
+        "similarity": float(similarity)
+    }
+    if ranking_score is not None:
+        result["score"] = float(ranking_score)
+    if entry.get("duplicates"):
+        # Near-duplicate copies that were folded into this entry before embedding
+        result["duplicates"] = entry["duplicates"]
+    return result
 
-            text = entry.get("text", "").strip()
-            embedding = entry.get("embedding", [])
-            
-            if not text or not embedding:
-                continue
+@metrics.timed("rank", profile=True)
+def rank_texts(query_embedding, vectors, records, min_similarity=MIN_SIMILARITY, aggregation=AGGREGATION,
+               lexical_index=None, query=None, lexical_weight=LEXICAL_WEIGHT):
+    """Unique text entries scoring above min_similarity, best first (ranked_*.json entries)
 
-            # Convert embedding to numpy array
-            embedding = np.array(embedding)
-            if embedding.size == 0:
-                continue
+    Chunked stores are scored per chunk and ranked per section, with the
+    chunk scores combined by aggregation ("max" or "mean"). With a
+    lexical_index and the query string, entries are ordered by the BM25 +
+    cosine fused "score"; min_similarity still applies to the cosine.
+    """
+    # Step 1: Score every entry in one product, deduplicate by text content
+    similarities = score(query_embedding, normalize_rows(vectors)) if len(records) else np.zeros(0)
+    ranking = None
+    if lexical_index is not None and query and lexical_index.n_rows == len(records):
+        ranking = fuse_scores(similarities, lexical_index.scores(query), lexical_weight)
+        if ranking is similarities:
+            ranking = None  # no query term in the corpus: plain cosine
+    if is_chunked(records):
+        groups, records = merge_chunks(records)
+        log.info(f"📊 {len(groups)} chunks -> {len(records)} sections ({aggregation})")
+        similarities = aggregate_scores(similarities, groups, len(records), aggregation)
+        if ranking is not None:
+            ranking = aggregate_scores(ranking, groups, len(records), aggregation)
+    if ranking is None:
+        ranking = similarities
+    total_entries = len(records)
 
-            # Create hash for deduplication
-            text_hash = create_text_hash(text)
-            
-            # Calculate cosine similarity with query
-            text_query_similarity = calculate_cosine_similarity(embedding, query_embedding)
-            
-            # Store entry with similarity score
-            entry_with_similarity = {
-                "doc": entry.get("doc", ""),
-                "file": entry.get("file", ""),
-                "page": entry.get("page", 0),
-                "text": text,
-                "embedding": embedding,
-                "similarity": round(text_query_similarity, 4)
-            }
-            
-            # Keep the version with highest similarity if duplicate text found
-            if text_hash in unique_texts:
-                if text_query_similarity > unique_texts[text_hash]["similarity"]:
-                    unique_texts[text_hash] = entry_with_similarity
-            else:
-                unique_texts[text_hash] = entry_with_similarity
-
-    unique_entries = list(unique_texts.values())
-    print(f"📊 Total entries processed: {total_entries}")
-    print(f"📊 Unique text blocks: {len(unique_entries)}")
-    print(f"📊 Duplicates removed: {total_entries - len(unique_entries)}")
-
-    # Step 2: Sort by cosine similarity (highest first)
-    print("\n🔢 Sorting by cosine similarity scores...")
-    unique_entries.sort(key=lambda x: x["similarity"], reverse=True)
-    
-    print(f"📈 Similarity range: {unique_entries[0]['similarity']:.4f} to {unique_entries[-1]['similarity']:.4f}")
-
-    # Step 3: Select entries>0.2 while avoiding embedding redundancy
-    print("\n🎯 Selecting entries with similarity > 0.2 ...")
+    best_by_hash = {}  # hash -> index of the entry with best similarity
+    for index, entry in enumerate(records):
+        text = (entry.get("text") or "").strip()
+        if not text:
+            continue
+        # Keep the version with highest similarity if duplicate text found
+        text_hash = create_text_hash(text)
+        best = best_by_hash.get(text_hash)
+        if best is None or ranking[index] > ranking[best]:
+            best_by_hash[text_hash] = index
+
+    unique_indices = np.fromiter(best_by_hash.values(), dtype=np.int64, count=len(best_by_hash))
+    log.info(f"📊 Total entries processed: {total_entries}")
+    log.info(f"📊 Unique text blocks: {len(unique_indices)}")
+    log.info(f"📊 Duplicates removed: {total_entries - len(unique_indices)}")
+
+    # Step 2: Sort by ranking score (cosine similarity unless fused; highest first)
+    rounded = np.round(similarities[unique_indices].astype(np.float64), 4)
+    rounded_ranking = rounded if ranking is similarities else np.round(ranking[unique_indices].astype(np.float64), 4)
+    order = np.argsort(-rounded_ranking, kind="stable")
+    unique_indices, rounded, rounded_ranking = unique_indices[order], rounded[order], rounded_ranking[order]
+
+    if len(rounded):
+        log.info(f"📈 Similarity range: {rounded.max():.4f} to {rounded.min():.4f}")
+
+    # Step 3: Select entries above the similarity floor
     final_results = []
+    for index, similarity, ranking_score in zip(unique_indices, rounded, rounded_ranking):
+        if similarity <= min_similarity:
+            if ranking is similarities:
+                break
+            continue
+        final_results.append(text_entry(records[index], similarity, None if ranking is similarities else ranking_score))
+    return final_results
+
+
+class UniqueTopK:
+    """The k best entries by score, at most one per create_text_hash (every entry when k is None)
+
+    Entries are ordered as rank_texts orders them: by score, ties by first,
+    the position where the caller first saw the hash (copies that never
+    entered included), and a later copy replaces a member only with a
+    strictly higher exact score. Replaced members leave stale heap items
+    behind that are skipped when they reach the top.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []     # (score, -first, hash); stale once that member changed or left
+        self.members = {}  # hash -> (score, exact score, first, entry)
+
+    def _lowest(self):
+        """Heap item of the weakest member, dropping stale items above it"""
+        while True:
+            score, negative_first, text_hash = self.heap[0]
+            member = self.members.get(text_hash)
+            if member is not None and (member[0], -member[2]) == (score, negative_first):
+                return self.heap[0]
+            heapq.heappop(self.heap)
+
+    def threshold(self):
+        """Scores below this cannot enter (None while not full)"""
+        if self.k is None or len(self.members) < self.k:
+            return None
+        return self._lowest()[0] if self.members else float("inf")
+
+    def push(self, score, exact, text_hash, first, entry):
+        if self.k is not None and self.k <= 0:
+            return
+        current = self.members.get(text_hash)
+        if current is not None:
+            if exact > current[1]:
+                self.members[text_hash] = (score, exact, first, entry)
+                if score != current[0]:
+                    heapq.heappush(self.heap, (score, -first, text_hash))
+                    if len(self.heap) > 2 * len(self.members) + 16:
+                        self.heap = [(m[0], -m[2], h) for h, m in self.members.items()]
+                        heapq.heapify(self.heap)
+            return
+        if self.k is not None and len(self.members) >= self.k:
+            if (score, -first) <= self._lowest()[:2]:
+                return
+            del self.members[heapq.heappop(self.heap)[2]]
+        self.members[text_hash] = (score, exact, first, entry)
+        heapq.heappush(self.heap, (score, -first, text_hash))
+
+    def results(self):
+        """Entries best first (ties by first)"""
+        return [m[3] for m in sorted(self.members.values(), key=lambda m: (-m[0], m[2]))]
+
+
+@metrics.timed("rank", profile=True)
+def rank_texts_streaming(query_embedding, batches, k=STREAM_TOP_K, min_similarity=MIN_SIMILARITY,
+                         aggregation=AGGREGATION, lexical_scores=None, lexical_weight=LEXICAL_WEIGHT):
+    """rank_texts over (vectors, records) batches (iter_store), keeping only the top k
+
+    Each batch is scored with one matrix-vector product, so only one batch of
+    embeddings is held at a time; a UniqueTopK of the best unique entries
+    survives between batches. k=None keeps every unique entry above the floor
+    (the same list rank_texts returns), a number caps that state at k entries;
+    the first-seen position of every distinct text is kept either way.
+    lexical_scores (BM25 of every row,
+    4 bytes per row) switches to the fused score. Chunks of a section that
+    straddles a batch boundary are carried over to the next batch. Entries
+    under the similarity floor are dropped before deduplication.
+    """
+    top = UniqueTopK(k)
+    first_seen = {}  # hash -> position of its first copy, which orders ties as in rank_texts
+    carry = None  # (records, similarities, ranking) of an unfinished chunked section
+    offset = position = total = 0
+    lexical_max = float(lexical_scores.max()) if lexical_scores is not None and len(lexical_scores) else 0.0
+    if lexical_max <= 0:
+        lexical_scores = None  # no query term in the corpus: plain cosine, as in rank_texts
+
+    def add(records, similarities, ranking):
+        nonlocal position
+        rounded = np.round(similarities.astype(np.float64), 4)
+        rounded_ranking = rounded if ranking is None else np.round(ranking.astype(np.float64), 4)
+        exact = similarities if ranking is None else ranking
+        keep = rounded > min_similarity
+        floor = top.threshold()
+        if floor is not None:
+            keep &= rounded_ranking >= floor
+        for index, record in enumerate(records):
+            text = (record.get("text") or "").strip()
+            if not text:
+                continue
+            text_hash = create_text_hash(text)
+            first = first_seen.setdefault(text_hash, position + index)
+            if keep[index]:
+                entry = text_entry(record, rounded[index], None if ranking is None else rounded_ranking[index])
+                top.push(float(rounded_ranking[index]), float(exact[index]), text_hash, first, entry)
+        position += len(records)
+
+    for vectors, records in batches:
+        if not len(records):
+            continue
+        similarities = score(query_embedding, normalize_rows(np.asarray(vectors, dtype=np.float32)))
+        ranking = None
+        if lexical_scores is not None:
+            ranking = fuse_scores(similarities, lexical_scores[offset:offset + len(records)], lexical_weight,
+                                  lexical_max)
+        offset += len(records)
+        total += len(records)
+
+        if not is_chunked(records):
+            add(records, similarities, ranking)
+            continue
+        if carry is not None:
+            records = carry[0] + records
+            similarities = np.concatenate([carry[1], similarities])
+            ranking = None if ranking is None else np.concatenate([carry[2], ranking])
+        # Hold back the last section: its remaining chunks may be in the next batch
+        cut = max((i for i, r in enumerate(records) if r["chunk"] == 0), default=0)
+        carry = (records[cut:], similarities[cut:], None if ranking is None else ranking[cut:])
+        if cut:
+            groups, sections = merge_chunks(records[:cut])
+            add(sections, aggregate_scores(similarities[:cut], groups, len(sections), aggregation),
+                None if ranking is None else aggregate_scores(ranking[:cut], groups, len(sections), aggregation))
+
+    if carry is not None:
+        groups, sections = merge_chunks(carry[0])
+        add(sections, aggregate_scores(carry[1], groups, len(sections), aggregation),
+            None if carry[2] is None else aggregate_scores(carry[2], groups, len(sections), aggregation))
+
+    final_results = top.results()
+    log.info(f"📊 Total entries processed: {total} ({position} after chunk merging)")
+    log.info(f"📊 Kept the top {len(final_results)} unique entries (k={k})")
+    return final_results
+
+
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    model = load_encoder(MODEL_NAME, ENCODER_BACKEND)
+
+    # Process every collection store (or legacy .jsonl)
+    for collection_name in list_collections(INPUT_DIR):
+        print(f"\n" + "="*60)
+        print(f"🔄 Processing: {collection_name}")
+        print("="*60)
+        
+        persona, job = get_persona_job(collection_name)
+        query = query_text(persona, job)
+
+        print(f"🎯 Query: {query}")
+        print("🔄 Encoding query...")
+        query_embedding = model.encode([query])[0]
+        print(f"✅ Query embedding shape: {query_embedding.shape}")
+
+        print("📖 Loading and ranking text entries...")
+        lexical_index = load_lexical_index(INPUT_DIR, collection_name) if USE_LEXICAL_INDEX else None
+        if STREAM_RANKING:
+            # BM25 row ids only line up with a binary store of the same size
+            lexical_scores = None
+            if lexical_index is not None and lexical_index.n_rows == store_count(INPUT_DIR, collection_name):
+                lexical_scores = lexical_index.scores(query)
+            batches = iter_store(INPUT_DIR, collection_name, STREAM_BATCH_ROWS)
+            final_results = rank_texts_streaming(query_embedding, batches, lexical_scores=lexical_scores)
+        else:
+            vectors, records = load_store(INPUT_DIR, collection_name)
+            final_results = rank_texts(query_embedding, vectors, records, lexical_index=lexical_index, query=query)
+        print(f"✅ Final selection: {len(final_results)} entries with similarity > {MIN_SIMILARITY}")
+
+        # Save results
+        output_path = os.path.join(OUTPUT_DIR, f"ranked_{collection_name}.json")
+        
+        with open(output_path, "w", encoding="utf-8") as f_out:
+            json.dump(final_results, f_out, indent=2, ensure_ascii=False)
+
+        print(f"💾 Saved to: {output_path}")
+
+    print("\n" + "="*60)
+    print("🎉 ALL FILES PROCESSED SUCCESSFULLY!")
+    print("="*60)
+    print(f"📁 Results saved in: {OUTPUT_DIR}/")
+    print("🔍 Each file contains top unique text entries ranked by cosine similarity")
 
-    for entry in unique_entries:
-        if entry["similarity"] > 0.2:
-            final_entry = {
-                "doc": entry["doc"],
-                "file": entry["file"], 
-                "page": entry["page"],
-                "text": entry["text"],
-                "similarity": entry["similarity"]
-            }
-            final_results.append(final_entry)
-
-    print(f"✅ Final selection: {len(final_results)} entries with similarity > 0.2")
-
-    # Step 4: Save results
-    collection_name = os.path.splitext(filename)[0]
-    output_path = os.path.join(OUTPUT_DIR, f"ranked_{collection_name}.json")
-    
-    with open(output_path, "w", encoding="utf-8") as f_out:
-        json.dump(final_results, f_out, indent=2, ensure_ascii=False)
-
-    print(f"💾 Saved to: {output_path}")
-
-print("\n" + "="*60)
-print("🎉 ALL FILES PROCESSED SUCCESSFULLY!")
-print("="*60)
-print(f"📁 Results saved in: {OUTPUT_DIR}/")
-print("🔍 Each file contains top unique text entries ranked by cosine similarity")
\ No newline at end of file
+    metrics.emit_summary("step4_ranking_text")
@@ -0,0 +1,52 @@
+import numpy as np
+
+from ann_index import IVFIndex, build_index, load_index, remove_index
+from ranking_engine import normalize_rows, score, top_k_indices
+
+
+def clustered(n, dim=32, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    rows = normalize_rows(centers[rng.integers(0, clusters, n)] + 0.3 * rng.normal(size=(n, dim)))
+    queries = normalize_rows(centers[rng.integers(0, clusters, 50)] + 0.3 * rng.normal(size=(50, dim)))
+    return rows, queries
+
+
+def recall_at_k(index, rows, queries, k, nprobe):
+    hits = [len(set(index.search(rows, q, k, nprobe)) & set(top_k_indices(score(q, rows), k)))
+            for q in queries]
+    return sum(hits) / (k * len(queries))
+
+
+def test_probing_every_list_is_exact():
+    rows, queries = clustered(2000)
+    index = IVFIndex.build(rows)
+    for q in queries[:10]:
+        exact = top_k_indices(score(q, rows), 10)
+        np.testing.assert_array_equal(index.search(rows, q, 10, index.n_lists), exact)
+
+
+def test_default_nprobe_recall():
+    rows, queries = clustered(2000)
+    index = IVFIndex.build(rows)
+    assert recall_at_k(index, rows, queries, 10, 16) >= 0.95
+    # Fewer probes cost recall, never more than exact
+    assert recall_at_k(index, rows, queries, 10, 1) <= recall_at_k(index, rows, queries, 10, 16)
+
+
+def test_every_row_is_in_one_list():
+    rows, _ = clustered(500)
+    index = IVFIndex.build(rows)
+    assert sorted(index.order.tolist()) == list(range(500))
+    assert index.offsets[0] == 0 and index.offsets[-1] == 500
+
+
+def test_save_and_load(tmp_path):
+    rows, queries = clustered(300)
+    build_index(str(tmp_path), "C", rows)
+    index = load_index(str(tmp_path), "C")
+    assert index is not None
+    np.testing.assert_array_equal(index.search(rows, queries[0], 5, 4),
+                                  IVFIndex.build(rows).search(rows, queries[0], 5, 4))
+    remove_index(str(tmp_path), "C")
+    assert load_index(str(tmp_path), "C") is None
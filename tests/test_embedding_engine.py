@@ -0,0 +1,96 @@
+import os
+import hashlib
+
+import numpy as np
+
+import embedding_engine
+from embedding_engine import EmbeddingEngine
+
+
+class FakeModel:
+    """SentenceTransformer stand-in: deterministic unit vectors, counts encoded texts"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        vectors = np.array([[b for b in hashlib.md5(t.encode()).digest()[:8]] for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def engine(cache_dir, model=None):
+    return EmbeddingEngine(cache_dir=str(cache_dir), model=model or FakeModel())
+
+
+def shard_files(e):
+    return sorted(f for f in os.listdir(e.cache_path) if f.startswith("vectors"))
+
+
+def test_misses_are_encoded_once_and_order_is_kept(tmp_path):
+    model = FakeModel()
+    e = engine(tmp_path, model)
+    first = e.encode(["a", "b", "a"])
+    second = e.encode(["c", "b"])
+    assert model.encoded == ["a", "b", "c"]
+    np.testing.assert_array_equal(first[0], first[2])
+    np.testing.assert_array_equal(second[1], first[1])
+    assert (e.hits, e.misses) == (2, 3)
+
+
+def test_each_encode_appends_one_shard(tmp_path):
+    e = engine(tmp_path)
+    e.encode(["a", "b"])
+    e.encode(["a"])       # all hits: nothing written
+    e.encode(["c", "d"])
+    assert len(shard_files(e)) == 2
+    with open(os.path.join(e.cache_path, "shards.jsonl"), encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+
+def test_reload_serves_every_row_from_the_cache(tmp_path):
+    e = engine(tmp_path)
+    expected = np.vstack([e.encode(["a", "b"]), e.encode(["c"])])
+    model = FakeModel()
+    reloaded = engine(tmp_path, model)
+    np.testing.assert_array_equal(reloaded.encode(["a", "b", "c"]), expected)
+    assert model.encoded == []
+
+
+def test_torn_line_is_dropped_and_the_cache_compacted(tmp_path):
+    e = engine(tmp_path)
+    e.encode(["a"])
+    e.encode(["b"])
+    with open(os.path.join(e.cache_path, "shards.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"key": "torn')  # run killed mid-write
+    model = FakeModel()
+    reloaded = engine(tmp_path, model)
+    assert len(reloaded.hashes) == 2 and reloaded.shards == 1
+    assert len(shard_files(reloaded)) == 1
+    reloaded.encode(["a", "b", "c"])
+    assert model.encoded == ["c"]
+    assert len(engine(tmp_path).hashes) == 3
+
+
+def test_missing_shard_file_is_skipped(tmp_path):
+    e = engine(tmp_path)
+    e.encode(["a"])
+    e.encode(["b"])
+    os.remove(os.path.join(e.cache_path, shard_files(e)[0]))
+    assert len(engine(tmp_path).hashes) == 1
+
+
+def test_many_shards_are_merged_on_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_engine, "CACHE_MAX_SHARDS", 3)
+    e = engine(tmp_path)
+    for text in "abcde":
+        e.encode([text])
+    reloaded = engine(tmp_path)
+    assert reloaded.shards == 1 and len(shard_files(reloaded)) == 1
+    np.testing.assert_array_equal(reloaded.encode(list("abcde")), e.encode(list("abcde")))
+
+
+def test_other_model_does_not_share_the_cache(tmp_path):
+    engine(tmp_path).encode(["a"])
+    other = EmbeddingEngine("other-model", cache_dir=str(tmp_path), model=FakeModel())
+    assert other.hashes == []
@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+import pytest
+
+from embedding_store import (save_store, load_store, iter_store, store_count, export_jsonl, load_jsonl,
+                             list_collections)
+
+RECORDS = [
+    {"doc": "a.pdf", "title": "Intro", "page": 1, "text": "Café crème"},
+    {"doc": "a.pdf", "title": "Rooms", "page": 2, "text": "Suites"},
+    {"doc": "b.pdf", "title": "Food", "page": None, "text": "Bouillabaisse", "chunk": 0},
+]
+
+
+def vectors(n=3, dim=5):
+    return np.random.default_rng(0).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_round_trip(tmp_path):
+    save_store(str(tmp_path), "C", vectors(), RECORDS)
+    loaded_vectors, loaded_records = load_store(str(tmp_path), "C")
+    np.testing.assert_array_equal(loaded_vectors, vectors())
+    # Columns missing from a record come back as None
+    assert loaded_records == [{**r, "chunk": r.get("chunk")} for r in RECORDS]
+    assert store_count(str(tmp_path), "C") == 3
+
+
+def test_float16_store(tmp_path):
+    save_store(str(tmp_path), "C", vectors(), RECORDS, dtype="float16")
+    loaded_vectors, _ = load_store(str(tmp_path), "C")
+    assert loaded_vectors.dtype == np.float16
+    np.testing.assert_allclose(loaded_vectors, vectors(), atol=1e-2)
+
+
+def test_mismatched_lengths_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        save_store(str(tmp_path), "C", vectors(2), RECORDS)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3, 10])
+def test_iter_store_batches_concatenate_to_the_store(tmp_path, batch_size):
+    save_store(str(tmp_path), "C", vectors(), RECORDS)
+    batches = list(iter_store(str(tmp_path), "C", batch_size))
+    assert all(len(v) == len(r) <= batch_size for v, r in batches)
+    np.testing.assert_array_equal(np.vstack([v for v, _ in batches]), vectors())
+    assert [r for _, batch in batches for r in batch] == load_store(str(tmp_path), "C")[1]
+
+
+def test_jsonl_export_round_trip(tmp_path):
+    path = os.path.join(str(tmp_path), "C.jsonl")
+    export_jsonl(path, vectors(), RECORDS, ensure_ascii=False)
+    loaded_vectors, loaded_records = load_jsonl(path)
+    np.testing.assert_allclose(loaded_vectors, vectors())
+    assert loaded_records == RECORDS
+    # Without a binary store, load_store and iter_store fall back to the export
+    assert load_store(str(tmp_path), "C")[1] == RECORDS
+    assert [r for _, batch in iter_store(str(tmp_path), "C", 2) for r in batch] == RECORDS
+    assert store_count(str(tmp_path), "C") is None
+
+
+def test_list_collections(tmp_path):
+    save_store(str(tmp_path), "A", vectors(), RECORDS)
+    export_jsonl(os.path.join(str(tmp_path), "B.jsonl"), vectors(), RECORDS)
+    assert list_collections(str(tmp_path)) == ["A", "B"]
+    assert list_collections(os.path.join(str(tmp_path), "missing")) == []
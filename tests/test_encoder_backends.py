@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pytest
+
+import encoder_backends
+from encoder_backends import OnnxSentenceEncoder, encoder_id, load_encoder, local_model_path, onnx_dir
+
+
+def test_encoder_id_keeps_the_plain_name_for_torch():
+    assert encoder_id("paraphrase-MiniLM-L6-v2", "torch") == "paraphrase-MiniLM-L6-v2"
+    assert encoder_id("paraphrase-MiniLM-L6-v2", "onnx-int8") == "paraphrase-MiniLM-L6-v2@onnx-int8"
+
+
+def test_model_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(encoder_backends, "MODELS_DIR", str(tmp_path))
+    assert local_model_path("mini") == "mini"  # not downloaded: hub name
+    os.makedirs(os.path.join(str(tmp_path), "mini"))
+    assert local_model_path("mini") == os.path.join(str(tmp_path), "mini")
+    assert onnx_dir("sentence-transformers/mini/") == os.path.join(str(tmp_path), "mini-onnx")
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        load_encoder("mini", "tensorrt")
+
+
+class WordTokenizer:
+    """Token id = word length; pads with 0 and masks the padding"""
+
+    def __call__(self, texts, max_length, **kwargs):
+        ids = [[len(w) for w in t.split()][:max_length] for t in texts]
+        width = max(len(row) for row in ids)
+        return {
+            "input_ids": np.array([row + [0] * (width - len(row)) for row in ids]),
+            "attention_mask": np.array([[1] * len(row) + [0] * (width - len(row)) for row in ids]),
+        }
+
+
+class EchoSession:
+    """Hidden state of a token = (id, 1); records the batch sizes it saw"""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, outputs, feeds):
+        ids = feeds["input_ids"].astype(np.float32)
+        self.batches.append(len(ids))
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def onnx_encoder(pooling="mean", normalize=False):
+    encoder = OnnxSentenceEncoder.__new__(OnnxSentenceEncoder)  # skip onnxruntime / model files
+    encoder.config = {"pooling": pooling, "normalize": normalize}
+    encoder.tokenizer = WordTokenizer()
+    encoder.max_seq_length = 8
+    encoder.session = EchoSession()
+    encoder.input_names = ["input_ids", "attention_mask"]
+    return encoder
+
+
+def test_mean_pooling_ignores_padding_and_keeps_input_order():
+    encoder = onnx_encoder()
+    texts = ["aa", "aaaa b cc dddddd", "abc de"]
+    vectors = encoder.encode(texts, batch_size=2)
+    np.testing.assert_allclose(vectors, [[2, 1], [3.25, 1], [2.5, 1]])
+    assert encoder.session.batches == [2, 1]  # longest texts batched first
+
+
+def test_cls_pooling_normalization_and_single_string():
+    encoder = onnx_encoder(pooling="cls")
+    np.testing.assert_allclose(encoder.encode("abc de"), [3, 1])
+    vectors = encoder.encode(["abc de"], normalize_embeddings=True)
+    np.testing.assert_allclose(vectors, [[3 / np.sqrt(10), 1 / np.sqrt(10)]], rtol=1e-6)
+    assert onnx_encoder().encode([]).shape == (0, 0)
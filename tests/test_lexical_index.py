@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+
+from lexical_index import BM25Index, tokenize, build_lexical_index, load_lexical_index
+from ranking_engine import fuse_scores, lexical_candidates
+
+CORPUS = [
+    "apple banana",
+    "apple apple cherry",
+    "banana cherry cherry date",
+]
+
+
+def bm25(tf, length, df, n=3, avg_len=3.0, k1=1.2, b=0.75):
+    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("The Apples of the policies, 2024 classes") == ["apple", "policy", "classe"]
+    assert tokenize("class bus") == ["class", "bus"]
+
+
+def test_scores_on_toy_corpus():
+    index = BM25Index.build(CORPUS)
+    np.testing.assert_allclose(index.scores("apple"),
+                               [bm25(1, 2, 2), bm25(2, 3, 2), 0.0], rtol=1e-5)
+    np.testing.assert_allclose(index.scores("cherry date"),
+                               [0.0, bm25(1, 3, 2), bm25(2, 4, 2) + bm25(1, 4, 1)], rtol=1e-5)
+
+
+def test_query_terms_are_normalized_like_the_corpus():
+    index = BM25Index.build(CORPUS)
+    np.testing.assert_allclose(index.scores("The APPLES"), index.scores("apple"))
+    assert not index.scores("kiwi").any()
+
+
+def test_search_returns_only_hits_best_first():
+    index = BM25Index.build(CORPUS)
+    rows, scores = index.search("apple", 10)
+    assert rows.tolist() == [1, 0]
+    assert scores[0] > scores[1] > 0
+    assert len(index.search("kiwi", 10)[0]) == 0
+
+
+def test_save_and_load(tmp_path):
+    records = [{"section_title": "Fruit", "content": text} for text in CORPUS]
+    built = build_lexical_index(str(tmp_path), "C", records)
+    loaded = load_lexical_index(str(tmp_path), "C")
+    assert loaded.n_rows == 3
+    np.testing.assert_allclose(loaded.scores("fruit cherry"), built.scores("fruit cherry"))
+
+
+def test_fuse_scores_known_values():
+    dense = np.array([0.5, 0.2], dtype=np.float32)
+    lexical = np.array([2.0, 4.0], dtype=np.float32)
+    # 0.7 * dense + 0.3 * lexical / max(lexical)
+    np.testing.assert_allclose(fuse_scores(dense, lexical, 0.3), [0.5, 0.44], rtol=1e-6)
+    # A slice scored against the maximum over all rows
+    np.testing.assert_allclose(fuse_scores(dense, lexical, 0.3, lexical_max=8.0), [0.425, 0.29], rtol=1e-6)
+
+
+def test_fuse_scores_without_lexical_hits_is_dense():
+    dense = np.array([0.5, 0.2], dtype=np.float32)
+    assert fuse_scores(dense, np.zeros(2, dtype=np.float32), 0.3) is dense
+
+
+def test_lexical_candidates():
+    scores = np.array([0, 3, 0, 5, 1, 0, 2], dtype=np.float32)
+    np.testing.assert_array_equal(lexical_candidates(scores, 2, 1), [1, 3])
+    assert lexical_candidates(scores, None, 1) is None  # pruning off
+    assert lexical_candidates(scores, 10, 1) is None    # small collection: score every row
+    assert lexical_candidates(scores, 2, 5) is None     # fewer than k rows share a term
@@ -0,0 +1,64 @@
+import numpy as np
+
+from near_dedup import NearDuplicateIndex, NearDuplicateFilter, dedup_records
+
+
+def words(n, seed):
+    rng = np.random.RandomState(seed)
+    return [f"w{i}" for i in rng.randint(0, 5000, size=n)]
+
+
+def edited(text_words, changes, seed):
+    """Copy with `changes` words replaced (spread out, so each kills its own shingles)"""
+    out = list(text_words)
+    for i in np.linspace(10, len(out) - 10, changes).astype(int):
+        out[i] = f"edit{seed}x{i}"
+    return out
+
+
+def test_clusters_identical_and_lightly_edited_copies():
+    base = words(200, 0)
+    index = NearDuplicateIndex()
+    assert index.add(" ".join(base)) is None
+    assert index.add(" ".join(words(200, 1))) is None    # unrelated: new cluster
+    assert index.add(" ".join(base)) == 0                # identical copy
+    assert index.add(" ".join(edited(base, 1, 2))) == 0  # one word in 200 (Jaccard ~0.95)
+    assert index.add(" ".join(edited(base, 40, 3))) is None  # heavily edited: its own cluster
+    assert len(index.signatures) == 3
+
+
+def test_case_and_punctuation_do_not_matter():
+    index = NearDuplicateIndex()
+    text = " ".join(words(50, 4))
+    index.add(text)
+    assert index.add(text.upper().replace(" ", ", ")) == 0
+
+
+def test_dedup_records_keeps_first_copy_and_back_references():
+    base = " ".join(words(120, 5))
+    records = [
+        {"doc": "a", "page": 1, "text": base},
+        {"doc": "b", "page": 2, "text": " ".join(words(120, 6))},
+        {"doc": "c", "page": 3, "text": base},
+        {"doc": "d", "page": 4, "text": base},
+    ]
+    representatives, dropped, stats = dedup_records(records)
+    assert [r["doc"] for r in representatives] == ["a", "b"]
+    assert [r["doc"] for r in dropped] == ["c", "d"]
+    assert representatives[0]["duplicates"] == [{"doc": "c", "page": 3}, {"doc": "d", "page": 4}]
+    assert "duplicates" not in representatives[1]
+    assert "duplicates" not in records[0]  # inputs untouched
+    assert (stats["records"], stats["representatives"], stats["duplicates"], stats["ratio"]) == (4, 2, 2, 0.5)
+
+
+def test_filter_attaches_later_copies_to_every_expanded_record():
+    base = " ".join(words(80, 7))
+    halves = lambda rs: [{**r, "chunk": c} for r in rs for c in (0, 1)]
+    dedup = NearDuplicateFilter(expand=halves)
+    first = dedup.add([{"doc": "a", "text": base}])
+    assert [r["chunk"] for r in first] == [0, 1]
+    # A later call (next streamed page) still reaches the records already handed on
+    assert dedup.add([{"doc": "b", "text": base}]) == []
+    assert first[0]["duplicates"] == [{"doc": "b"}]
+    assert first[0]["duplicates"] is first[1]["duplicates"]
+    assert dedup.stats()["representatives"] == 1
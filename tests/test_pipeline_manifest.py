@@ -0,0 +1,92 @@
+import hashlib
+
+import numpy as np
+
+from embedding_store import load_store
+from pipeline_manifest import PipelineManifest, update_collection_store
+
+STAGE = "text_embeddings"
+PARAMS = {"model": "fake"}
+
+
+class FakeEngine:
+    """Deterministic 4-d vector per text; remembers what it was asked to encode"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts):
+        self.encoded.extend(texts)
+        return np.array([[int(hashlib.md5(t.encode()).hexdigest()[i:i + 2], 16) for i in (0, 2, 4, 6)]
+                         for t in texts], dtype=np.float32)
+
+
+def run(tmp_path, documents, engine=None, manifest=None):
+    """update_collection_store over {doc: [texts]} with the texts themselves as the input hash"""
+    engine = engine or FakeEngine()
+    manifest = manifest or PipelineManifest(str(tmp_path / "manifest.json"))
+    docs = [(doc, doc, "|".join(texts)) for doc, texts in documents.items()]
+    collect = lambda doc: [{"doc": doc, "text": t} for t in documents[doc]]
+    result = update_collection_store(manifest, STAGE, str(tmp_path / "store"), "C", docs, PARAMS,
+                                     collect, "text", engine, "float32")
+    return result, engine, manifest
+
+
+def rows(manifest, doc):
+    return manifest.entry(STAGE, f"C/{doc}")["rows"]
+
+
+def assert_store_matches(tmp_path, documents):
+    vectors, records = load_store(str(tmp_path / "store"), "C")
+    texts = [t for doc_texts in documents.values() for t in doc_texts]
+    assert [r["text"] for r in records] == texts
+    np.testing.assert_array_equal(vectors, FakeEngine().encode(texts))
+
+
+def test_first_run_tiles_the_store(tmp_path):
+    documents = {"a": ["a1", "a2"], "b": ["b1", "b2", "b3"], "c": ["c1"]}
+    (vectors, records, changed), engine, manifest = run(tmp_path, documents)
+    assert changed == ["a", "b", "c"]
+    assert [rows(manifest, d) for d in documents] == [[0, 2], [2, 5], [5, 6]]
+    assert_store_matches(tmp_path, documents)
+
+
+def test_unchanged_collection_is_skipped(tmp_path):
+    documents = {"a": ["a1"], "b": ["b1"]}
+    run(tmp_path, documents)
+    result, engine, _ = run(tmp_path, documents)
+    assert result is None
+    assert engine.encoded == []
+
+
+def test_only_the_changed_document_is_encoded_and_ranges_shift(tmp_path):
+    documents = {"a": ["a1", "a2"], "b": ["b1", "b2", "b3"], "c": ["c1"]}
+    run(tmp_path, documents)
+    documents["b"] = ["b1 edited"]
+    (_, _, changed), engine, manifest = run(tmp_path, documents)
+    assert changed == ["b"]
+    assert engine.encoded == ["b1 edited"]
+    assert [rows(manifest, d) for d in documents] == [[0, 2], [2, 3], [3, 4]]
+    assert_store_matches(tmp_path, documents)
+
+
+def test_removed_document_is_forgotten(tmp_path):
+    documents = {"a": ["a1", "a2"], "b": ["b1"], "c": ["c1", "c2"]}
+    run(tmp_path, documents)
+    del documents["a"]
+    (_, _, changed), engine, manifest = run(tmp_path, documents)
+    assert changed == [] and engine.encoded == []
+    assert manifest.entry(STAGE, "C/a") is None
+    assert [rows(manifest, d) for d in documents] == [[0, 1], [1, 3]]
+    assert_store_matches(tmp_path, documents)
+
+
+def test_ranges_that_do_not_tile_the_store_are_not_trusted(tmp_path):
+    documents = {"a": ["a1", "a2"], "b": ["b1"]}
+    _, _, manifest = run(tmp_path, documents)
+    manifest.entry(STAGE, "C/a")["rows"] = [0, 1]  # no longer covers the store
+    documents["b"] = ["b1 edited"]
+    (_, _, changed), engine, _ = run(tmp_path, documents, manifest=manifest)
+    assert changed == ["a", "b"]
+    assert engine.encoded == ["a1", "a2", "b1 edited"]
+    assert_store_matches(tmp_path, documents)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from ranking_engine import normalize_rows, top_k_indices, select_diverse
+
+
+def diverse_by_full_sort(unit_matrix, scores, k, threshold):
+    """Reference select_diverse: walk every row by descending score"""
+    selected = []
+    for index in np.argsort(-scores, kind="stable"):
+        if all(unit_matrix[index] @ unit_matrix[s] <= threshold for s in selected):
+            selected.append(int(index))
+            if len(selected) == k:
+                break
+    return selected
+
+
+def test_top_k_indices_matches_full_sort_with_ties():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 20, size=500).astype(np.float32)  # many ties
+    for k in (1, 7, 64, 500, 600):
+        expected = np.argsort(-scores, kind="stable")[:k]
+        np.testing.assert_array_equal(top_k_indices(scores, k), expected)
+
+
+@pytest.mark.parametrize("k", [1, 5, 10, 40])
+def test_select_diverse_matches_full_sort(k):
+    rng = np.random.default_rng(k)
+    base = rng.normal(size=(300, 16))
+    # Plant near-copies of some rows so the redundancy filter has work to do
+    copies = base[rng.integers(0, 300, 200)] + 0.01 * rng.normal(size=(200, 16))
+    unit = normalize_rows(np.vstack([base, copies]))
+    scores = unit @ normalize_rows(rng.normal(size=16))[0]
+    assert select_diverse(unit, scores, k, 0.9) == diverse_by_full_sort(unit, scores, k, 0.9)
+
+
+def test_select_diverse_grows_the_pool_past_redundant_rows():
+    rng = np.random.default_rng(1)
+    top = normalize_rows(rng.normal(size=16))[0]
+    # 100 copies of the best row outrank everything else: 64 candidates are not enough
+    copies = top + 0.001 * rng.normal(size=(100, 16))
+    others = rng.normal(size=(200, 16))
+    unit = normalize_rows(np.vstack([copies, others]))
+    scores = unit @ top
+    selected = select_diverse(unit, scores, 5, 0.9)
+    assert selected == diverse_by_full_sort(unit, scores, 5, 0.9)
+    assert len(selected) == 5
+    assert sum(index < 100 for index in selected) == 1
+
+
+def test_select_diverse_empty():
+    assert select_diverse(np.zeros((0, 4), dtype=np.float32), np.zeros(0), 5) == []
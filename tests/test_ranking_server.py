@@ -0,0 +1,78 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import step4_ranking
+from ranking_server import RankingHandler, UnknownStore, parse_params
+
+
+def test_parse_params_defaults_and_query_string_k():
+    assert parse_params({"collection": "C", "k": "3"}) == ("C", "", "", 3, "sections")
+    assert parse_params({}) == ("", "", "", step4_ranking.TOP_K, "sections")
+    assert parse_params({"source": "texts", "k": 1})[3:] == (1, "texts")
+
+
+@pytest.mark.parametrize("params", [
+    [1, 2],                 # JSON array body
+    {"k": None},
+    {"k": 0},
+    {"k": -3},
+    {"k": "-1"},
+    {"k": "ten"},
+    {"k": True},
+    {"k": 2.5},
+    {"collection": 5},
+    {"persona": ["a"]},
+])
+def test_parse_params_rejects_malformed_requests(params):
+    with pytest.raises(ValueError):
+        parse_params(params)
+
+
+class FakeService:
+    """Stands in for RankingService: the error to raise per collection name"""
+
+    errors = {"missing": UnknownStore("Unknown collection for sections: missing"),
+              "broken": KeyError("section_title")}
+
+    def rank(self, collection, persona, job, k, source):
+        if collection in self.errors:
+            raise self.errors[collection]
+        return [{"collection": collection, "k": k}]
+
+    def record_latency(self, endpoint, seconds):
+        pass
+
+
+@pytest.fixture
+def server():
+    RankingHandler.service = FakeService()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), RankingHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(f"{url}/rank", data=body.encode("utf-8"), method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_status_codes(server):
+    assert post(server, '{"collection": "C", "k": 2}') == (200, [{"collection": "C", "k": 2}])
+    assert post(server, "[1, 2]")[0] == 400
+    assert post(server, '{"collection": "C", "k": null}')[0] == 400
+    assert post(server, "not json")[0] == 400
+    assert post(server, '{"collection": "missing"}')[0] == 404
+    # An internal KeyError is a server error, not an unknown collection
+    assert post(server, '{"collection": "broken"}') == (500, {"error": "Internal server error"})
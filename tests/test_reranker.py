@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+import reranker
+from reranker import Reranker, local_weights
+
+
+class LengthScorer:
+    """Score = passage length; sleeps per batch to use up the latency budget"""
+
+    def __init__(self, batch_seconds=0.0):
+        self.batch_seconds = batch_seconds
+        self.scored = []
+
+    def score(self, query, passages, batch_size):
+        time.sleep(self.batch_seconds)
+        self.scored.extend(passages)
+        return [float(len(p)) for p in passages]
+
+
+CANDIDATES = ["a", "bbb", "cc", "dddd", "e", "ffffff"]  # first-stage order
+
+
+def make(tmp_path=None, scorer=None, **kwargs):
+    return Reranker("test-model", scorer=scorer or LengthScorer(),
+                    cache_dir=str(tmp_path) if tmp_path else None, **kwargs)
+
+
+def test_reorders_the_top_n_and_keeps_the_tail():
+    ranked, scores, stats = make(top_n=4, batch_size=2).rerank("q", CANDIDATES, str)
+    assert ranked == ["dddd", "bbb", "cc", "a", "e", "ffffff"]
+    assert scores == [4.0, 3.0, 2.0, 1.0, None, None]
+    assert (stats["reranked"], stats["budget_exhausted"]) == (4, False)
+
+
+def test_budget_fallback_reorders_only_the_scored_prefix():
+    # The first batch always runs; the second would overrun the 50 ms budget
+    r = make(scorer=LengthScorer(batch_seconds=0.03), top_n=6, batch_size=2, budget_ms=50)
+    ranked, scores, stats = r.rerank("q", CANDIDATES, str)
+    assert stats["budget_exhausted"] and stats["reranked"] == 2
+    assert ranked == ["bbb", "a", "cc", "dddd", "e", "ffffff"]
+    assert scores == [3.0, 1.0, None, None, None, None]
+
+
+def test_cached_scores_cost_no_model_calls_and_survive_a_restart(tmp_path):
+    scorer = LengthScorer()
+    first = make(tmp_path, scorer).rerank("q", CANDIDATES, str)
+    assert len(scorer.scored) == len(CANDIDATES)
+
+    again = LengthScorer()
+    second = make(tmp_path, again).rerank("q", CANDIDATES, str)
+    assert again.scored == [] and second[:2] == first[:2]
+    assert second[2]["cache_hits"] == len(CANDIDATES)
+    # Another query is a different key
+    make(tmp_path, again).rerank("other", CANDIDATES[:2], str)
+    assert again.scored == CANDIDATES[:2]
+
+
+def test_cache_file_is_appended_and_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(reranker, "CACHE_MAX_ENTRIES", 3)
+    r = make(tmp_path, batch_size=1)
+    r.rerank("q", CANDIDATES[:2], str)
+    assert r.file_lines == 2
+    r.rerank("q", CANDIDATES[2:5], str)
+    # 5 lines <= 2 * 3: appended
+    assert len(r.cache) == 3 and r.file_lines == 5
+    r.rerank("q", CANDIDATES[5:] + ["gg", "h"], str)
+    # 8 lines > 2 * 3: the file is rewritten with the 3 cached entries
+    assert len(r.cache) == 3 and r.file_lines == 3
+    with open(r.cache_path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+    assert len(make(tmp_path).cache) == 3
+
+
+def test_torn_cache_line_is_dropped(tmp_path):
+    r = make(tmp_path)
+    r.rerank("q", CANDIDATES, str)
+    with open(r.cache_path, "a", encoding="utf-8") as f:
+        f.write('["torn')
+    reloaded = make(tmp_path)
+    assert len(reloaded.cache) == len(CANDIDATES) and reloaded.file_lines == len(CANDIDATES)
+
+
+def test_missing_local_weights_fail_up_front(tmp_path, monkeypatch):
+    monkeypatch.setattr(reranker, "MODELS_DIR", str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        Reranker("cross-encoder/mini", cache_dir=None)
+    folder = tmp_path / "cross-encoder" / "mini"
+    folder.mkdir(parents=True)
+    (folder / "config.json").write_text("{}")
+    assert local_weights("cross-encoder/mini") is None  # config and tokenizer only, like models/Qwen2-0.5B
+    (folder / "model.safetensors").write_bytes(b"")
+    assert local_weights("cross-encoder/mini") == os.path.join(str(tmp_path), "cross-encoder/mini")
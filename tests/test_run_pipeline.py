@@ -0,0 +1,39 @@
+import numpy as np
+
+from run_pipeline import StreamingCollection
+
+
+class AxisEngine:
+    """Encodes "axis:i" as the unit vector along dimension i"""
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), 4), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vectors[row, int(text.split(":")[1])] = 1.0
+        return vectors
+
+
+def records(*axes):
+    return [{"content": f"axis:{a}"} for a in axes]
+
+
+def test_provisional_best_follows_scored_batches():
+    stream = StreamingCollection(AxisEngine(), "content", np.array([0.1, 0.2, 0.9, 0.0]), batch_size=2)
+    assert stream.add(records(0)) is False               # queued, nothing scored
+    assert stream.add(records(1)) is True                # first scored batch
+    assert stream.best[1]["content"] == "axis:1" and stream.improved
+    stream.improved = False
+    stream.add(records(0, 3))                            # no better section
+    assert not stream.improved
+    stream.add(records(2, 0))
+    assert stream.improved and stream.best[1]["content"] == "axis:2"
+    assert np.isclose(stream.best[0], 0.9 / np.linalg.norm([0.1, 0.2, 0.9]))
+
+    vectors, all_records = stream.finish()
+    assert len(vectors) == len(all_records) == 6
+
+
+def test_without_a_query_nothing_is_scored():
+    stream = StreamingCollection(AxisEngine(), "content", None, batch_size=1)
+    assert stream.add(records(0)) is False
+    assert stream.best is None
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+import step4_ranking
+from lexical_index import BM25Index, record_text
+from ranking_engine import query_text
+from step4_ranking_batch import safe_name, output_names, rank_queries
+
+
+def test_safe_name():
+    assert safe_name("traveller/1") == "traveller_1"
+    assert safe_name("  ") == "query"
+
+
+def test_colliding_ids_get_separate_files():
+    names = output_names(["a/b", "a:b", "a_b", "x", "A_B", "a/b_2"])
+    assert names == ["a_b", "a_b_2", "a_b_3", "x", "A_B_4", "a_b_2_2"]
+    assert len({n.lower() for n in names}) == len(names)
+
+
+class HashModel:
+    """SentenceTransformer stand-in: a fixed random vector per text"""
+
+    def encode(self, texts, **kwargs):
+        return np.array([np.random.default_rng(sum(map(ord, t))).normal(size=8) for t in texts], dtype=np.float32)
+
+
+def test_rank_queries_matches_rank_sections_with_and_without_bm25():
+    rng = np.random.default_rng(0)
+    vocabulary = ["museum", "beach", "wine", "hotel", "castle", "market"]
+    records = [{"section_title": f"s{i}", "content": " ".join(rng.choice(vocabulary, 4))} for i in range(60)]
+    vectors = rng.normal(size=(60, 8)).astype(np.float32)
+    queries = [{"id": "1", "persona": "Planner", "job": "wine and castle tour"},
+               {"id": "2", "persona": "Student", "job": "cheap beach hotel"}]
+    lexical_index = BM25Index.build([record_text(r) for r in records])
+    model = HashModel()
+
+    for index in (None, lexical_index):
+        rankings = rank_queries(model, vectors, records, queries, k=5, lexical_index=index)
+        for query, ranked in zip(queries, rankings):
+            text = query_text(query["persona"], query["job"])
+            expected = step4_ranking.rank_sections(model.encode([text])[0], vectors, records, k=5,
+                                                   lexical_index=index, query=text)
+            assert [r["section_title"] for r in ranked] == [r["section_title"] for r in expected]
+            assert [r["similarity"] for r in ranked] == pytest.approx([r["similarity"] for r in expected], abs=1e-6)
+            assert ("score" in ranked[0]) == (index is not None)
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from step4_ranking_text import UniqueTopK, create_text_hash, rank_texts, rank_texts_streaming
+from lexical_index import BM25Index, record_text
+
+
+def test_unique_top_k_matches_full_sort():
+    rng = np.random.default_rng(0)
+    items = [(float(s), f"text {h}") for s, h in zip(rng.integers(0, 50, 400) / 50, rng.integers(0, 120, 400))]
+    for k in (1, 5, 30, None):
+        top, first = UniqueTopK(k), {}
+        for position, (score, text) in enumerate(items):
+            first.setdefault(text, position)
+            top.push(score, score, create_text_hash(text), first[text], {"text": text, "position": position})
+
+        # Full sort as rank_texts does it: best copy per text (earliest on ties), best first,
+        # ties in the order each text was first seen
+        best = {}
+        for position, (score, text) in enumerate(items):
+            if text not in best or score > items[best[text]][0]:
+                best[text] = position
+        expected = sorted(best.values(), key=lambda p: (-items[p][0], first[items[p][1]]))[:k]
+        assert [entry["position"] for entry in top.results()] == expected
+
+
+def test_streaming_ties_follow_first_seen_text():
+    def unit(similarity):
+        return [similarity, np.sqrt(1 - similarity ** 2)]
+
+    records = [{"doc": "A", "text": "alpha"}, {"doc": "B", "text": "beta"}, {"doc": "C", "text": "alpha"}]
+    vectors = np.array([unit(0.3), unit(0.9), unit(0.9)], dtype=np.float32)
+    query_embedding = np.array([1, 0], dtype=np.float32)
+
+    expected = rank_texts(query_embedding, vectors, records)
+    assert [r["doc"] for r in expected] == ["C", "B"]
+    for size in (1, 3):
+        assert rank_texts_streaming(query_embedding, batches(vectors, records, size)) == expected
+        assert rank_texts_streaming(query_embedding, batches(vectors, records, size), k=1) == expected[:1]
+
+
+def synthetic_store(seed, chunked):
+    rng = np.random.default_rng(seed)
+    vocabulary = ["museum", "beach", "wine", "hotel", "castle", "market", "river", "train"]
+    records = []
+    for i in range(120):
+        text = " ".join(rng.choice(vocabulary, 6)) if i % 7 else "shared duplicate text"
+        if not chunked:
+            records.append({"doc": f"d{i % 5}", "page": i, "text": text})
+            continue
+        half = len(text) // 2
+        records.append({"doc": f"d{i % 5}", "page": i, "text": text[:half + 5], "chunk": 0, "start": 0,
+                        "end": half + 5})
+        records.append({"doc": f"d{i % 5}", "page": i, "text": text[half:], "chunk": 1, "start": half,
+                        "end": len(text)})
+    vectors = rng.normal(size=(len(records), 16)).astype(np.float32)
+    return vectors, records
+
+
+def batches(vectors, records, size):
+    for start in range(0, len(records), size):
+        yield vectors[start:start + size], records[start:start + size]
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+@pytest.mark.parametrize("query", [None, "wine castle", "no such term"])
+def test_streaming_matches_rank_texts(chunked, query):
+    vectors, records = synthetic_store(1, chunked)
+    query_embedding = np.random.default_rng(2).normal(size=16).astype(np.float32)
+    lexical_index = BM25Index.build([record_text(r) for r in records]) if query else None
+
+    expected = rank_texts(query_embedding, vectors, records, min_similarity=-1.0,
+                          lexical_index=lexical_index, query=query)
+    lexical_scores = lexical_index.scores(query) if query else None
+    for size in (7, 64, 1000):
+        streamed = rank_texts_streaming(query_embedding, batches(vectors, records, size), min_similarity=-1.0,
+                                        lexical_scores=lexical_scores)
+        assert streamed == expected
+        bounded = rank_texts_streaming(query_embedding, batches(vectors, records, size), k=10,
+                                       min_similarity=-1.0, lexical_scores=lexical_scores)
+        assert bounded == expected[:10]
+
+
+def test_exact_duplicates_are_ranked_once():
+    vectors, records = synthetic_store(3, chunked=False)
+    ranked = rank_texts(np.ones(16, dtype=np.float32), vectors, records, min_similarity=-1.0)
+    assert sum(r["text"] == "shared duplicate text" for r in ranked) == 1
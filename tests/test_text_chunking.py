@@ -0,0 +1,74 @@
+import re
+
+import numpy as np
+import pytest
+
+from text_chunking import TextChunker, merge_chunks, is_chunked
+
+TEXT = " ".join(f"w{i}" for i in range(20))
+
+
+class PieceTokenizer:
+    """Fast-tokenizer stand-in: every word is split into 2-character pieces"""
+
+    def __call__(self, text, add_special_tokens, return_offsets_mapping):
+        offsets = []
+        for match in re.finditer(r"\S+", text):
+            for start in range(match.start(), match.end(), 2):
+                offsets.append((start, min(start + 2, match.end())))
+        return {"offset_mapping": offsets}
+
+
+def words_of(text, spans):
+    return [text[start:end].split() for start, end in spans]
+
+
+def test_whitespace_windows_and_overlap():
+    # 10 usable tokens -> 7 words per window, 4 overlap tokens -> 3 words
+    chunker = TextChunker(None, max_tokens=12, overlap=4)
+    chunks = words_of(TEXT, chunker.spans(TEXT))
+    assert [c[0] for c in chunks] == ["w0", "w4", "w8", "w12", "w16"]
+    assert all(len(c) <= 7 for c in chunks)
+    assert all(a[-3:] == b[:3] for a, b in zip(chunks, chunks[1:]))
+    assert chunks[-1][-1] == "w19"
+
+
+def test_short_and_empty_texts_are_one_or_no_chunk():
+    chunker = TextChunker(None, max_tokens=12, overlap=4)
+    assert chunker.spans("short text") == [(0, 10)]
+    assert chunker.spans("") == []
+
+
+def test_token_windows_never_split_a_word():
+    text = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda"
+    chunker = TextChunker(PieceTokenizer(), max_tokens=10, overlap=3)  # 8 pieces per window
+    spans = chunker.spans(text)
+    assert len(spans) > 1
+    word_starts = {m.start() for m in re.finditer(r"\S+", text)}
+    word_ends = {m.end() for m in re.finditer(r"\S+", text)}
+    pieces = PieceTokenizer()(text, False, True)["offset_mapping"]
+    for start, end in spans:
+        assert start in word_starts and end in word_ends
+        assert sum(start <= a and b <= end for a, b in pieces) <= 8
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+
+
+def test_overlap_must_fit_the_window():
+    with pytest.raises(ValueError):
+        TextChunker(None, max_tokens=10, overlap=8)
+
+
+def test_merge_chunks_rebuilds_every_section():
+    records = [
+        {"doc": "a", "page": 1, "text": TEXT},
+        {"doc": "a", "page": 2, "text": "one short section"},
+        {"doc": "b", "page": 1, "text": TEXT.upper()},
+    ]
+    chunks = TextChunker(None, max_tokens=12, overlap=4).chunk_records(records)
+    assert is_chunked(chunks) and not is_chunked(records)
+    assert all(c["text"] == r["text"][c["start"]:c["end"]]
+               for c in chunks for r in records if (r["doc"], r["page"]) == (c["doc"], c["page"]))
+
+    groups, sections = merge_chunks(chunks)
+    assert sections == records
+    np.testing.assert_array_equal(groups, [0] * 5 + [1] + [2] * 5)
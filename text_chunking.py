@@ -0,0 +1,139 @@
+import os
+import re
+import numpy as np
+
+from encoder_backends import local_model_path, onnx_dir
+from instrumentation import get_logger, metrics
+
+# === CONFIG ===
+MAX_CHUNK_TOKENS = 128   # MiniLM's max_seq_length, [CLS]/[SEP] included
+CHUNK_OVERLAP = 32       # tokens shared by consecutive windows
+SPECIAL_TOKENS = 2
+TOKENS_PER_WORD = 1.3    # whitespace estimate when no tokenizer is available
+AGGREGATION = "max"      # chunk -> section score: "max" or "mean"
+
+log = get_logger("chunking")
+
+
+def load_tokenizer(model_name):
+    """Fast tokenizer of the sentence encoder, or None (whitespace estimate) if unavailable"""
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        log.warning("⚠️ transformers not installed, chunking on a whitespace token estimate")
+        return None
+    candidates = [p for p in (local_model_path(model_name), onnx_dir(model_name)) if os.path.isdir(p)]
+    # SentenceTransformer resolves bare names under the sentence-transformers organisation
+    candidates.append(model_name if "/" in model_name else f"sentence-transformers/{model_name}")
+    for candidate in candidates:
+        try:
+            tokenizer = AutoTokenizer.from_pretrained(candidate)
+        except (OSError, ValueError):
+            continue
+        if tokenizer.is_fast:
+            return tokenizer
+    log.warning(f"⚠️ No fast tokenizer for {model_name}, chunking on a whitespace token estimate")
+    return None
+
+
+class TextChunker:
+    """Splits long texts into overlapping windows that fit the encoder
+
+    Windows are measured in model tokens (character offsets from a fast
+    tokenizer) and snapped to word boundaries, so every chunk is a verbatim
+    slice of the original text and nothing past max_seq_length is lost to
+    truncation.
+    """
+
+    def __init__(self, tokenizer=None, max_tokens=MAX_CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+        if overlap >= max_tokens - SPECIAL_TOKENS:
+            raise ValueError(f"overlap ({overlap}) must be smaller than the window ({max_tokens - SPECIAL_TOKENS})")
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+
+    @classmethod
+    def for_model(cls, model_name, max_tokens=MAX_CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+        return cls(load_tokenizer(model_name), max_tokens, overlap)
+
+    @property
+    def params(self):
+        """Manifest parameter: stores must be rebuilt when the windows change"""
+        source = "tokens" if self.tokenizer is not None else "words"
+        return f"{self.max_tokens}/{self.overlap}/{source}"
+
+    def _token_spans(self, text):
+        """(start, end) character offsets per token, and the window / overlap in that unit"""
+        window = self.max_tokens - SPECIAL_TOKENS
+        if self.tokenizer is not None:
+            offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+            return [tuple(o) for o in offsets if o[1] > o[0]], window, self.overlap
+        spans = [m.span() for m in re.finditer(r"\S+", text)]
+        return spans, max(1, int(window / TOKENS_PER_WORD)), int(self.overlap / TOKENS_PER_WORD)
+
+    def spans(self, text):
+        """(start, end) character ranges of the chunks of text"""
+        tokens, window, overlap = self._token_spans(text)
+        if len(tokens) <= window:
+            return [(0, len(text))] if text else []
+
+        def word_start(i):
+            # Back up to the first piece of the word token i belongs to
+            while i > 0 and tokens[i][0] == tokens[i - 1][1]:
+                i -= 1
+            return i
+
+        ranges, start = [], 0
+        while True:
+            end = min(start + window, len(tokens))
+            if end < len(tokens):
+                # Cut before a word that would be split, unless it is the whole window
+                snapped = word_start(end)
+                end = snapped if snapped > start else end
+            ranges.append((tokens[start][0], tokens[end - 1][1]))
+            if end >= len(tokens):
+                return ranges
+            start = max(word_start(max(end - overlap, 0)), start + 1)
+
+    def chunk_records(self, records, text_field="text"):
+        """One record per chunk, keeping the original fields for provenance
+
+        Adds "chunk" (0 starts a new section) and the chunk's "start"/"end"
+        offsets in the section text; text_field becomes the chunk text. The
+        chunks of a section stay consecutive, which merge_chunks relies on.
+        """
+        chunks = []
+        for record in records:
+            text = record[text_field]
+            for index, (start, end) in enumerate(self.spans(text)):
+                chunk = dict(record)
+                chunk.update({text_field: text[start:end], "chunk": index, "start": start, "end": end})
+                chunks.append(chunk)
+        metrics.count("chunks", len(chunks))
+        return chunks
+
+
+def is_chunked(records):
+    return bool(records) and "chunk" in records[0]
+
+
+def merge_chunks(records, text_field="text"):
+    """(group per chunk row, one record per section with its full text rebuilt)
+
+    A section starts at every chunk 0; its text is the union of the chunk
+    ranges, so overlapping windows are not repeated.
+    """
+    groups = np.empty(len(records), dtype=np.int64)
+    sections = []
+    pos = 0
+    for row, record in enumerate(records):
+        start, end = record["start"], record["end"]
+        if record["chunk"] == 0 or not sections:
+            sections.append({k: v for k, v in record.items() if k not in ("chunk", "start", "end")})
+            pos = end
+        elif end > pos:
+            text = record[text_field]
+            sections[-1][text_field] += text[pos - start:] if start <= pos else " " + text
+            pos = end
+        groups[row] = len(sections) - 1
+    return groups, sections
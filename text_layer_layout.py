@@ -0,0 +1,138 @@
+from collections import Counter
+import fitz  # PyMuPDF
+
+# === CONFIG ===
+BOLD_FLAG = 16             # PyMuPDF span flag for bold fonts
+TITLE_SIZE_RATIO = 1.15    # a line this much larger than body text is a heading
+DOC_TITLE_SIZE_RATIO = 1.5 # the largest such line on page 1 is the document title
+MAX_TITLE_WORDS = 14
+MAX_PLAIN_TITLE_WORDS = 6  # regular-weight headings: a short, title-case line on its own
+BULLETS = "\u2022\uf0b7\u25aa\u25cf-\u2013o"
+MAX_LABEL_WORDS = 3        # "Ingredients:" style lead-ins are headings
+MIN_TEXT_CHARS = 20        # fewer characters than this: probably scanned, ask the model
+MIN_CONFIDENCE = 0.8       # pages below this go to the layout model
+
+
+def _line_text(line):
+    return "".join(span["text"] for span in line["spans"]).strip()
+
+
+def _line_stats(line):
+    """(chars, bold chars, largest font size) over the non-blank spans of a line"""
+    chars = bold = 0
+    size = 0.0
+    for span in line["spans"]:
+        n = len(span["text"].strip())
+        if not n:
+            continue
+        chars += n
+        if span["flags"] & BOLD_FLAG or "bold" in span["font"].lower():
+            bold += n
+        size = max(size, span["size"])
+    return chars, bold, size
+
+
+def body_font_size(blocks):
+    """Most common font size, weighted by character count"""
+    sizes = Counter()
+    for block in blocks:
+        for line in block.get("lines", []):
+            for span in line["spans"]:
+                sizes[round(span["size"], 1)] += len(span["text"].strip())
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+
+def is_title_case(text):
+    words = [w for w in text.split() if len(w) > 3]
+    return bool(words) and text[0].isupper() and all(w[0].isupper() for w in words)
+
+
+def classify_line(line, body_size, standalone=False):
+    """("paragraph_title" | "text" | None, ambiguous) for one text line
+
+    standalone is True when the line is the only one in its block.
+    """
+    chars, bold, size = _line_stats(line)
+    text = _line_text(line)
+    if not chars or not text.strip(BULLETS + " "):
+        # Blank lines and bare bullet glyphs
+        return None, False
+    words = len(text.split())
+    bold_ratio = bold / chars
+    short = words <= MAX_TITLE_WORDS and not text.endswith((".", ";", ","))
+
+    if size >= body_size * TITLE_SIZE_RATIO and words <= MAX_TITLE_WORDS:
+        return "paragraph_title", False
+    if bold_ratio >= 0.9 and short:
+        return "paragraph_title", False
+    if standalone and words <= MAX_PLAIN_TITLE_WORDS and short and is_title_case(text):
+        return "paragraph_title", False
+    if words <= MAX_LABEL_WORDS and text.endswith(":") and is_title_case(text):
+        return "paragraph_title", False
+    # Bold lead-ins ("Nice: ...") and lone bold lines that read like sentences
+    ambiguous = (0.2 < bold_ratio < 0.9 and short) or (bold_ratio >= 0.9 and not short)
+    return "text", ambiguous
+
+
+def classify_page(page, page_num, dpi=72):
+    """Layout elements of a born-digital page from its text layer
+
+    Returns (result, confidence) where result has the same schema as
+    step1_paddle.process_layout_result. Consecutive lines of one PyMuPDF
+    block with the same label become one element. confidence is the share
+    of characters whose label was clear-cut (0 for pages without a text
+    layer), so callers can send doubtful pages to the layout model.
+    """
+    result = {
+        "page_number": page_num + 1,
+        "elements": [],
+        "element_counts": {},
+        "source": "text_layer"
+    }
+    scale = dpi / 72.0
+    text_blocks = [b for b in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"] if b.get("type") == 0]
+    body_size = body_font_size(text_blocks)
+
+    elements = []  # [label, bbox, lines, max size]
+    total_chars = ambiguous_chars = 0
+    for block in text_blocks:
+        current = None
+        standalone = sum(1 for line in block["lines"] if _line_text(line).strip(BULLETS + " ")) == 1
+        for line in block["lines"]:
+            label, ambiguous = classify_line(line, body_size, standalone)
+            if label is None:
+                continue
+            chars, _, size = _line_stats(line)
+            total_chars += chars
+            if ambiguous:
+                ambiguous_chars += chars
+            if current is not None and current[0] == label:
+                current[1] |= fitz.Rect(line["bbox"])
+                current[2].append(_line_text(line))
+                current[3] = max(current[3], size)
+            else:
+                current = [label, fitz.Rect(line["bbox"]), [_line_text(line)], size]
+                elements.append(current)
+
+    for image in page.get_image_info():
+        elements.append(["image", fitz.Rect(image["bbox"]), [], 0.0])
+
+    if page_num == 0 and body_size:
+        titles = [e for e in elements if e[0] == "paragraph_title" and e[3] >= body_size * DOC_TITLE_SIZE_RATIO]
+        if titles:
+            max(titles, key=lambda e: e[3])[0] = "doc_title"
+
+    elements.sort(key=lambda e: (e[1].y0, e[1].x0))
+    for i, (label, rect, lines, _) in enumerate(elements):
+        result["element_counts"][label] = result["element_counts"].get(label, 0) + 1
+        result["elements"].append({
+            "id": i + 1,
+            "type": label,
+            "confidence": 1.0,
+            "text": "\n".join(lines),
+            "coordinates": [round(v * scale, 2) for v in (rect.x0, rect.y0, rect.x1, rect.y1)]
+        })
+
+    if total_chars < MIN_TEXT_CHARS:
+        return result, 0.0
+    return result, round(1.0 - ambiguous_chars / total_chars, 3)